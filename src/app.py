@@ -1,29 +1,50 @@
 import streamlit as st
 import asyncio
-import geopandas as gpd
+import importlib
 import json
 import time
 import os
+import threading
 from urllib.parse import urlencode
 from uuid import uuid4
 from datetime import date
 
-from yt_production import analyze_all_states as analyze_yt
-from tg_production import launch as analyze_tg
-from telegram_pplt import download_posts
-from gt_production import run_google_trends
-from serpapi_production import fetch_timeseries_data
-from mediacloud_production import fetch_news_data as fetch_mediacloud_data
-from google_news_production import fetch_gnews_data
-from google_news_production.decoder import decode_gnews_links
-from trafilatura_production import fetch_and_store_contents
-
 # ─────────────────────────── Constants ───────────────────────────────────────
 GRAFANA_BASE_URL = os.getenv(
     "GRAFANA_BASE_URL",
     "http://localhost:3000/d/your_dashboard_uid/social-pulse",
 )
 
+# Pipeline stages as (module, function). Modules are imported only when their stage runs,
+# so torch/transformers and Mongo clients are not loaded on every Streamlit rerun
+PIPELINE_STAGES = {
+    "youtube":        ("yt_production", "analyze_all_states"),
+    "telegram_fetch": ("telegram_pplt", "download_posts"),
+    "telegram":       ("tg_production", "launch"),
+    "google_trends":  ("gt_production", "run_google_trends"),
+    "serpapi":        ("serpapi_production", "fetch_timeseries_data"),
+    "mediacloud":     ("mediacloud_production", "fetch_news_data"),
+    "gnews":          ("google_news_production", "fetch_gnews_data"),
+    "gnews_decoder":  ("google_news_production.decoder", "decode_gnews_links"),
+    "trafilatura":    ("trafilatura_production", "fetch_and_store_contents"),
+}
+
+def get_stage(name: str):
+    # Import the stage module on first use (cached in sys.modules afterwards)
+    module_name, function_name = PIPELINE_STAGES[name]
+    return getattr(importlib.import_module(module_name), function_name)
+
+# Set WARM_UP_MODELS=1 to load the pipeline models in the background when the app starts
+WARM_UP_MODELS = os.getenv("WARM_UP_MODELS", "0") == "1"
+
+@st.cache_resource
+def start_model_warm_up() -> threading.Thread:
+    # Runs once per server process, the models stay in the process-wide registry
+    model_registry = importlib.import_module("model_registry")
+    thread = threading.Thread(target=model_registry.warm_up, daemon=True)
+    thread.start()
+    return thread
+
 POVERTY_DIMENSIONS_TG = {
     "INCOME": """
     desempleo salario mínimo bajos ingresos deudas familiares pobreza laboral
@@ -162,6 +183,9 @@ st.set_page_config(
 )
 st.title("Thesis MVP - Launcher")
 
+if WARM_UP_MODELS:
+    start_model_warm_up()
+
 presentation_mode = st.checkbox("Presentation mode")
 
 if "country" not in st.session_state:
@@ -258,11 +282,20 @@ if "module2_done" not in st.session_state:
     st.session_state.module2_done = False
 
 def run_youtube_parser(states: list[str], dimensions: dict[str, str]):
-    return analyze_yt(
-        start_year=years[0], end_year=years[-1], states=states, dimensions=dimensions
-    )
+    analyze_all_states = get_stage("youtube")
+    IncompleteAnalysis = importlib.import_module(PIPELINE_STAGES["youtube"][0]).IncompleteAnalysis
+    try:
+        return analyze_all_states(
+            start_year=years[0], end_year=years[-1], states=states, dimensions=dimensions
+        )
+    except IncompleteAnalysis as e:
+        # the daily YouTube quota ran out: keep the states that were analyzed completely
+        st.warning(f"⚠️ YouTube analysis is incomplete, rerun after the quota resets. {e}")
+        return e.frames
 
 def get_regions(geojson: str):
+    import geopandas as gpd
+
     data = json.loads(geojson)
     gdf = gpd.GeoDataFrame.from_features(data["features"])
     return gdf["state_name"].tolist()
@@ -293,9 +326,9 @@ if st.button("Run Pipeline"):
             # progress.progress(40)
 
             # with st.spinner("3/7: Downloading and Processing Telegram data..."):
-            #     asyncio.run(download_posts(selected_tg, years[0], years[-1]))
+            #     asyncio.run(get_stage("telegram_fetch")(selected_tg, years[0], years[-1], states=st.session_state.regions))
             #     dims = format_dimensions(st.session_state.dimensions_tg)
-            #     st.session_state.tg_data = analyze_tg(
+            #     st.session_state.tg_data = get_stage("telegram")(
             #         start_year=years[0],
             #         end_year=years[-1],
             #         states=st.session_state.regions,
@@ -312,12 +345,12 @@ if st.button("Run Pipeline"):
             #     keyword_sets = [",".join(d["keywords"]) for d in st.session_state.dimensions_gt]
             #     keyword_sets = list(dict.fromkeys(keyword_sets))
 
-            #     fetch_timeseries_data(
+            #     get_stage("serpapi")(
             #         keyword_sets=keyword_sets,
             #         states=state_codes
             #     )
 
-            #     st.session_state.gt_data = run_google_trends(
+            #     st.session_state.gt_data = get_stage("google_trends")(
             #         years=years,
             #         dimensions={d["name"]: d["keywords"] for d in st.session_state.dimensions_gt},
             #         states=state_codes,
@@ -329,7 +362,7 @@ if st.button("Run Pipeline"):
                 state_names = st.session_state.regions
                 start = date(years[0],1,1)
                 end = date(years[-1],1,31)
-                fetch_mediacloud_data(
+                get_stage("mediacloud")(
                     keywords=state_names,
                     start_date=start,
                     end_date=end,
@@ -341,20 +374,20 @@ if st.button("Run Pipeline"):
                 state_names = st.session_state.regions 
                 start = date(years[0],1,1)
                 end = date(years[-1],1,31)
-                fetch_gnews_data(
+                get_stage("gnews")(
                     keywords=state_names,
                     start_date=start,
                     end_date=end,
                     max_workers=10,
                     chunk_days=10,
-                    sleep_between=1.0
+                    proxy_interval=1.0
                 )
 
-                decode_gnews_links(states=state_names, max_workers=20)
+                get_stage("gnews_decoder")(states=state_names, max_workers=20)
 
             with st.spinner("7/8: Parsing HTML..."):
                 states = st.session_state.regions
-                fetch_and_store_contents(
+                get_stage("trafilatura")(
                     states=states,
                     max_workers=10
                 )
@@ -0,0 +1,69 @@
+"""
+Measures cold-start and rerun latency of the Streamlit app with lazily registered pipeline
+stages, against eager imports of every stage module at the top of the script (previous app.py).
+
+Every variant runs in a fresh interpreter through streamlit's AppTest, so the first run
+includes all imports. Run from src/:
+    python -m benchmarks.app_startup_benchmark --repeats 5 --reruns 10
+"""
+import ast
+import sys
+import json
+import argparse
+import subprocess
+from statistics import median
+
+APP_PATH = "app.py"
+
+# executed in a fresh interpreter: cold run of the script, then reruns of the same session
+RUNNER = """
+import json, sys
+from time import perf_counter
+start = perf_counter()
+from streamlit.testing.v1 import AppTest
+source = open({app_path!r}, encoding="utf-8").read()
+at = AppTest.from_string({prefix!r} + source, default_timeout=600)
+at.run()
+cold = perf_counter() - start
+reruns = []
+for _ in range({reruns}):
+    run_start = perf_counter()
+    at.run()
+    reruns.append(perf_counter() - run_start)
+json.dump({{"cold": cold, "reruns": reruns, "modules": len(sys.modules)}}, sys.stdout)
+"""
+
+def read_pipeline_stages() -> dict:
+    # read the stage registry without executing the Streamlit script
+    tree = ast.parse(open(APP_PATH, encoding="utf-8").read())
+    for node in tree.body:
+        if isinstance(node, ast.Assign) and any(getattr(target, "id", None) == "PIPELINE_STAGES" for target in node.targets):
+            return ast.literal_eval(node.value)
+    raise ValueError(f'PIPELINE_STAGES not found in {APP_PATH}')
+
+def eager_prefix() -> str:
+    # same imports the script used to do before pipeline stages were registered lazily
+    modules = dict.fromkeys(module for module, _ in read_pipeline_stages().values())
+    return "".join(f'import {module}\n' for module in modules) + "import geopandas\n"
+
+def run_variant(prefix: str, reruns: int) -> dict:
+    code = RUNNER.format(app_path=APP_PATH, prefix=prefix, reruns=reruns)
+    output = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True).stdout
+    # streamlit may print warnings before the result
+    return json.loads(output[output.rindex("{"):])
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--repeats", type=int, default=5, help="fresh interpreters per variant")
+    parser.add_argument("--reruns", type=int, default=10, help="reruns after the cold start")
+    args = parser.parse_args()
+
+    print(f'{"variant":>8} {"cold, s":>10} {"rerun, ms":>10} {"modules":>8}')
+    for name, prefix in [("eager", eager_prefix()), ("lazy", "")]:
+        results = [run_variant(prefix, args.reruns) for _ in range(args.repeats)]
+        cold = median(result["cold"] for result in results)
+        rerun = median(run for result in results for run in result["reruns"]) * 1000
+        print(f'{name:>8} {cold:>10.2f} {rerun:>10.1f} {results[0]["modules"]:>8}')
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,106 @@
+"""
+Measures how date-range fetching of google_news_production scales with max_workers, and
+checks that every chunk gets the articles of its own window.
+
+By default GNews is replaced by a stand-in that answers after --latency seconds and serves
+one request at a time per proxy, like a single exit address would. "shared" runs every
+worker on one engine, as fetch_gnews_data did before, to show the windows it mixes up.
+Pass --live to query Google News through files/proxies.txt instead. Run from src/:
+    python -m benchmarks.gnews_fetch_benchmark --proxies 8 --chunks 64 --latency 0.3
+    python -m benchmarks.gnews_fetch_benchmark --live --keyword Jalisco --chunks 16
+"""
+import random
+import argparse
+import threading
+from time import sleep, perf_counter
+from datetime import datetime, timedelta
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+
+import google_news_production
+from google_news_production import _fetch_range, _get_engine
+
+ARTICLES_PER_CHUNK = 20
+
+class StubGNews:
+    # serves articles dated inside the window the engine holds when the response arrives
+    proxy_locks = defaultdict(threading.Lock)
+    latency = 0.3
+
+    def __init__(self, language: str = "en", country: str = "US", max_results: int = 100, proxy: str = None):
+        self.proxy = proxy
+        self.start_date = None
+        self.end_date = None
+
+    def get_news(self, keyword: str) -> list[dict]:
+        with self.proxy_locks[self.proxy]:
+            sleep(self.latency * random.uniform(0.5, 1.5))
+        published = datetime(*self.start_date) + timedelta(hours=12)
+        return [
+            {"url": f'https://news.example/{keyword}/{published.date()}/{i}', "published date": published.strftime("%a, %d %b %Y %H:%M:%S GMT")}
+            for i in range(ARTICLES_PER_CHUNK)
+        ]
+
+def build_intervals(chunks: int, chunk_days: int) -> list[tuple[datetime, datetime]]:
+    start = datetime(2020, 1, 1)
+    return [(start + timedelta(days=chunk_days * i), start + timedelta(days=chunk_days * (i + 1))) for i in range(chunks)]
+
+def wrong_window(articles: list[dict], start: datetime, end: datetime) -> bool:
+    # Google News dates are not exact, allow a day around the window
+    for article in articles:
+        published = datetime.strptime(article["published date"], "%a, %d %b %Y %H:%M:%S GMT")
+        if not start - timedelta(days=1) <= published <= end + timedelta(days=1):
+            return True
+    return False
+
+def run(keyword: str, intervals: list, proxies: list[str], workers: int) -> tuple[float, int, int]:
+    with ThreadPoolExecutor(max_workers=workers) as exe:
+        start = perf_counter()
+        futures = [
+            (exe.submit(_fetch_range, keyword, s, e, proxies[i % len(proxies)]), s, e)
+            for i, (s, e) in enumerate(intervals)
+        ]
+        # a failed request counts as no articles here
+        results = [(future.result() or [], s, e) for future, s, e in futures]
+        elapsed = perf_counter() - start
+
+    articles = sum(len(result) for result, _, _ in results)
+    wrong = sum(wrong_window(result, s, e) for result, s, e in results)
+    return elapsed, articles, wrong
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--live", action="store_true", help="query Google News instead of the stand-in")
+    parser.add_argument("--keyword", default="Jalisco")
+    parser.add_argument("--proxies", type=int, default=8, help="stand-in proxies, --live uses files/proxies.txt")
+    parser.add_argument("--chunks", type=int, default=64)
+    parser.add_argument("--chunk-days", type=int, default=10)
+    parser.add_argument("--latency", type=float, default=0.3, help="stand-in seconds per request")
+    args = parser.parse_args()
+
+    if args.live:
+        proxies = google_news_production.proxy_pool.proxies
+    else:
+        google_news_production.GNews = StubGNews
+        StubGNews.latency = args.latency
+        proxies = [f'http://proxy-{i}:8080' for i in range(args.proxies)]
+
+    intervals = build_intervals(args.chunks, args.chunk_days)
+    workers = sorted({1, *(2 ** i for i in range(len(proxies).bit_length())), len(proxies), 2 * len(proxies)})
+
+    print(f'{len(intervals)} chunks of {args.chunk_days} days, {len(proxies)} proxies')
+    print(f'{"engines":>10} {"workers":>8} {"time, s":>9} {"chunks/s":>9} {"articles":>9} {"wrong window":>13}')
+    for engines in ["per worker", "shared"]:
+        if engines == "shared":
+            shared = {}
+            google_news_production._get_engine = lambda proxy: shared.setdefault("engine", _get_engine(proxy))
+        for count in workers:
+            elapsed, articles, wrong = run(args.keyword, intervals, proxies, count)
+            print(f'{engines:>10} {count:>8} {elapsed:>9.2f} {len(intervals) / elapsed:>9.1f} {articles:>9} {wrong:>13}')
+        if args.live:
+            break
+
+    google_news_production._get_engine = _get_engine
+
+if __name__ == "__main__":
+    main()
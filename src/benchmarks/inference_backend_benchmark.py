@@ -0,0 +1,145 @@
+"""
+Compares the CPU inference backends (torch, int8, onnx) of the YouTube and Telegram classifiers.
+
+Every backend runs in its own interpreter with an empty embedding cache and reports texts/s
+and peak RSS. Its dimensions and sentiment scores are then checked against the torch backend
+on the same fixed sample. The exit code is 1 if any backend agrees on fewer labels than
+--min-agreement, or if any of its similarity scores differs from torch by more than
+--max-score-diff. Run from src/:
+    python -m benchmarks.inference_backend_benchmark --backends torch int8 onnx --texts 2000
+"""
+import os
+import sys
+import json
+import random
+import argparse
+import resource
+import tempfile
+import subprocess
+from time import perf_counter
+
+import numpy as np
+
+REFERENCE_BACKEND = "torch"
+
+DIMENSIONS = {
+    "INCOME": "empleo trabajo salario ingresos dinero economía sueldo desempleo",
+    "ACCESS TO HEALTH SERVICES": "salud médico hospital medicina tratamiento atención clínica seguro",
+    "EDUCATIONAL LAG": "educación escuela universidad maestro estudiante clases deserción escolar",
+    "HOUSING": "vivienda casa renta servicios agua luz hacinamiento colonia",
+    "ACCESS TO FOOD": "alimentación comida canasta básica precios alimentos nutrición",
+}
+
+FILLER_WORDS = """
+el la los que de en por para con muy bien mal gobierno presidente municipio semana
+excelente terrible nunca siempre gracias todos nadie mejor peor video noticia
+""".split()
+
+def build_sample(count: int, seed: int = 7) -> list[str]:
+    # short and long texts mixing dimension keywords with filler words
+    random.seed(seed)
+    keywords = " ".join(DIMENSIONS.values()).split()
+    return [
+        " ".join(random.choices(keywords, k=random.randint(1, 6)) + random.choices(FILLER_WORDS, k=random.randint(5, 120)))
+        for _ in range(count)
+    ]
+
+def peak_rss_mb() -> float:
+    # ru_maxrss is in kilobytes on Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+def run_worker(backend: str, texts: list[str], output: str):
+    # executed in a child process, so RSS and load time belong to one backend only
+    from yt_production import TextProcessor
+    from tg_production import PovertyDimensionClassifier
+
+    start = perf_counter()
+    processor = TextProcessor(DIMENSIONS, backend=backend)
+    classifier = PovertyDimensionClassifier(DIMENSIONS, backend=backend)
+    load_time = perf_counter() - start
+
+    clean_texts = [processor.clean_text(text) for text in texts]
+    start = perf_counter()
+    yt_dimensions, yt_scores = processor.classify_dimensions(clean_texts)
+    sentiments = processor.get_sentiment_scores(clean_texts)
+    yt_time = perf_counter() - start
+
+    start = perf_counter()
+    tg_dimensions, tg_scores = classifier.classify_batch(texts)
+    tg_time = perf_counter() - start
+
+    with open(output, "w") as f:
+        json.dump({
+            "load_time": load_time,
+            "yt_texts_per_s": len(texts) / yt_time,
+            "tg_texts_per_s": len(texts) / tg_time,
+            "peak_rss_mb": peak_rss_mb(),
+            "yt_dimensions": yt_dimensions,
+            "yt_scores": yt_scores.tolist(),
+            "sentiments": sentiments.tolist(),
+            "tg_dimensions": tg_dimensions.tolist(),
+            "tg_scores": tg_scores.tolist(),
+        }, f)
+
+def run_backend(backend: str, count: int) -> dict:
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        output = os.path.join(tmp_dir, "result.json")
+        env = dict(os.environ, EMBEDDING_CACHE_DIR=os.path.join(tmp_dir, "cache"))
+        subprocess.run(
+            [sys.executable, "-m", "benchmarks.inference_backend_benchmark", "--worker", backend, "--texts", str(count), "--output", output],
+            env=env,
+            check=True
+        )
+        with open(output) as f:
+            return json.load(f)
+
+def parity(result: dict, reference: dict) -> dict:
+    return {
+        "yt_dimension": np.mean(np.array(result["yt_dimensions"]) == np.array(reference["yt_dimensions"])),
+        "yt_max_cos_diff": np.max(np.abs(np.array(result["yt_scores"]) - np.array(reference["yt_scores"]))),
+        "sentiment": np.mean(np.array(result["sentiments"]) == np.array(reference["sentiments"])),
+        "tg_dimension": np.mean(np.array(result["tg_dimensions"]) == np.array(reference["tg_dimensions"])),
+        "tg_max_cos_diff": np.max(np.abs(np.array(result["tg_scores"]) - np.array(reference["tg_scores"]))),
+    }
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--backends", nargs="+", default=["torch", "int8", "onnx"])
+    parser.add_argument("--texts", type=int, default=2000)
+    parser.add_argument("--min-agreement", type=float, default=0.95, help="share of labels equal to the torch backend")
+    parser.add_argument("--max-score-diff", type=float, default=0.05, help="largest absolute difference of a similarity score to the torch backend")
+    parser.add_argument("--worker", help=argparse.SUPPRESS)
+    parser.add_argument("--output", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        run_worker(args.worker, build_sample(args.texts), args.output)
+        return
+
+    backends = [REFERENCE_BACKEND] + [backend for backend in args.backends if backend != REFERENCE_BACKEND]
+    results = {backend: run_backend(backend, args.texts) for backend in backends}
+    reference = results[REFERENCE_BACKEND]
+
+    print(f'{args.texts} texts')
+    print(f'{"backend":>8} {"load, s":>8} {"yt texts/s":>11} {"tg texts/s":>11} {"peak RSS, MB":>13} '
+          f'{"yt dim":>7} {"max Δcos":>9} {"stars":>7} {"tg dim":>7} {"tg Δcos":>8}')
+    failed = False
+    for backend, result in results.items():
+        check = parity(result, reference)
+        print(
+            f'{backend:>8} {result["load_time"]:>8.1f} {result["yt_texts_per_s"]:>11.1f} {result["tg_texts_per_s"]:>11.1f} '
+            f'{result["peak_rss_mb"]:>13.0f} {check["yt_dimension"]:>7.1%} {check["yt_max_cos_diff"]:>9.4f} '
+            f'{check["sentiment"]:>7.1%} {check["tg_dimension"]:>7.1%} {check["tg_max_cos_diff"]:>8.4f}'
+        )
+        failed |= min(check["yt_dimension"], check["sentiment"], check["tg_dimension"]) < args.min_agreement
+        failed |= max(check["yt_max_cos_diff"], check["tg_max_cos_diff"]) > args.max_score_diff
+
+    if failed:
+        print(
+            f'Some backend agrees with {REFERENCE_BACKEND} on less than {args.min_agreement:.0%} of the labels '
+            f'or has a score more than {args.max_score_diff} away from it'
+        )
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
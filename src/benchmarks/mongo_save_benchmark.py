@@ -0,0 +1,91 @@
+"""
+Measures save_new_channel_posts latency as the collection grows, against the previous
+approach that downloaded all existing ids before every insert.
+
+Needs a running MongoDB configured through the usual MONGO_* variables. Writes into a
+separate database that is dropped at the end. Run from src/:
+    python -m benchmarks.mongo_save_benchmark --sizes 10000 100000 1000000 5000000
+"""
+import os
+import argparse
+from time import perf_counter
+
+import pymongo
+from dotenv import load_dotenv
+
+from mongo_wrapper.mongo_wrapper import MongoWrapper, serialize_posts
+from text_objects.telegram import Post
+
+load_dotenv()
+
+BENCHMARK_DB = "benchmark_saves"
+COLLECTION = "benchmark_channel"
+SEED_BATCH = 10_000
+
+def make_posts(start: int, count: int) -> list[Post]:
+    return [
+        Post(id=i, text=f'Publicación de prueba número {i} sobre Jalisco', author=1, posting_ts=1_600_000_000 + i, comments=[])
+        for i in range(start, start + count)
+    ]
+
+def seed(collection, current: int, target: int) -> None:
+    # grow the collection with raw documents shaped like serialized posts
+    for start in range(current, target, SEED_BATCH):
+        docs = serialize_posts(make_posts(start, min(SEED_BATCH, target - start)))
+        for doc in docs:
+            doc["_id"] = doc.pop("id")
+        collection.insert_many(docs, ordered=False)
+
+def legacy_save(collection, posts: list[Post]) -> None:
+    # previous behaviour: materialize the whole collection to find existing ids
+    docs = serialize_posts(posts)
+    for doc in docs:
+        doc["_id"] = doc.pop("id")
+    existing_ids = {post["_id"] for post in collection.find()}
+    new_docs = [doc for doc in docs if doc["_id"] not in existing_ids]
+    if new_docs:
+        collection.insert_many(new_docs)
+
+def timed(func, *args, **kwargs) -> float:
+    start = perf_counter()
+    func(*args, **kwargs)
+    return perf_counter() - start
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10_000, 100_000, 1_000_000, 5_000_000])
+    parser.add_argument("--batch", type=int, default=1000, help="posts per save, half of them already stored")
+    args = parser.parse_args()
+
+    user, password = os.getenv("MONGO_USERNAME"), os.getenv("MONGO_PASSWORD")
+    ip, port = os.getenv("MONGO_IP", "localhost"), os.getenv("MONGO_PORT", 27017)
+    raw_client = pymongo.MongoClient(f'mongodb://{user}:{password}@{ip}:{port}/')
+    collection = raw_client[BENCHMARK_DB][COLLECTION]
+    collection.drop()
+    seed(collection, 0, 1)
+
+    mongo_client = MongoWrapper(db=BENCHMARK_DB, user=user, password=password, ip=ip, port=port)
+
+    current = 1
+    next_id = max(args.sizes) + 1
+    print(f'{"documents":>12} {"legacy, s":>12} {"indexed, s":>12}')
+    try:
+        for size in sorted(args.sizes):
+            seed(collection, current, size)
+            current = size
+
+            # half of every batch already exists, half is new
+            half = args.batch // 2
+            legacy_posts = make_posts(size - half, half) + make_posts(next_id, half)
+            next_id += half
+            indexed_posts = make_posts(size - half, half) + make_posts(next_id, half)
+            next_id += half
+
+            legacy = timed(legacy_save, collection, legacy_posts)
+            indexed = timed(mongo_client.save_new_channel_posts, COLLECTION, indexed_posts)
+            print(f'{size:>12,} {legacy:>12.3f} {indexed:>12.3f}')
+    finally:
+        raw_client.drop_database(BENCHMARK_DB)
+
+if __name__ == "__main__":
+    main()
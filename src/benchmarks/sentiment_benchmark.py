@@ -0,0 +1,61 @@
+"""
+Compares per-text sentiment scoring with batched get_sentiment_scores on synthetic comments.
+
+Downloads the YouTube pipeline models on first run. Run from src/:
+    python -m benchmarks.sentiment_benchmark --comments 2000 --batch-sizes 8 16 32 64
+"""
+import random
+import argparse
+from time import perf_counter
+
+import numpy as np
+import torch
+
+from yt_production import TextProcessor
+
+WORDS = """
+el la los que de en por para con muy bien mal precio salario trabajo gobierno salud escuela
+comida renta casa agua luz vecinos apoyo hospital medicinas maestros empleo pobreza gracias
+excelente terrible video información buena mala mejor peor nunca siempre todos nadie
+""".split()
+
+def build_comments(count: int, seed: int = 42) -> list[str]:
+    # comment lengths are skewed like real ones: mostly short, some long
+    random.seed(seed)
+    return [
+        " ".join(random.choices(WORDS, k=min(400, int(random.paretovariate(1.2) * 6))))
+        for _ in range(count)
+    ]
+
+def timed(func, *args, **kwargs):
+    start = perf_counter()
+    result = func(*args, **kwargs)
+    return result, perf_counter() - start
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--comments", type=int, default=2000)
+    parser.add_argument("--batch-sizes", type=int, nargs="+", default=[8, 16, 32, 64])
+    parser.add_argument("--threads", type=int, default=None, help="torch intra-op threads")
+    args = parser.parse_args()
+
+    if args.threads:
+        torch.set_num_threads(args.threads)
+
+    processor = TextProcessor({"INCOME": "empleo salario"})
+    comments = build_comments(args.comments)
+    print(f'{len(comments)} comments, torch threads: {torch.get_num_threads()}')
+
+    per_text, baseline = timed(lambda: np.array([processor.get_sentiment_score(text) for text in comments]))
+    print(f'{"per-text":>12}: {baseline:8.2f} s {len(comments) / baseline:10.1f} comments/s')
+
+    for batch_size in args.batch_sizes:
+        batched, elapsed = timed(processor.get_sentiment_scores, comments, batch_size=batch_size)
+        agreement = np.mean(batched == per_text)
+        print(
+            f'{f"batch {batch_size}":>12}: {elapsed:8.2f} s {len(comments) / elapsed:10.1f} comments/s '
+            f'speedup {baseline / elapsed:5.1f}x, same scores {agreement:.1%}'
+        )
+
+if __name__ == "__main__":
+    main()
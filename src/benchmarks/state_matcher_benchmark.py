@@ -0,0 +1,70 @@
+"""
+Compares per-state regex matching with the single-pass StateMatcher on a synthetic corpus.
+
+Run from src/:
+    python -m benchmarks.state_matcher_benchmark --posts 1000000
+"""
+import re
+import random
+import argparse
+from time import perf_counter
+
+from state_matcher import StateMatcher
+
+STATES = [
+    "Aguascalientes", "Baja California", "Baja California Sur", "Campeche", "Chiapas", "Chihuahua",
+    "Ciudad de México", "Coahuila", "Colima", "Durango", "Estado de México", "Guanajuato",
+    "Guerrero", "Hidalgo", "Jalisco", "Michoacán", "Morelos", "Nayarit", "Nuevo León", "Oaxaca",
+    "Puebla", "Querétaro", "Quintana Roo", "San Luis Potosí", "Sinaloa", "Sonora", "Tabasco",
+    "Tamaulipas", "Tlaxcala", "Veracruz", "Yucatán", "Zacatecas"]
+
+FILLER_WORDS = """
+el la los las de del en por para con sin gobierno presidente secretaría economía salud hospital
+empleo salario precios inflación semana municipio alcalde elecciones seguridad lluvias escuelas
+programa apoyo vivienda agua carretera colimador sonorense jaliscience méxico
+""".split()
+
+def build_corpus(posts: int, seed: int = 42) -> list[str]:
+    # posts of 10-80 words with 0-3 state mentions in random case, some of them glued to other words
+    random.seed(seed)
+    corpus = []
+    for _ in range(posts):
+        words = random.choices(FILLER_WORDS, k=random.randint(10, 80))
+        for _ in range(random.randint(0, 3)):
+            state = random.choice(STATES)
+            state = random.choice([state, state.upper(), state.lower(), f'{state}s', f'#{state}'])
+            words.insert(random.randint(0, len(words)), state)
+        corpus.append(" ".join(words))
+    return corpus
+
+def match_per_state(corpus: list[str]) -> list[list[str]]:
+    # previous approach: one compiled \bState\b regex per state against every post
+    state_patterns = {
+        state: re.compile(r'\b' + re.escape(state) + r'\b', re.IGNORECASE)
+        for state in STATES}
+    return [[state for state, pattern in state_patterns.items() if pattern.search(text)] for text in corpus]
+
+def match_single_pass(corpus: list[str]) -> list[list[str]]:
+    state_matcher = StateMatcher(STATES)
+    return [state_matcher.find(text) for text in corpus]
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--posts", type=int, default=1_000_000)
+    args = parser.parse_args()
+
+    corpus = build_corpus(args.posts)
+    print(f'Corpus: {len(corpus)} posts, {len(STATES)} states')
+
+    results = {}
+    for name, matcher in [("per-state regex", match_per_state), ("single-pass matcher", match_single_pass)]:
+        start = perf_counter()
+        results[name] = matcher(corpus)
+        elapsed = perf_counter() - start
+        print(f'{name:>20}: {elapsed:8.2f} s ({len(corpus) / elapsed:,.0f} posts/s)')
+
+    mismatches = sum(a != b for a, b in zip(*results.values()))
+    print(f'Posts with different matches: {mismatches}')
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,68 @@
+"""
+Compares sequential and concurrent fetching of the analyze_all_states request mix (one search per
+state and term, then comments of every found video) against the local stub server.
+
+Run from src/:
+    python -m benchmarks.yt_fetch_benchmark --states 32 --latency 0.2 --concurrency 8
+"""
+import asyncio
+import argparse
+from time import perf_counter
+
+from yt_client.yt_api import YouTubeAPI, QuotaLimiter
+from benchmarks.yt_stub_server import start_stub_server, BASE_PATH
+
+TERMS = ["noticias", "news", "economía"]
+VIDEOS_PER_SEARCH = 5
+COMMENTS_PER_VIDEO = 10
+
+def fetch_sequential(api: YouTubeAPI, queries: list[str]) -> int:
+    texts = 0
+    for query in queries:
+        videos = api.paginate("search", VIDEOS_PER_SEARCH, q=query, part="snippet", type="video")
+        for video in videos:
+            texts += 1 + len(api.paginate("commentThreads", COMMENTS_PER_VIDEO, part="snippet", videoId=video["id"]["videoId"]))
+    return texts
+
+async def fetch_concurrent(api: YouTubeAPI, queries: list[str]) -> int:
+    async def fetch_query(query):
+        videos = await api.apaginate("search", VIDEOS_PER_SEARCH, q=query, part="snippet", type="video")
+        comments = await asyncio.gather(*(
+            api.apaginate("commentThreads", COMMENTS_PER_VIDEO, part="snippet", videoId=video["id"]["videoId"])
+            for video in videos
+        ))
+        return len(videos) + sum(map(len, comments))
+
+    return sum(await asyncio.gather(*(fetch_query(query) for query in queries)))
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--states", type=int, default=32)
+    parser.add_argument("--latency", type=float, default=0.2, help="stub server seconds per response")
+    parser.add_argument("--error-rate", type=float, default=0.02)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--quota-per-second", type=float, default=10_000, help="token bucket rate, high to measure the fetch engine only")
+    args = parser.parse_args()
+
+    server = start_stub_server(latency=args.latency, error_rate=args.error_rate, comments_per_video=COMMENTS_PER_VIDEO)
+    base_url = f'http://localhost:{server.server_port}{BASE_PATH}'
+    queries = [f'State{i} {term}' for i in range(args.states) for term in TERMS]
+
+    print(f'{len(queries)} searches, stub latency {args.latency} s, error rate {args.error_rate:.0%}')
+    print(f'{"mode":>12} {"time, s":>9} {"texts":>7} {"requests":>9} {"retries":>8} {"quota":>7}')
+    for name, concurrency in [("sequential", 1), ("concurrent", args.concurrency)]:
+        # the stub does not count against the real quota, so the daily budget is not binding here
+        limiter = QuotaLimiter(daily_budget=10 ** 9, rate=args.quota_per_second, burst=10_000)
+        api = YouTubeAPI("stub", base_url=base_url, limiter=limiter, max_concurrency=concurrency, use_cache=False)
+
+        start = perf_counter()
+        texts = fetch_sequential(api, queries) if concurrency == 1 else asyncio.run(fetch_concurrent(api, queries))
+        elapsed = perf_counter() - start
+
+        stats = api.stats()
+        print(f'{name:>12} {elapsed:>9.2f} {texts:>7} {stats["requests"]:>9} {stats["retries"]:>8} {stats["spent"]:>7}')
+
+    server.shutdown()
+
+if __name__ == "__main__":
+    main()
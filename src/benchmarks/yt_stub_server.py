@@ -0,0 +1,160 @@
+"""
+Local stand-in for the YouTube Data API v3 (search, commentThreads, videos, channels).
+
+Responses are deterministic for the same parameters, paginated with nextPageToken, carry an ETag
+(304 on a matching If-None-Match), are delayed by --latency seconds and fail with 429/500 at
+--error-rate, so retries are exercised too. Point the clients to it with YT_API_BASE_URL.
+Run from src/:
+    python -m benchmarks.yt_stub_server --port 8089 --latency 0.2
+    YT_API_BASE_URL=http://localhost:8089/youtube/v3 python ...
+"""
+import json
+import random
+import argparse
+import threading
+from time import sleep
+from hashlib import md5
+from urllib.parse import urlparse, parse_qs
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+BASE_PATH = "/youtube/v3"
+
+def _id(*parts) -> str:
+    return md5("|".join(map(str, parts)).encode()).hexdigest()[:11]
+
+def _page(params: dict, total: int, make_item) -> dict:
+    # offset-based pages, the token is the offset of the next page
+    offset = int(params.get("pageToken", 0) or 0)
+    size = min(int(params.get("maxResults", 5)), total - offset)
+    response = {
+        "pageInfo": {"totalResults": total, "resultsPerPage": size},
+        "items": [make_item(i) for i in range(offset, offset + size)]
+    }
+    if offset + size < total:
+        response["nextPageToken"] = str(offset + size)
+    return response
+
+class StubHandler(BaseHTTPRequestHandler):
+    # set by start_stub_server
+    latency = 0.0
+    error_rate = 0.0
+    videos_per_query = 50
+    comments_per_video = 20
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send(self, status: int, body: dict):
+        if status == 200:
+            etag = f'"{md5(json.dumps(body, sort_keys=True).encode()).hexdigest()}"'
+            if self.headers.get("If-None-Match") == etag:
+                self.send_response(304)
+                self.send_header("ETag", etag)
+                self.end_headers()
+                return
+            body = {"etag": etag, **body}
+
+        payload = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        if status == 200:
+            self.send_header("ETag", etag)
+        self.end_headers()
+        self.wfile.write(payload)
+
+    @staticmethod
+    def _comment(video_id: str, n: int) -> dict:
+        snippet = {
+            "videoId": video_id,
+            "textDisplay": f'Comentario {n} sobre el empleo y los precios',
+            "textOriginal": f'Comentario {n} sobre el empleo y los precios',
+            "publishedAt": f'2021-01-01T{n // 3600 % 24:02d}:{n // 60 % 60:02d}:{n % 60:02d}Z'
+        }
+        return {
+            "kind": "youtube#commentThread",
+            "id": _id(video_id, "comment", n),
+            "snippet": {
+                "videoId": video_id,
+                "topLevelComment": {"id": _id(video_id, "comment", n), "snippet": snippet}
+            }
+        }
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        params = {key: values[0] for key, values in parse_qs(url.query).items()}
+        endpoint = url.path.removeprefix(BASE_PATH).strip("/")
+        sleep(self.latency)
+
+        if random.random() < self.error_rate:
+            status, reason = random.choice([(429, "rateLimitExceeded"), (500, "backendError")])
+            return self._send(status, {"error": {"code": status, "message": reason, "errors": [{"reason": reason}]}})
+
+        if endpoint == "search":
+            query = params.get("q") or params.get("channelId", "")
+            return self._send(200, _page(params, self.videos_per_query, lambda i: {
+                "kind": "youtube#searchResult",
+                "id": {"kind": "youtube#video", "videoId": _id(query, i)},
+                "snippet": {
+                    "title": f'{query} video {i}',
+                    "description": f'Descripción del video {i} sobre {query}',
+                    "publishedAt": f'2020-{i % 12 + 1:02d}-{i % 28 + 1:02d}T12:00:00Z',
+                    "channelTitle": "stub"
+                }
+            }))
+
+        if endpoint == "commentThreads":
+            # newest first like order=time, comment n is posted n seconds after the first one,
+            # so raising comments_per_video adds new comments on top of the existing ones
+            video_id = params.get("videoId", "")
+            return self._send(200, _page(params, self.comments_per_video, lambda i: self._comment(video_id, self.comments_per_video - i)))
+
+        if endpoint == "videos":
+            ids = [video_id for video_id in params.get("id", "").split(",") if video_id]
+            return self._send(200, {"items": [
+                {
+                    "kind": "youtube#video",
+                    "id": video_id,
+                    "statistics": {"viewCount": str(len(video_id) * 1000), "likeCount": "10", "commentCount": str(self.comments_per_video)},
+                    "contentDetails": {"duration": "PT4M13S", "definition": "hd", "caption": "false"}
+                }
+                for video_id in ids
+            ]})
+
+        if endpoint == "channels":
+            return self._send(200, {"items": [{"id": f'UC{_id(params.get("forHandle", ""))}'}]})
+
+        self._send(404, {"error": {"code": 404, "message": f'Unknown endpoint {endpoint}', "errors": [{"reason": "notFound"}]}})
+
+def start_stub_server(port: int = 0, latency: float = 0.0, error_rate: float = 0.0, videos_per_query: int = 50, comments_per_video: int = 20) -> ThreadingHTTPServer:
+    """
+    :param port: port to listen on, 0 for any free port
+    :param latency: seconds added to every response
+    :param error_rate: share of requests answered with 429 or 500
+
+    Starts the server in a daemon thread, its base url is f'http://localhost:{server.server_port}{BASE_PATH}'
+    """
+    handler = type("ConfiguredStubHandler", (StubHandler,), {
+        "latency": latency,
+        "error_rate": error_rate,
+        "videos_per_query": videos_per_query,
+        "comments_per_video": comments_per_video
+    })
+    server = ThreadingHTTPServer(("localhost", port), handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--port", type=int, default=8089)
+    parser.add_argument("--latency", type=float, default=0.2)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    args = parser.parse_args()
+
+    server = start_stub_server(args.port, args.latency, args.error_rate)
+    print(f'Serving on http://localhost:{server.server_port}{BASE_PATH}')
+    threading.Event().wait()
+
+if __name__ == "__main__":
+    main()
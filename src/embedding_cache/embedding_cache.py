@@ -0,0 +1,254 @@
+import os
+import re
+import atexit
+import threading
+from hashlib import blake2b
+
+import numpy as np
+
+from logger.logger import Logger
+
+EMBEDDING_CACHE_DIR = os.getenv("EMBEDDING_CACHE_DIR", ".embedding_cache")
+EMBEDDING_CACHE_MAX_ROWS = int(os.getenv("EMBEDDING_CACHE_MAX_ROWS", 1_000_000))
+
+# Rows allocated when a cache is created, the files double as it fills up to EMBEDDING_CACHE_MAX_ROWS
+INITIAL_ROWS = 4096
+
+# Share of the cache freed at once when it is full, so eviction is not paid on every miss
+EVICTION_SHARE = 0.1
+
+# Persist the new rows after this many of them
+FLUSH_EVERY = 1024
+
+# Bytes of the text hash that keys a row
+KEY_SIZE = 16
+
+# Files of one cache: the float16 vectors, the key and the last access tick of every row
+CACHE_FILES = ("embeddings.f16", "keys.u8", "ticks.i64")
+
+_caches: dict[tuple[str, str], "EmbeddingCache"] = {}
+_caches_lock = threading.Lock()
+
+def hash_text(text: str) -> bytes:
+    # 16-byte digest of the cleaned text, used as the row key
+    return blake2b(text.encode("utf-8"), digest_size=KEY_SIZE).digest()
+
+class EmbeddingCache:
+    def __init__(self, model_name: str, dim: int, backend: str = "torch", cache_dir: str = EMBEDDING_CACHE_DIR, max_rows: int = EMBEDDING_CACHE_MAX_ROWS):
+        self.model_name = model_name
+        self.backend = backend
+        self.dim = dim
+        self.max_rows = max_rows
+
+        # One directory per model and inference backend (quantized or exported models give slightly
+        # different vectors), so the (model name, backend, text hash) triple is the cache key
+        self.path = os.path.join(cache_dir, re.sub(r'[^\w.-]', '_', model_name), backend)
+        os.makedirs(self.path, exist_ok=True)
+
+        self.logger = Logger(logger_type="embedding_cache", stream_handler=False)
+
+        self.lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.dirty = 0
+
+        self._open()
+        atexit.register(self.flush)
+
+    def _files(self) -> list[tuple[str, type, tuple]]:
+        # path, dtype and row shape of every cache file, in CACHE_FILES order
+        return [
+            (os.path.join(self.path, CACHE_FILES[0]), np.float16, (self.dim,)),
+            (os.path.join(self.path, CACHE_FILES[1]), np.uint8, (KEY_SIZE,)),
+            (os.path.join(self.path, CACHE_FILES[2]), np.int64, ())
+        ]
+
+    def _stored_rows(self) -> int:
+        # rows of the existing files, 0 if one is missing or they do not agree
+        rows = set()
+        for path, dtype, shape in self._files():
+            if not os.path.exists(path):
+                return 0
+            row_size = np.dtype(dtype).itemsize * int(np.prod(shape))
+            size = os.path.getsize(path)
+            if size % row_size:
+                return 0
+            rows.add(size // row_size)
+        count = rows.pop() if len(rows) == 1 else 0
+        return count if 0 < count <= self.max_rows else 0
+
+    def _map(self, rows: int):
+        # resize the files to rows (added rows read as zeros, i.e. free) and map them
+        mapped = []
+        for path, dtype, shape in self._files():
+            with open(path, "ab") as f:
+                f.truncate(rows * np.dtype(dtype).itemsize * int(np.prod(shape)))
+            mapped.append(np.memmap(path, dtype=dtype, mode="r+", shape=(rows, *shape)))
+        self.matrix, self.keys, self.ticks = mapped
+        self.capacity = rows
+
+    def _open(self):
+        rows = self._stored_rows()
+        if not rows:
+            if any(os.path.exists(path) for path, _, _ in self._files()):
+                self.logger.log(f'Cache for {self.model_name} has a different shape, rebuilding', level="warning")
+                for path, _, _ in self._files():
+                    if os.path.exists(path):
+                        os.remove(path)
+            rows = min(INITIAL_ROWS, self.max_rows)
+        self._map(rows)
+
+        # a row is valid once its key is written, which happens only after its vector is on disk
+        used = (self.ticks != 0) & self.keys.any(axis=1)
+        used_rows = np.flatnonzero(used)
+        self.index = {self.keys[row].tobytes(): int(row) for row in used_rows}
+        self.free_rows = np.flatnonzero(~used).tolist()[::-1]
+        self.tick = int(self.ticks[used_rows].max()) if len(used_rows) else 0
+
+        # row -> key of rows stored since the last flush
+        self.pending = {}
+
+        self.logger.log(f'Opened embedding cache for {self.model_name} with {len(self.index)} rows', level="info")
+
+    def _grow(self, needed: int):
+        # Double the files (at least enough for needed rows), capped at max_rows
+        old = self.capacity
+        rows = min(self.max_rows, max(2 * old, old + needed - len(self.free_rows)))
+        for array in (self.matrix, self.keys, self.ticks):
+            array.flush()
+        self._map(rows)
+        # new rows are handed out after the free ones, lowest first
+        self.free_rows[:0] = range(rows - 1, old - 1, -1)
+
+    def _evict(self, needed: int):
+        # Free the least recently used rows (at least EVICTION_SHARE of the cache)
+        count = min(len(self.index), max(needed - len(self.free_rows), int(self.max_rows * EVICTION_SHARE)))
+        if count <= 0:
+            return
+
+        used_rows = np.fromiter(self.index.values(), dtype=np.int64, count=len(self.index))
+        oldest = used_rows[np.argpartition(self.ticks[used_rows], count - 1)[:count]]
+        for row in oldest.tolist():
+            key = self.pending.pop(row, None) or self.keys[row].tobytes()
+            del self.index[key]
+        self.keys[oldest] = 0
+        self.ticks[oldest] = 0
+        # the old keys must be gone on disk before the rows get other vectors
+        self.keys.flush()
+        self.ticks.flush()
+        self.free_rows.extend(oldest.tolist())
+        self.evictions += count
+
+    def _store(self, keys: list[bytes], embeddings: np.ndarray):
+        # Never cache more than fits, keep the last rows of the batch
+        keys = keys[-self.max_rows:]
+        embeddings = embeddings[-self.max_rows:]
+
+        if len(self.free_rows) < len(keys) and self.capacity < self.max_rows:
+            self._grow(len(keys))
+        if len(self.free_rows) < len(keys):
+            self._evict(len(keys))
+
+        self.tick += 1
+        rows = [self.free_rows.pop() for _ in keys]
+        self.matrix[rows] = embeddings.astype(np.float16)
+        self.ticks[rows] = self.tick
+        # keys are written on flush, after the vectors
+        for key, row in zip(keys, rows):
+            self.index[key] = row
+            self.pending[row] = key
+
+        self.dirty += len(keys)
+        if self.dirty >= FLUSH_EVERY:
+            self._flush()
+
+    def encode(self, model, texts: list[str], batch_size: int = 64) -> np.ndarray:
+        """
+        :param model: SentenceTransformer used for texts that are not cached yet
+        :param texts: cleaned texts
+        :param batch_size: batch size for the model
+
+        Returns float32 embeddings of shape (len(texts), dim), encoding only cache misses
+        """
+        keys = [hash_text(text) for text in texts]
+        result = np.empty((len(texts), self.dim), dtype=np.float32)
+
+        with self.lock:
+            self.tick += 1
+            missing = {}
+            for i, key in enumerate(keys):
+                row = self.index.get(key)
+                if row is None:
+                    missing.setdefault(key, []).append(i)
+                    continue
+                result[i] = self.matrix[row]
+                self.ticks[row] = self.tick
+                self.hits += 1
+            self.misses += sum(len(positions) for positions in missing.values())
+
+        if not missing:
+            return result
+
+        missing_keys = list(missing.keys())
+        new_embeddings = model.encode(
+            [texts[missing[key][0]] for key in missing_keys],
+            batch_size=batch_size,
+            convert_to_numpy=True
+        )
+        for key, embedding in zip(missing_keys, new_embeddings):
+            result[missing[key]] = embedding
+
+        with self.lock:
+            # Another thread may have stored some of these keys meanwhile
+            new_keys = [(i, key) for i, key in enumerate(missing_keys) if key not in self.index]
+            if new_keys:
+                self._store([key for _, key in new_keys], new_embeddings[[i for i, _ in new_keys]])
+
+        return result
+
+    def _flush(self):
+        # only the pages written since the last flush go to disk, vectors before the keys that validate them
+        self.matrix.flush()
+        if self.pending:
+            rows = list(self.pending)
+            self.keys[rows] = np.frombuffer(b"".join(self.pending.values()), dtype=np.uint8).reshape(-1, KEY_SIZE)
+            self.pending = {}
+        self.keys.flush()
+        self.ticks.flush()
+        self.dirty = 0
+
+    def flush(self):
+        # Persist embeddings and the hash -> row index
+        with self.lock:
+            if self.dirty:
+                self._flush()
+
+    def stats(self) -> dict:
+        total = self.hits + self.misses
+        return {
+            "model": self.model_name,
+            "backend": self.backend,
+            "rows": len(self.index),
+            "capacity": self.capacity,
+            "max_rows": self.max_rows,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / total if total else 0.0,
+            "evictions": self.evictions
+        }
+
+def get_embedding_cache(model_name: str, model, backend: str = "torch") -> EmbeddingCache:
+    """
+    :param model_name: name the model was loaded with
+    :param model: loaded SentenceTransformer, used to read the embedding dimension
+    :param backend: inference backend the model was loaded with
+
+    Returns one cache per model name and backend for the whole process
+    """
+    with _caches_lock:
+        key = (model_name, backend)
+        if key not in _caches:
+            _caches[key] = EmbeddingCache(model_name, dim=model.get_sentence_embedding_dimension(), backend=backend)
+        return _caches[key]
@@ -1,22 +1,18 @@
 import random
-from time import sleep
-from itertools import cycle
+from time import sleep, monotonic
 from concurrent.futures import ThreadPoolExecutor, as_completed
 
 from tqdm import tqdm
 from googlenewsdecoder import gnewsdecoder
 from mongo_wrapper.mongo_wrapper import MongoWrapper
 from logger.logger import Logger
+from proxy_pool import get_proxy_pool, is_throttled
 
 import os
-from pathlib import Path
 from dotenv import load_dotenv
 
 load_dotenv()
 
-# Paths and environment
-proxies_path = Path(__file__).parent / "files/proxies.txt"
-
 # Initialize MongoDB client
 mongo_client = MongoWrapper(
     db="news_outlets_final",
@@ -29,28 +25,29 @@ mongo_client = MongoWrapper(
 # Initialize logger
 debug_logger = Logger(logger_type="url_decoder", stream_handler=False)
 
-# Read proxies from file and cycle through them
-def get_proxies() -> list[str]:
-    with open(proxies_path) as file:
-        lines = [line.strip() for line in file if line.strip()]
-    return [proxy if proxy.startswith("http") else f'http://{proxy}' for proxy in lines]
-
-proxies = get_proxies()
-proxy_cycle = cycle(proxies)
+# Proxies from files/proxies.txt, handed out by health
+proxy_pool = get_proxy_pool()
 
-# Decode a single URL with retry logic
-def decode_url(url: str, proxy: str) -> str | None:
+# Decode a single URL with retry logic, every attempt through another healthy proxy
+def decode_url(url: str) -> str | None:
     attempts = 5
+    proxy = None
     for attempt in range(1, attempts + 1):
+        proxy = proxy_pool.acquire(exclude=(proxy,))
+        requested = monotonic()
         try:
             result = gnewsdecoder(url, proxy=proxy)
             if result and result.get("decoded_url"):
+                proxy_pool.release(proxy, success=True, latency=monotonic() - requested)
                 decoded = result["decoded_url"]
                 debug_logger.log(f"[{proxy}] Decoded {url[:30]}... to {decoded[:30]}...", "info")
                 return decoded
             else:
-                debug_logger.log(f"[{proxy}] No result on attempt {attempt} for {url}", "error")
+                message = (result or {}).get("message", "")
+                proxy_pool.release(proxy, success=False, latency=monotonic() - requested, throttled=is_throttled(message))
+                debug_logger.log(f"[{proxy}] No result on attempt {attempt} for {url}: {message}", "error")
         except Exception as e:
+            proxy_pool.release(proxy, success=False, latency=monotonic() - requested, throttled=is_throttled(e))
             debug_logger.log(f"[{proxy}] Error decoding {url} on attempt {attempt}: {e}", "error")
         sleep(0.1)
     return None
@@ -60,8 +57,7 @@ def process_article(article: dict) -> None:
     if article.get("decoded_url"):
         return
 
-    proxy = next(proxy_cycle)
-    decoded = decode_url(article["url"], proxy)
+    decoded = decode_url(article["url"])
     if decoded:
         try:
             mongo_client.update_collection_entries(
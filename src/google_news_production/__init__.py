@@ -2,20 +2,37 @@
 
 import os
 import time
+import threading
+from collections import deque
 from datetime import datetime, timedelta, date
 from hashlib import sha256
-from itertools import cycle
-from concurrent.futures import ThreadPoolExecutor, as_completed
-from typing import List, Tuple, Dict
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from typing import List, Tuple, Dict, Optional
 
 from gnews import GNews
 from mongo_wrapper.mongo_wrapper import MongoWrapper
 from logger.logger import Logger
-from pathlib import Path
+from proxy_pool import ProxyPool, get_proxy_pool, is_throttled
 from dotenv import load_dotenv
 
 load_dotenv()
 
+# minimum seconds between two requests sent through the same proxy
+GNEWS_PROXY_INTERVAL = float(os.getenv("GNEWS_PROXY_INTERVAL", 1.0))
+
+# workers when max_workers is not given and there is no proxies file (direct connection)
+GNEWS_DIRECT_WORKERS = int(os.getenv("GNEWS_DIRECT_WORKERS", 10))
+
+# Google News returns at most this many articles per query, a full window is split in halves
+GNEWS_MAX_RESULTS = 100
+MIN_WINDOW_DAYS = 1
+
+# consecutive empty windows of a keyword are merged into requests of up to this many chunks
+MAX_MERGED_CHUNKS = 16
+
+# attempts of a window whose request fails (429, network) before it is given up
+GNEWS_WINDOW_ATTEMPTS = int(os.getenv("GNEWS_WINDOW_ATTEMPTS", 5))
+
 MONGO_IP       = os.getenv("MONGO_IP")
 MONGO_PORT     = os.getenv("MONGO_PORT")
 MONGO_DB       = "news_outlets_final"
@@ -32,90 +49,207 @@ mongo_client = MongoWrapper(
 
 fetch_logger = Logger(logger_type="gnews_fetcher", stream_handler=True)
 
-proxies_path = Path(__file__).parent / "files/proxies.txt"
-def _load_proxies() -> cycle:
-    if not proxies_path.exists():
-        return cycle([None])
-    with open(proxies_path) as f:
-        lines = [l.strip() for l in f if l.strip()]
-    formatted = [l if l.startswith("http") else f"http://{l}" for l in lines]
-    return cycle(formatted)
+# shared with the decoders, so a proxy throttled by one of them is avoided by all
+proxy_pool = get_proxy_pool()
+
+# GNews keeps the query window and the proxy on the instance, so an engine is never shared
+# between threads: every worker builds its own, one per proxy it is handed
+_engines = threading.local()
 
-_proxy_cycle = _load_proxies()
+def _get_engine(proxy: str) -> GNews:
+    if not hasattr(_engines, "by_proxy"):
+        _engines.by_proxy = {}
+    if proxy not in _engines.by_proxy:
+        _engines.by_proxy[proxy] = GNews(language="es", country="mx", max_results=GNEWS_MAX_RESULTS, proxy=proxy)
+    return _engines.by_proxy[proxy]
+
+def proxy_count() -> int:
+    return len(proxy_pool)
 
 def _hash_url(url: str) -> str:
     return sha256(url.encode("utf-8")).hexdigest()
 
 def _fetch_range(
-    engine: GNews,
     keyword: str,
     start: datetime,
     end: datetime,
     proxy: str
-) -> List[Dict]:
+) -> Optional[List[Dict]]:
+    # returns None if the request failed, so it is not mistaken for an empty window
+    # the engine belongs to the calling thread, nobody else can move its window before get_news
+    engine = _get_engine(proxy)
     engine.start_date = (start.year, start.month, start.day)
     engine.end_date   = (end.year, end.month, end.day)
-    engine.country    = "mx"
-    engine.language   = "es"
-    engine.max_results= 100
-    if proxy:
-        engine.proxies = {"http": proxy, "https": proxy}
 
+    requested = time.monotonic()
     try:
         raw = engine.get_news(keyword)
         articles = []
         for item in raw:
             item["id"] = _hash_url(item.get("url", "")) 
             articles.append(item)
+        proxy_pool.release(proxy, success=True, latency=time.monotonic() - requested)
         return articles
     except Exception as e:
+        proxy_pool.release(proxy, success=False, latency=time.monotonic() - requested, throttled=is_throttled(e))
         fetch_logger.log(f"[{keyword}] Error {start.date()}–{end.date()}: {e}", "error")
-        return []
+        return None
+
+def _split_range(start_date: date, end_date: date, chunk_days: int) -> List[Tuple[datetime, datetime]]:
+    intervals: List[Tuple[datetime, datetime]] = []
+    cur = datetime(start_date.year, start_date.month, start_date.day)
+    last = datetime(end_date.year, end_date.month, end_date.day)
+    delta = timedelta(days=chunk_days)
+    while cur < last:
+        nxt = min(cur + delta, last)
+        intervals.append((cur, nxt))
+        cur = nxt
+    return intervals
+
+def _fetch_and_save(
+    pool: ProxyPool,
+    proxy_interval: float,
+    keyword: str,
+    start: datetime,
+    end: datetime
+) -> Optional[int]:
+    # runs in a worker: waits for a healthy free proxy, fetches the chunk and persists it right away
+    # returns the number of articles, None if the request or the save failed
+    articles = _fetch_range(keyword, start, end, pool.acquire(min_interval=proxy_interval))
+    if articles is None:
+        return None
+    if not articles:
+        return 0
+    try:
+        saved = mongo_client.save_new_pagination_news(
+            news=articles,
+            collection_name=f"gnews_{keyword}"
+        )
+    except Exception as db_e:
+        fetch_logger.log(f"[{keyword}] DB error {start.date()}–{end.date()}: {db_e}", "error")
+        saved = False
+    # a window that was not saved is retried like a failed request
+    return len(articles) if saved else None
+
+def _next_window(windows: deque, merge: int) -> Tuple[datetime, datetime]:
+    # take the first pending window and glue up to merge - 1 adjacent ones to it
+    start, end = windows.popleft()
+    for _ in range(merge - 1):
+        if not windows or windows[0][0] != end:
+            break
+        end = windows.popleft()[1]
+    return start, end
 
 def fetch_gnews_data(
     keywords: List[str],
     start_date: date,
     end_date:   date,
-    max_workers: int = 5,
+    max_workers: int = None,
     chunk_days: int = 10,
-    sleep_between: float = 1.0
-) -> None:
-    total = len(keywords)
-    for idx, kw in enumerate(keywords, 1):
-        coll_name = f"gnews_{kw}"
-        fetch_logger.log(f"[{idx}/{total}] Start '{kw}'", "info")
-        engine = GNews()
-
-        intervals: List[Tuple[datetime, datetime]] = []
-        cur = datetime(start_date.year, start_date.month, start_date.day)
-        last = datetime(end_date.year, end_date.month, end_date.day)
-        delta = timedelta(days=chunk_days)
-        while cur < last:
-            nxt = min(cur + delta, last)
-            intervals.append((cur, nxt))
-            cur = nxt
-
-        with ThreadPoolExecutor(max_workers=max_workers) as exe:
-            futures = {
-                exe.submit(_fetch_range, engine, kw, s, e, next(_proxy_cycle)): (s, e)
-                for s, e in intervals
-            }
-            count = 0
-            for fut in as_completed(futures):
-                start_i, end_i = futures[fut]
-                articles = fut.result()
-                if articles:
-                    try:
-                        mongo_client.save_new_pagination_news(
-                            news=articles,
-                            collection_name=coll_name
-                        )
-                        count += len(articles)
-                        fetch_logger.log(f"  → {len(articles)} [{start_i.date()}–{end_i.date()}] (total {count})", "info")
-                    except Exception as db_e:
-                        fetch_logger.log(f"  !! DB error: {db_e}", "error")
-                else:
-                    fetch_logger.log(f"  → 0 articles [{start_i.date()}–{end_i.date()}]", "info")
-                time.sleep(sleep_between)
-
-        fetch_logger.log(f"[{idx}/{total}] Done '{kw}' (fetched {count})", "info")
+    proxy_interval: float = GNEWS_PROXY_INTERVAL
+) -> Dict[str, Dict[str, int]]:
+    """
+    :param keywords: search keywords (states), every one is saved to its gnews_<keyword> collection
+    :param max_workers: chunks fetched at once, defaults to the number of proxies (GNEWS_DIRECT_WORKERS without proxies)
+    :param chunk_days: days per request window before it is split or merged
+    :param proxy_interval: minimum seconds between two requests through the same proxy
+
+    Schedules the windows of all keywords on one pool, so the proxies stay busy across keyword
+    boundaries, and every chunk is saved by its worker as soon as it lands. A window that hits
+    the result cap is split in halves and fetched again, after an empty window the next request
+    of the keyword covers twice as many chunks. A failed window is fetched again, up to
+    GNEWS_WINDOW_ATTEMPTS times.
+
+    Returns per keyword counts of requests, articles, split windows, windows still capped at one day,
+    failed requests and windows given up after failing every attempt
+    """
+    # one worker per proxy by default, more would only queue on the same exit addresses
+    if not max_workers:
+        max_workers = proxy_count() if any(proxy_pool.proxies) else GNEWS_DIRECT_WORKERS
+
+    intervals = _split_range(start_date, end_date, chunk_days)
+    pending = {kw: deque(intervals) for kw in keywords}
+    merge = {kw: 1 for kw in keywords}
+    stats = {kw: {"requests": 0, "articles": 0, "splits": 0, "capped": 0, "failures": 0, "lost": 0} for kw in keywords}
+    attempts = {}
+    fetch_logger.log(f"Scheduling {len(keywords) * len(intervals)} chunks of {len(keywords)} keywords on {max_workers} workers, {proxy_count()} proxies", "info")
+
+    # keep the pool a bit ahead of the workers, but windows are only decided when submitted:
+    # a keyword gets its share of the lookahead, and one window at a time until its first answer
+    # and while it crosses an empty stretch, otherwise its next windows would be queued before
+    # any merge is known
+    max_in_flight = 2 * max_workers
+    per_keyword = max(1, -(-max_in_flight // max(len(keywords), 1)))
+    running = {kw: 0 for kw in keywords}
+    in_flight = {}
+    with ThreadPoolExecutor(max_workers=max_workers) as exe:
+        while in_flight or any(pending.values()):
+            submitted = True
+            while submitted and len(in_flight) < max_in_flight:
+                # round-robin, one window per keyword and pass
+                submitted = False
+                for kw in keywords:
+                    if len(in_flight) >= max_in_flight:
+                        break
+                    if not pending[kw] or running[kw] >= (1 if merge[kw] > 1 or not stats[kw]["requests"] else per_keyword):
+                        continue
+                    s, e = _next_window(pending[kw], merge[kw])
+                    in_flight[exe.submit(_fetch_and_save, proxy_pool, proxy_interval, kw, s, e)] = (kw, s, e)
+                    running[kw] += 1
+                    submitted = True
+
+            done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+            for fut in done:
+                kw, start_i, end_i = in_flight.pop(fut)
+                running[kw] -= 1
+                fetched = fut.result()
+                stats[kw]["requests"] += 1
+                days = (end_i - start_i).days
+
+                if fetched is None:
+                    # not an empty window: retry it as it is, the merge only follows real answers
+                    stats[kw]["failures"] += 1
+                    attempts[(kw, start_i, end_i)] = attempts.get((kw, start_i, end_i), 0) + 1
+                    if attempts[(kw, start_i, end_i)] < GNEWS_WINDOW_ATTEMPTS:
+                        pending[kw].appendleft((start_i, end_i))
+                    else:
+                        stats[kw]["lost"] += 1
+                        fetch_logger.log(f"  ✗ '{kw}' [{start_i.date()}–{end_i.date()}] failed {GNEWS_WINDOW_ATTEMPTS} times, giving up", "error")
+                    if not pending[kw] and not running[kw]:
+                        fetch_logger.log(f"Done '{kw}' (fetched {stats[kw]['articles']} in {stats[kw]['requests']} requests)", "info")
+                    continue
+
+                if fetched >= GNEWS_MAX_RESULTS and days > MIN_WINDOW_DAYS:
+                    # truncated, the capped articles are kept and the halves fill the gaps
+                    # (they are counted with the halves, which fetch them again)
+                    mid = start_i + timedelta(days=days // 2)
+                    pending[kw].appendleft((mid, end_i))
+                    pending[kw].appendleft((start_i, mid))
+                    merge[kw] = 1
+                    stats[kw]["splits"] += 1
+                    fetch_logger.log(f"  ⇹ '{kw}' [{start_i.date()}–{end_i.date()}] hit {GNEWS_MAX_RESULTS}, splitting", "info")
+                    continue
+
+                if fetched >= GNEWS_MAX_RESULTS:
+                    stats[kw]["capped"] += 1
+                merge[kw] = min(2 * merge[kw], MAX_MERGED_CHUNKS) if not fetched else 1
+                stats[kw]["articles"] += fetched
+                fetch_logger.log(f"  → {fetched} '{kw}' [{start_i.date()}–{end_i.date()}]", "info")
+
+                if not pending[kw] and not running[kw]:
+                    fetch_logger.log(f"Done '{kw}' (fetched {stats[kw]['articles']} in {stats[kw]['requests']} requests)", "info")
+
+    for kw, kw_stats in stats.items():
+        fetch_logger.log(
+            f"{kw}: {kw_stats['requests']} requests, {kw_stats['articles']} articles, "
+            f"{kw_stats['splits']} splits, {kw_stats['capped']} one-day windows still at the cap, "
+            f"{kw_stats['failures']} failed requests, {kw_stats['lost']} windows given up",
+            "info"
+        )
+    pool_stats = proxy_pool.stats()
+    fetch_logger.log(
+        f"Proxies: {pool_stats['available']}/{proxy_count()} available, {pool_stats['requests']} requests, "
+        f"{pool_stats['failures']} failures, {pool_stats['throttled']} throttled",
+        "info"
+    )
+    return stats
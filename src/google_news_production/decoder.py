@@ -2,15 +2,19 @@
 
 import os
 import time
-from pathlib import Path
-from itertools import cycle
-from concurrent.futures import ThreadPoolExecutor, as_completed
-from typing import List, Optional
+import random
+import threading
+from collections import deque
+from urllib.parse import urlparse
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from typing import Iterable, List, Optional
 
+import requests
 from tqdm import tqdm
 from googlenewsdecoder import gnewsdecoder
-from mongo_wrapper.mongo_wrapper import MongoWrapper
+from mongo_wrapper.mongo_wrapper import MongoWrapper, BulkUpdateBuffer, DEFAULT_MAX_POOL_SIZE
 from logger.logger import Logger
+from proxy_pool import get_proxy_pool, is_throttled
 from dotenv import load_dotenv
 
 load_dotenv()
@@ -20,75 +24,255 @@ mongo_client = MongoWrapper(
     user=os.getenv("MONGO_USERNAME"),
     password=os.getenv("MONGO_PASSWORD"),
     ip=os.getenv("MONGO_IP"),
-    port=os.getenv("MONGO_PORT")
+    port=os.getenv("MONGO_PORT"),
+    max_pool_size=int(os.getenv("MONGO_DECODER_POOL_SIZE", DEFAULT_MAX_POOL_SIZE))
 )
 
 decoder_logger = Logger(logger_type="url_decoder", stream_handler=False)
 
-_proxies_file = Path(__file__).parent / "files/proxies.txt"
-def _load_proxies() -> cycle:
-    if not _proxies_file.exists():
-        return cycle([None])
-    with open(_proxies_file) as f:
-        lines = [l.strip() for l in f if l.strip()]
-    formatted = [l if l.startswith("http") else f"http://{l}" for l in lines]
-    return cycle(formatted)
+# Articles submitted to the pool per worker, bounds memory while streaming a collection
+IN_FLIGHT_PER_WORKER = 4
 
-_proxy_cycle = _load_proxies()
+# Attempts per url, with exponential backoff and full jitter in between
+DECODE_ATTEMPTS = 5
+BACKOFF_BASE = 0.5
+BACKOFF_MAX = 30.0
 
-def _decode_url(url: str, proxy: Optional[str]) -> Optional[str]:
-    for attempt in range(1, 6):
+# A host's breaker opens when BREAKER_ERROR_RATE of at least BREAKER_MIN_CALLS calls in the
+# last BREAKER_WINDOW seconds failed, decoding then pauses for BREAKER_COOLDOWN seconds
+BREAKER_WINDOW = 60.0
+BREAKER_MIN_CALLS = 20
+BREAKER_ERROR_RATE = 0.5
+BREAKER_COOLDOWN = 30.0
+BREAKER_MAX_COOLDOWN = 600.0
+
+# shared with the Google News fetcher, proxies are picked by health
+proxy_pool = get_proxy_pool()
+
+# parts of decoder error messages that blame the connection or a rate limit, not the url
+TRANSPORT_ERRORS = ("request error", "error fetching", "connection", "timed out", "timeout", "proxy", "500", "502", "503", "504")
+
+def is_transport_failure(error) -> bool:
+    # a failure that can go away with another attempt or proxy, as opposed to a url that can not be decoded
+    if isinstance(error, (requests.RequestException, OSError)) or is_throttled(error):
+        return True
+    message = str(error).lower()
+    return any(part in message for part in TRANSPORT_ERRORS)
+
+class CircuitBreaker:
+    """
+    Pauses every call to one host while its recent error rate is too high.
+
+    Closed: calls go through and their outcomes over the last window are counted. Open: callers
+    wait out the cooldown. Then a single probe goes through, its success closes the breaker,
+    its failure opens it again for twice as long. Thread-safe.
+    """
+    def __init__(self, host: str):
+        self.host = host
+        self.lock = threading.Lock()
+        self.outcomes = deque()
+        self.cooldown = BREAKER_COOLDOWN
+        self.open_until = 0.0
+        self.half_open = False
+        self.probing = False
+        self.trips = 0
+
+    def wait(self) -> bool:
+        # blocks until a call may go through, returns whether it is the probe of a half-open breaker
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                if now < self.open_until:
+                    delay = self.open_until - now
+                elif not self.half_open:
+                    return False
+                elif not self.probing:
+                    self.probing = True
+                    return True
+                else:
+                    # another thread is probing
+                    delay = 1.0
+            time.sleep(delay)
+
+    def _open(self, now: float, cooldown: float) -> None:
+        self.cooldown = min(cooldown, BREAKER_MAX_COOLDOWN)
+        self.open_until = now + self.cooldown
+        self.half_open = True
+        self.outcomes.clear()
+        self.trips += 1
+        decoder_logger.log(f"Circuit for {self.host} opened, pausing decoding for {self.cooldown:.0f} s", "warning")
+
+    def record(self, success: bool, probe: bool) -> None:
+        with self.lock:
+            now = time.monotonic()
+            if self.half_open:
+                # only the probe decides, late answers of calls sent before the breaker opened do not count
+                if not probe:
+                    return
+                self.probing = False
+                if success:
+                    self.half_open = False
+                    self.cooldown = BREAKER_COOLDOWN
+                    decoder_logger.log(f"Circuit for {self.host} closed", "info")
+                else:
+                    self._open(now, 2 * self.cooldown)
+                return
+
+            self.outcomes.append((now, success))
+            while self.outcomes and self.outcomes[0][0] < now - BREAKER_WINDOW:
+                self.outcomes.popleft()
+            failures = sum(1 for _, ok in self.outcomes if not ok)
+            if len(self.outcomes) >= BREAKER_MIN_CALLS and failures / len(self.outcomes) >= BREAKER_ERROR_RATE:
+                self._open(now, self.cooldown)
+
+_breakers = {}
+_breakers_lock = threading.Lock()
+
+def _get_breaker(url: str) -> CircuitBreaker:
+    host = urlparse(url).netloc
+    with _breakers_lock:
+        if host not in _breakers:
+            _breakers[host] = CircuitBreaker(host)
+        return _breakers[host]
+
+class DecodeRate:
+    """
+    Counts decoded and failed urls per wall-clock minute and logs the success rate of every
+    finished minute. Thread-safe.
+    """
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.minute = None
+        self.decoded = 0
+        self.failed = 0
+        self.attempts = 0
+
+    def _flush(self) -> None:
+        urls = self.decoded + self.failed
+        if urls:
+            decoder_logger.log(
+                f"{time.strftime('%H:%M', time.localtime(self.minute * 60))} decoded {self.decoded}/{urls} urls "
+                f"({self.decoded / urls:.0%}) in {self.attempts} attempts",
+                "info"
+            )
+        self.decoded = self.failed = self.attempts = 0
+
+    def record(self, success: bool, attempts: int) -> None:
+        with self.lock:
+            minute = int(time.time() // 60)
+            if minute != self.minute:
+                self._flush()
+                self.minute = minute
+            if success:
+                self.decoded += 1
+            else:
+                self.failed += 1
+            self.attempts += attempts
+
+    def flush(self) -> None:
+        with self.lock:
+            self._flush()
+
+decode_rate = DecodeRate()
+
+def _decode_url(url: str) -> Optional[str]:
+    breaker = _get_breaker(url)
+    proxy = None
+    for attempt in range(1, DECODE_ATTEMPTS + 1):
+        probe = breaker.wait()
+        # every attempt goes through the healthiest free proxy, not the one that just failed
+        proxy = proxy_pool.acquire(exclude=(proxy,))
+        requested = time.monotonic()
         try:
             result = gnewsdecoder(url, proxy=proxy)
             if result and result.get("decoded_url"):
+                proxy_pool.release(proxy, success=True, latency=time.monotonic() - requested)
+                breaker.record(True, probe)
+                decode_rate.record(True, attempt)
                 return result["decoded_url"]
-            decoder_logger.log(f"No decoded_url on attempt {attempt} for {url}", "error")
+            error = (result or {}).get("message", "")
+            decoder_logger.log(f"No decoded_url on attempt {attempt} for {url}: {error}", "error")
         except Exception as e:
+            error = e
             decoder_logger.log(f"Error on attempt {attempt} for {url}: {e}", "error")
-        time.sleep(0.1)
+
+        transport = is_transport_failure(error)
+        proxy_pool.release(proxy, success=not transport, latency=time.monotonic() - requested, throttled=is_throttled(error))
+        # the host answered but the url can not be decoded: neither the host nor the proxy is failing
+        breaker.record(not transport, probe)
+        if not transport:
+            break
+
+        if attempt < DECODE_ATTEMPTS:
+            # exponential backoff with full jitter
+            time.sleep(random.uniform(0, min(BACKOFF_MAX, BACKOFF_BASE * 2 ** (attempt - 1))))
+
+    decode_rate.record(False, attempt)
     return None
 
-def _process_one(article: dict) -> None:
+def _process_one(article: dict, updates: BulkUpdateBuffer) -> None:
     if article.get("decoded_url"):
         return
 
-    proxy = next(_proxy_cycle)
-    decoded = _decode_url(article["url"], proxy)
+    decoded = _decode_url(article["url"])
     if not decoded:
         return
 
     try:
-        mongo_client.update_collection_entries(
-            article["__collection_name"],
-            [{"_id": article["_id"], "update_data": {"decoded_url": decoded}}]
-        )
-        decoder_logger.log(f"Updated {_[:30]}… → {decoded[:30]}…", "info")
+        updates.add(article["__collection_name"], article["_id"], {"decoded_url": decoded})
+        decoder_logger.log(f"Queued {article['url'][:30]}… → {decoded[:30]}…", "info")
     except Exception as e:
         decoder_logger.log(f"DB update failed for {article['_id']}: {e}", "error")
 
 def _update_collection(
     collection: str,
-    articles: List[dict],
-    max_workers: int
+    articles: Iterable[dict],
+    total: int,
+    max_workers: int,
+    updates: BulkUpdateBuffer
 ) -> None:
-    for art in articles:
-        art["__collection_name"] = collection
-
-    decoder_logger.log(f"Decoding {len(articles)} urls in {collection}", "info")
-    with ThreadPoolExecutor(max_workers=max_workers) as exe:
-        futures = {exe.submit(_process_one, art): art for art in articles}
-        for _ in tqdm(as_completed(futures), total=len(futures), desc=collection):
-            pass
+    decoder_logger.log(f"Decoding {total} urls in {collection}", "info")
+    max_in_flight = max_workers * IN_FLIGHT_PER_WORKER
+    with ThreadPoolExecutor(max_workers=max_workers) as exe, tqdm(total=total, desc=collection) as bar:
+        futures = set()
+        for art in articles:
+            art["__collection_name"] = collection
+            futures.add(exe.submit(_process_one, art, updates))
+            if len(futures) >= max_in_flight:
+                done, futures = wait(futures, return_when=FIRST_COMPLETED)
+                bar.update(len(done))
+        for _ in wait(futures).done:
+            bar.update(1)
     decoder_logger.log(f"Finished {collection}", "info")
 
 def decode_gnews_links(
     states: List[str],
     max_workers: int = 20
 ) -> None:
-    for state in states:
-        coll = f"gnews_{state}"
-        articles = mongo_client.get_collection_entries(coll) or []
-        if not articles:
-            decoder_logger.log(f"No articles in {coll}", "info")
-            continue
-        _update_collection(coll, articles, max_workers)
+    # only articles without a decoded url (missing, null or empty), streamed with the url field only
+    undecoded = {"decoded_url": {"$in": [None, ""]}}
+
+    # decoded urls are written in bulk instead of one round trip per article
+    with mongo_client.bulk_update_buffer() as updates:
+        for state in states:
+            coll = f"gnews_{state}"
+            total = mongo_client.database[coll].count_documents(undecoded)
+            if not total:
+                decoder_logger.log(f"No articles to decode in {coll}", "info")
+                continue
+            articles = mongo_client.iter_collection_entries(
+                coll,
+                filter=undecoded,
+                projection={"url": 1},
+                batch_size=1000,
+                no_cursor_timeout=True
+            )
+            _update_collection(coll, articles, total, max_workers, updates)
+
+    decode_rate.flush()
+    pool_stats = proxy_pool.stats()
+    decoder_logger.log(
+        f"Proxies: {pool_stats['available']}/{len(proxy_pool)} available, {pool_stats['requests']} requests, "
+        f"{pool_stats['failures']} failures, {pool_stats['throttled']} throttled",
+        "info"
+    )
@@ -0,0 +1,177 @@
+import os
+import threading
+from collections import OrderedDict
+from time import perf_counter
+
+from logger.logger import Logger
+
+# Upper bound on models kept in memory at once, least recently used ones are dropped first
+MAX_RESIDENT_MODELS = int(os.getenv("MAX_RESIDENT_MODELS", 3))
+
+# CPU inference backends: full-precision PyTorch, dynamic int8 quantization of the linear
+# layers, or an ONNX Runtime export (needs optimum[onnxruntime])
+TORCH_BACKEND = "torch"
+INT8_BACKEND = "int8"
+ONNX_BACKEND = "onnx"
+BACKENDS = (TORCH_BACKEND, INT8_BACKEND, ONNX_BACKEND)
+
+INFERENCE_BACKEND = os.getenv("INFERENCE_BACKEND", TORCH_BACKEND)
+
+SENTENCE_TRANSFORMER = "sentence_transformer"
+SEQUENCE_CLASSIFIER = "sequence_classifier"
+
+# Models used by the pipeline stages
+YT_EMBEDDER = "paraphrase-multilingual-MiniLM-L12-v2"
+YT_SENTIMENT_MODEL = "nlptown/bert-base-multilingual-uncased-sentiment"
+TG_EMBEDDER = "hiiamsid/sentence_similarity_spanish_es"
+
+PIPELINE_MODELS = [
+    (SENTENCE_TRANSFORMER, YT_EMBEDDER),
+    (SEQUENCE_CLASSIFIER, YT_SENTIMENT_MODEL),
+    (SENTENCE_TRANSFORMER, TG_EMBEDDER),
+]
+
+def resolve_backend(backend: str = None) -> str:
+    # INFERENCE_BACKEND when not given, raises ValueError for unknown backends
+    backend = backend or INFERENCE_BACKEND
+    if backend not in BACKENDS:
+        raise ValueError(f'Unknown inference backend {backend}, expected one of {BACKENDS}')
+    return backend
+
+def _quantize(model):
+    import torch
+
+    return torch.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+
+def _load_sentence_transformer(name: str, backend: str):
+    # heavy imports stay inside the loaders, so importing the registry is cheap
+    from sentence_transformers import SentenceTransformer
+
+    if backend == ONNX_BACKEND:
+        # exported on first load if the hub repo has no ONNX weights
+        return SentenceTransformer(name, backend="onnx")
+
+    model = SentenceTransformer(name)
+    if backend == INT8_BACKEND:
+        model = _quantize(model)
+    return model
+
+def _load_sequence_classifier(name: str, backend: str):
+    from transformers import AutoTokenizer, AutoModelForSequenceClassification
+
+    tokenizer = AutoTokenizer.from_pretrained(name)
+    if backend == ONNX_BACKEND:
+        from optimum.onnxruntime import ORTModelForSequenceClassification
+
+        return tokenizer, ORTModelForSequenceClassification.from_pretrained(name, export=True)
+
+    model = AutoModelForSequenceClassification.from_pretrained(name)
+    model.eval()
+    if backend == INT8_BACKEND:
+        model = _quantize(model)
+    return tokenizer, model
+
+LOADERS = {
+    SENTENCE_TRANSFORMER: _load_sentence_transformer,
+    SEQUENCE_CLASSIFIER: _load_sequence_classifier,
+}
+
+class ModelRegistry:
+    """
+    Loads every model once per process on first use and keeps at most max_models of them.
+
+    Models are shared between callers, so they must be used for inference only.
+    """
+    def __init__(self, max_models: int = MAX_RESIDENT_MODELS):
+        self.max_models = max_models
+        self.models = OrderedDict()
+        self.lock = threading.Lock()
+
+        # one lock per model being loaded, so different models load in parallel
+        # but the same one is never deserialized twice
+        self.loading: dict[tuple[str, str, str], threading.Lock] = {}
+
+        self.logger = Logger(logger_type="model_registry", stream_handler=True)
+
+        self.hits = 0
+        self.loads = 0
+        self.evictions = 0
+
+    def _get_loaded(self, key: tuple[str, str, str]):
+        # call with self.lock held
+        model = self.models.get(key)
+        if model is not None:
+            self.models.move_to_end(key)
+            self.hits += 1
+        return model
+
+    def get(self, kind: str, name: str, backend: str = None):
+        """
+        :param kind: SENTENCE_TRANSFORMER or SEQUENCE_CLASSIFIER
+        :param name: model name on the Hugging Face hub
+        :param backend: one of BACKENDS, INFERENCE_BACKEND by default
+
+        Returns the loaded model, (tokenizer, model) for sequence classifiers
+        """
+        backend = resolve_backend(backend)
+        if kind not in LOADERS:
+            raise ValueError(f'Unknown model kind {kind}')
+
+        key = (kind, name, backend)
+        with self.lock:
+            model = self._get_loaded(key)
+            if model is not None:
+                return model
+            load_lock = self.loading.setdefault(key, threading.Lock())
+
+        with load_lock:
+            # another thread may have loaded it while we waited
+            with self.lock:
+                model = self._get_loaded(key)
+                if model is not None:
+                    return model
+
+            start = perf_counter()
+            model = LOADERS[kind](name, backend)
+            self.logger.log(f'Loaded {kind} {name} ({backend}) in {perf_counter() - start:.1f} s', level="info")
+
+            with self.lock:
+                self.models[key] = model
+                self.loads += 1
+                self.loading.pop(key, None)
+                while len(self.models) > self.max_models:
+                    (evicted_kind, evicted_name, evicted_backend), _ = self.models.popitem(last=False)
+                    self.evictions += 1
+                    self.logger.log(f'Evicted {evicted_kind} {evicted_name} ({evicted_backend})', level="info")
+
+        return model
+
+    def warm_up(self, models: list[tuple[str, str]] = PIPELINE_MODELS):
+        # load models ahead of the first pipeline run, errors are logged and left to the real run
+        for kind, name in models[-self.max_models:]:
+            try:
+                self.get(kind, name)
+            except Exception as e:
+                self.logger.log(f'Warm-up of {kind} {name} failed: {e}', level="warning")
+
+    def stats(self) -> dict:
+        with self.lock:
+            return {
+                "resident": [f'{name} ({backend})' for _, name, backend in self.models],
+                "max_models": self.max_models,
+                "hits": self.hits,
+                "loads": self.loads,
+                "evictions": self.evictions
+            }
+
+model_registry = ModelRegistry()
+
+def get_sentence_transformer(name: str, backend: str = None):
+    return model_registry.get(SENTENCE_TRANSFORMER, name, backend)
+
+def get_sequence_classifier(name: str, backend: str = None):
+    # returns (tokenizer, model)
+    return model_registry.get(SEQUENCE_CLASSIFIER, name, backend)
+
+def warm_up(models: list[tuple[str, str]] = PIPELINE_MODELS):
+    model_registry.warm_up(models)
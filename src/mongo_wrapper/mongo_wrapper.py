@@ -1,13 +1,95 @@
 import pymongo
 import pymongo.errors
-from pymongo import UpdateOne, errors as pymongo_errors
+from pymongo import UpdateOne, ReturnDocument, errors as pymongo_errors
 
-from time import sleep
+import os
+import threading
+from collections import defaultdict
+from time import sleep, monotonic
 
 from text_objects.telegram import Post
 from logger.logger import Logger
+from state_matcher import StateMatcher
+
+# Collection keeping the list of states every channel collection was tagged with
+STATE_TAGS_COLLECTION = "state_tags_meta"
+
+# Collection caching YouTube API responses by request key
+YT_API_CACHE_COLLECTION = "yt_api_cache"
+
+# Collection keeping the YouTube API quota units spent per Pacific day
+YT_API_QUOTA_COLLECTION = "yt_api_quota"
+
+# Collection keeping the comment crawl checkpoint (next page token, newest comment time) of every video
+YT_COMMENT_CRAWLS_COLLECTION = "yt_comment_crawls"
+
+# Number of update operations sent in one bulk_write when tagging posts
+TAG_BATCH_SIZE = 1000
+
+# Server error code for a unique index violation
+DUPLICATE_KEY_ERROR = 11000
+
+# Server error code for creating a collection that already exists
+NAMESPACE_EXISTS_ERROR = 48
+
+# Default connection pool size of the shared client, threaded decoders can request more
+DEFAULT_MAX_POOL_SIZE = int(os.getenv("MONGO_MAX_POOL_SIZE", 100))
+
+# Seconds an unreachable server is not retried, every access meanwhile fails fast
+CONNECT_FAILURE_BACKOFF = float(os.getenv("MONGO_CONNECT_FAILURE_BACKOFF", 30))
+
+# Process-wide client registry: one pooled MongoClient per connection URI, shared by all MongoWrapper views
+_clients: dict[str, pymongo.MongoClient] = {}
+_requested_pool_sizes: dict[str, int] = {}
+_created_pool_sizes: dict[str, int] = {}
+_connected_uris: set[str] = set()
+_failed_uris: dict[str, float] = {}
+_databases: dict[tuple[str, str], "_DatabaseState"] = {}
+_clients_lock = threading.Lock()
+
+class _DatabaseState:
+    # State shared by all MongoWrapper views of one database
+    def __init__(self):
+        self.database = None
+        self.database_lock = threading.Lock()
+        self.collections = None
+        self.lock = threading.Lock()
+
+def request_pool_size(uri: str, max_pool_size: int) -> None:
+    # Remember the largest pool size asked for a URI, applied when its client is created
+    with _clients_lock:
+        _requested_pool_sizes[uri] = max(_requested_pool_sizes.get(uri, 0), max_pool_size)
+        if uri in _clients and max_pool_size > _created_pool_sizes[uri]:
+            Logger(logger_type="Mongo", stream_handler=True).log(
+                f'Client pool is already open, requested size {max_pool_size} applies only after restart',
+                level="warning"
+            )
+
+def get_mongo_client(uri: str) -> pymongo.MongoClient:
+    """
+    :param uri: connection URI
+
+    Returns the pooled client for the URI, creating it on first use
+    """
+    with _clients_lock:
+        if uri not in _clients:
+            max_pool_size = _requested_pool_sizes.get(uri, DEFAULT_MAX_POOL_SIZE)
+            _clients[uri] = pymongo.MongoClient(
+                uri,
+                serverSelectionTimeoutMS=1000,
+                maxPoolSize=max_pool_size,
+                connect=False
+            )
+            _created_pool_sizes[uri] = max_pool_size
+        return _clients[uri]
 
-def serialize_posts(posts: list[Post]) -> list[dict]:
+def _get_database_state(uri: str, db: str) -> _DatabaseState:
+    with _clients_lock:
+        if (uri, db) not in _databases:
+            _databases[(uri, db)] = _DatabaseState()
+        return _databases[(uri, db)]
+
+def serialize_posts(posts: list[Post], state_matcher: StateMatcher = None) -> list[dict]:
     # Convert Post objects (with comments) to dicts for MongoDB
     result = []
     for post in posts:
@@ -22,47 +104,181 @@ def serialize_posts(posts: list[Post]) -> list[dict]:
             for comment in post.comments
         ]
 
-        result.append(
-            {
-                "id": post.id,
-                "text": post.text,
-                "author": post.author,
-                "posting_ts": post.posting_ts,
-                "comments": post_comments
-            }
-        )
+        serialized_post = {
+            "id": post.id,
+            "text": post.text,
+            "author": post.author,
+            "posting_ts": post.posting_ts,
+            "comments": post_comments
+        }
+
+        # Precomputed state mentions, so state filtering can run on the server
+        if state_matcher is not None:
+            serialized_post["states_mentioned"] = state_matcher.find(post.text)
+
+        result.append(serialized_post)
 
     return result
+
+class BulkUpdateBuffer:
+    """
+    Write-behind buffer for $set updates coming from many threads.
+
+    UpdateOne operations are collected per collection and sent with one bulk_write when a collection
+    reaches max_ops, every flush_interval seconds and when the context manager exits.
+    """
+    def __init__(self, mongo_client: "MongoWrapper", max_ops: int = 500, flush_interval: float = 5.0):
+        self.mongo_client = mongo_client
+        self.max_ops = max_ops
+        self.flush_interval = flush_interval
+
+        self._ops = defaultdict(list)
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._flusher = None
+
+        self.queued_ops = 0
+        self.bulk_writes = 0
+
+    def __enter__(self) -> "BulkUpdateBuffer":
+        # Background thread flushing by time, so slow producers do not keep updates pending
+        self._stop.clear()
+        self._flusher = threading.Thread(target=self._flush_periodically, daemon=True)
+        self._flusher.start()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        self._stop.set()
+        if self._flusher is not None:
+            self._flusher.join()
+            self._flusher = None
+        self.flush()
+
+    def _flush_periodically(self) -> None:
+        while not self._stop.wait(self.flush_interval):
+            # a failed flush must not end the thread, the updates stay queued for the next one
+            try:
+                self.flush()
+            except Exception as e:
+                self.mongo_client.logger.log(message=f'Periodic flush of buffered updates failed: {e}', level="error")
+
+    def _write(self, collection: str, bulk_ops: list[UpdateOne]) -> None:
+        self.mongo_client.bulk_write_updates(collection, bulk_ops, raise_errors=True)
+        with self._lock:
+            self.bulk_writes += 1
+
+    def _requeue(self, batches: list[tuple[str, list[UpdateOne]]]) -> None:
+        # put back batches that were not written, ahead of what was queued meanwhile
+        with self._lock:
+            for collection, bulk_ops in batches:
+                self._ops[collection][:0] = bulk_ops
+
+    def add(self, collection: str, _id, update_data: dict) -> None:
+        """
+        :param collection: collection name
+        :param _id: id of the document to update
+        :param update_data: fields to $set
+        """
+        with self._lock:
+            self._ops[collection].append(UpdateOne({"_id": _id}, {"$set": update_data}))
+            self.queued_ops += 1
+            batch = self._ops.pop(collection) if len(self._ops[collection]) >= self.max_ops else None
+
+        # Write outside the lock so other threads can keep queueing
+        if batch:
+            try:
+                self._write(collection, batch)
+            except Exception:
+                self._requeue([(collection, batch)])
+                raise
+
+    def update(self, collection: str, updates: list[dict]) -> None:
+        # Same input as MongoWrapper.update_collection_entries
+        for u in updates:
+            self.add(collection, u["_id"], u["update_data"])
+
+    def flush(self) -> None:
+        # Send everything that is pending
+        with self._lock:
+            pending = self._ops
+            self._ops = defaultdict(list)
+
+        batches = [(collection, bulk_ops) for collection, bulk_ops in pending.items() if bulk_ops]
+        for i, (collection, bulk_ops) in enumerate(batches):
+            try:
+                self._write(collection, bulk_ops)
+            except Exception:
+                self._requeue(batches[i:])
+                raise
+
 class MongoWrapper:
-    def __init__(self, db: str, user: str, password: str, ip: str = "localhost", port: int = 27017):
-        # Create connection to MongoDB
-        self.mongo_client = pymongo.MongoClient(
-            f'mongodb://{user}:{password}@{ip}:{port}/',
-            serverSelectionTimeoutMS=1000
-        )
+    def __init__(
+        self,
+        db: str,
+        user: str,
+        password: str,
+        ip: str = "localhost",
+        port: int = 27017,
+        max_pool_size: int = DEFAULT_MAX_POOL_SIZE
+    ):
+        # Cheap view over the shared client pool, nothing is connected until the database is used
+        self.db = db
+        self.ip = ip
+        self.uri = f'mongodb://{user}:{password}@{ip}:{port}/'
+        request_pool_size(self.uri, max_pool_size)
 
         # Use internal logger
         self.logger = Logger(logger_type="Mongo", stream_handler=True)
 
-        # Validate connection + database presence
-        if self.__connected() and db in self.mongo_client.list_database_names():
-            self.logger.log(f'Connected to {db} database on {ip}', level="info")
-            self.database = self.mongo_client[db]
-        else:
-            self.logger.log(f'No {db} in database list or not connected', level="error")
+        # Database handle and collection names registry, shared by all views of the same database
+        self._state = _get_database_state(self.uri, db)
+
+    @property
+    def mongo_client(self) -> pymongo.MongoClient:
+        return get_mongo_client(self.uri)
+
+    @property
+    def database(self):
+        # Validate connection + database presence once per process, on first use
+        if self._state.database is not None:
+            return self._state.database
+
+        with self._state.database_lock:
+            if self._state.database is None:
+                if self.__connected() and self.db in self.mongo_client.list_database_names():
+                    self.logger.log(f'Connected to {self.db} database on {self.ip}', level="info")
+                    self._state.database = self.mongo_client[self.db]
+                else:
+                    self.logger.log(f'No {self.db} in database list or not connected', level="error")
+                    raise ConnectionError(f'No {self.db} in database list or not connected')
+
+        return self._state.database
 
     def __connected(self):
-        # Try to reach Mongo server with retries
+        # Try to reach Mongo server with retries, only once per URI
+        if self.uri in _connected_uris:
+            return True
+
+        # The last attempt failed recently, do not block the caller with another round of retries
+        if monotonic() < _failed_uris.get(self.uri, 0.0):
+            return False
+
         connections = 0
         while connections <= 5:
             try:
                 self.mongo_client.admin.command("ismaster")
+                _connected_uris.add(self.uri)
+                _failed_uris.pop(self.uri, None)
                 return True
             except Exception as e:
                 self.logger.log(f'Can not connect to mongo client host: {e}. Reconnecting.', level="error")
                 connections += 1
                 sleep(1)
 
+        _failed_uris[self.uri] = monotonic() + CONNECT_FAILURE_BACKOFF
+        self.logger.log(f'Mongo on {self.ip} is unreachable, failing fast for {CONNECT_FAILURE_BACKOFF:.0f} s', level="error")
+        return False
+
 
     def remove_duplicates(self, entries: list[dict], custom_key: str = None) -> list[dict]:
         # Drop duplicates by given field or 'id'
@@ -80,28 +296,112 @@ class MongoWrapper:
 
         return list(unique_dict.values())
     
-    def get_all_collections(self):
-        return self.database.list_collection_names()
+    def _load_collections(self) -> set[str]:
+        # Fill the registry on first use, caller holds the lock
+        if self._state.collections is None:
+            self._state.collections = set(self.database.list_collection_names())
+        return self._state.collections
+
+    def get_all_collections(self, refresh: bool = False) -> list[str]:
+        """
+        :param refresh: reload names from the server instead of the registry
+
+        Returns names of all collections in the database
+        """
+        with self._state.lock:
+            if refresh:
+                self._state.collections = None
+            return list(self._load_collections())
+
+    def invalidate_collections(self) -> None:
+        # Force the next lookup to reload collection names from the server
+        with self._state.lock:
+            self._state.collections = None
+
+    def has_collection(self, collection: str) -> bool:
+        with self._state.lock:
+            if collection in self._load_collections():
+                return True
+
+        # Not in the registry - reload once, it may have been created by another process
+        return collection in self.get_all_collections(refresh=True)
+
+    def _create_collection(self, collection: str) -> None:
+        # Create collection and register it, an "already exists" error from a concurrent creator counts as success
+        with self._state.lock:
+            # Another thread of this process created it while we were waiting for the lock
+            if collection in self._load_collections():
+                return
+
+            try:
+                self.database.create_collection(collection, check_exists=False)
+                self.logger.log(message=f'Collection for {collection} was created', level="info")
+            except pymongo_errors.CollectionInvalid:
+                self.logger.log(message=f'Collection for {collection} already exists', level="info")
+            except pymongo_errors.OperationFailure as e:
+                if e.code != NAMESPACE_EXISTS_ERROR:
+                    raise
+                self.logger.log(message=f'Collection for {collection} already exists', level="info")
+
+            self._load_collections().add(collection)
     
+    def iter_collection_entries(
+        self,
+        collection: str,
+        filter: dict = None,
+        projection: dict = None,
+        batch_size: int = None,
+        no_cursor_timeout: bool = False
+    ):
+        """
+        :param collection: collection name
+        :param filter: optional query filter
+        :param projection: optional fields to return
+        :param batch_size: optional number of documents per server round trip
+        :param no_cursor_timeout: keep the cursor alive for long running consumers
+
+        Streams documents of one collection without materializing them in memory
+        """
+        try:
+            cursor = self.database[collection].find(
+                filter or {},
+                projection,
+                no_cursor_timeout=no_cursor_timeout
+            )
+            if batch_size:
+                cursor = cursor.batch_size(batch_size)
+
+            # Context manager closes no_cursor_timeout cursors on the server even if the consumer stops early
+            with cursor:
+                for entry in cursor:
+                    yield entry
+        except Exception as e:
+            self.logger.log(f'Can not get collection {collection} from db: {e}', level="error")
+
+    def iter_all_db_entries(
+        self,
+        filter: dict = None,
+        projection: dict = None,
+        batch_size: int = None,
+        no_cursor_timeout: bool = False
+    ):
+        # Stream everything from all collections
+        for collection in self.get_all_collections():
+            yield from self.iter_collection_entries(
+                collection,
+                filter=filter,
+                projection=projection,
+                batch_size=batch_size,
+                no_cursor_timeout=no_cursor_timeout
+            )
+
     def get_all_db_entries(self) -> list:
         # Pull everything from all collections
-        collections = self.get_all_collections()
-        result = []
-        for collection in collections:
-            data = self.database[collection].find()
-            for i in data:
-                result.append(i)
-        return result
+        return list(self.iter_all_db_entries())
 
     def get_collection_entries(self, collection: str):
         # Grab all docs from one collection
-        try:
-            existing_collection = self.database[collection]
-            result = [i for i in existing_collection.find()]
-            return result
-        except Exception as e:
-            self.logger.log(f'Can not get collection {collection} from db: {e}', level="error")
-            return []
+        return list(self.iter_collection_entries(collection))
 
     def get_document_by_id(self, collection: str, id: str):
         try:
@@ -119,11 +419,35 @@ class MongoWrapper:
 
         return entries
     
+    def insert_new_entries(self, collection: str, entries: list[dict]) -> tuple[int, int]:
+        """
+        :param collection: collection name
+        :param entries: documents with _id already assigned
+
+        Inserts documents relying on the unique _id index, so entries that already exist are skipped
+        by the server instead of downloading existing ids. Returns (inserted, duplicates)
+        """
+        if not entries:
+            return 0, 0
+
+        try:
+            result = self.database[collection].insert_many(entries, ordered=False)
+            return len(result.inserted_ids), 0
+        except pymongo_errors.BulkWriteError as e:
+            write_errors = e.details.get("writeErrors", [])
+            duplicates = sum(1 for error in write_errors if error.get("code") == DUPLICATE_KEY_ERROR)
+            if len(write_errors) > duplicates:
+                self.logger.log(
+                    message=f'{len(write_errors) - duplicates} entries could not be inserted into {collection}: {write_errors[0].get("errmsg")}',
+                    level="error"
+                )
+            return e.details.get("nInserted", 0), duplicates
+
     def save_new_handle_videos(self, videos: list[dict], handle: str):
         cleaned_videos = self.remove_duplicates(videos, custom_key="id.videoId")
         videos_to_save = self.assign_entry_ids(cleaned_videos, name="id", custom=True)
         
-        if handle not in self.get_all_collections():
+        if not self.has_collection(handle):
             self.logger.log(message=f'Collection for handle {handle} was not found in db. Creating...', level="info")
             self.create_new_channel_collection(handle)
 
@@ -152,6 +476,23 @@ class MongoWrapper:
             for u in updates
         ]
 
+        self.bulk_write_updates(collection_name, bulk_ops)
+
+    def bulk_update_buffer(self, max_ops: int = 500, flush_interval: float = 5.0) -> BulkUpdateBuffer:
+        """
+        :param max_ops: pending operations per collection that trigger a write
+        :param flush_interval: seconds between time based flushes
+
+        Returns a buffer batching per-document updates, use it as a context manager
+        """
+        return BulkUpdateBuffer(self, max_ops=max_ops, flush_interval=flush_interval)
+
+    def bulk_write_updates(self, collection_name: str, bulk_ops: list[UpdateOne], raise_errors: bool = False) -> None:
+        """
+        :param collection_name: collection name
+        :param bulk_ops: update operations
+        :param raise_errors: re-raise a failed write after logging it, for callers that retry
+        """
         try:
             result = self.database[collection_name].bulk_write(bulk_ops, ordered=False)
 
@@ -172,37 +513,39 @@ class MongoWrapper:
                 message=f"Error updating batch in '{collection_name}' collection: {e}",
                 level="error",
             )
+            if raise_errors:
+                raise
     
-    def save_new_yt_comments(self, comments: list[dict]):
+    def save_new_yt_comments(self, comments: list[dict]) -> bool:
+        """
+        :param comments: comment threads as returned by the API
+
+        Returns False if the comments could not be inserted
+        """
         cleaned_comments = self.remove_duplicates(comments)
 
         comments_to_save = self.assign_entry_ids(cleaned_comments, name="id", custom=True)
 
-        existing_posts = self.get_collection_entries(collection="yt_comments")
-        if not existing_posts:
-            existing_posts = []
-
-        existing_ids = {post["_id"] for post in existing_posts}
-
-        new_comments = [c for c in comments_to_save if c["_id"] not in existing_ids]
+        try:
+            inserted, duplicates = self.insert_new_entries("yt_comments", comments_to_save)
+        except Exception as e:
+            self.logger.log(
+                message=f'Could not insert new comments into collection: {e}',
+                level="error"
+            )
+            return False
 
-        if new_comments:
-            try:
-                self.database["yt_comments"].insert_many(new_comments)
-                self.logger.log(
-                    message=f'Inserted {len(new_comments)} new comments into collection',
-                    level="info"
-                )
-            except Exception as e:
-                self.logger.log(
-                    message=f'Could not insert new posts into collection: {e}',
-                    level="error"
-                )
+        if inserted:
+            self.logger.log(
+                message=f'Inserted {inserted} new comments into collection, skipped {duplicates} existing',
+                level="info"
+            )
         else:
             self.logger.log(
                 message=f'No new comments to insert',
                 level="info"
             )
+        return True
 
     def save_new_serpapi_search(self, collection: str, data: dict[str, str]) -> None:
         try:
@@ -217,11 +560,81 @@ class MongoWrapper:
                 level="error"
             )
     
+    def get_api_cache_entry(self, key: str) -> dict:
+        """
+        :param key: request key
+
+        Returns the cached API response entry or None
+        """
+        return self.database[YT_API_CACHE_COLLECTION].find_one({"_id": key})
+
+    def save_api_cache_entry(self, key: str, entry: dict) -> None:
+        # Insert or replace the cached response of a request
+        self.database[YT_API_CACHE_COLLECTION].replace_one({"_id": key}, entry, upsert=True)
+
+    def touch_api_cache_entry(self, key: str, fetched_at: float) -> None:
+        # Mark a cached response as confirmed unchanged by the API
+        self.database[YT_API_CACHE_COLLECTION].update_one({"_id": key}, {"$set": {"fetched_at": fetched_at}})
+
+    def add_api_quota_spent(self, day: str, units: int) -> int:
+        """
+        :param day: Pacific date in ISO format, the quota resets at its midnight
+        :param units: quota units to add, negative to give back a reservation
+
+        Returns the units spent that day after the change, by every process sharing the database
+        """
+        entry = self.database[YT_API_QUOTA_COLLECTION].find_one_and_update(
+            {"_id": day},
+            {"$inc": {"spent": units}},
+            upsert=True,
+            return_document=ReturnDocument.AFTER
+        )
+        return entry["spent"]
+
+    def get_comment_crawl(self, video_id: str) -> dict:
+        """
+        :param video_id: video ID
+
+        Returns the comment crawl checkpoint of the video or None if it was never crawled
+        """
+        return self.database[YT_COMMENT_CRAWLS_COLLECTION].find_one({"_id": video_id})
+
+    def save_comment_crawl(self, video_id: str, checkpoint: dict) -> None:
+        # Update the crawl checkpoint fields of a video
+        self.database[YT_COMMENT_CRAWLS_COLLECTION].update_one({"_id": video_id}, {"$set": checkpoint}, upsert=True)
+
+    def get_newest_comment_published_at(self, video_id: str) -> str:
+        """
+        :param video_id: video ID
+
+        Returns publishedAt of the newest stored comment of the video, None if none is stored
+        """
+        newest = self.database["yt_comments"].find_one(
+            {"snippet.videoId": video_id},
+            projection={"snippet.topLevelComment.snippet.publishedAt": True},
+            sort=[("snippet.topLevelComment.snippet.publishedAt", pymongo.DESCENDING)]
+        )
+        return newest["snippet"]["topLevelComment"]["snippet"]["publishedAt"] if newest else None
+
+    def iter_comments_by_video_id(
+        self,
+        video_id: str,
+        projection: dict = None,
+        batch_size: int = None,
+        no_cursor_timeout: bool = False
+    ):
+        # Stream stored comments of one video
+        yield from self.iter_collection_entries(
+            "yt_comments",
+            filter={"snippet.videoId": video_id},
+            projection=projection,
+            batch_size=batch_size,
+            no_cursor_timeout=no_cursor_timeout
+        )
+
     def get_comments_by_video_id(self, video_id: str) -> list[dict]:
         try:
-            collection = self.database["yt_comments"]
-
-            comments = list(collection.find({"snippet.videoId": video_id}))
+            comments = list(self.iter_comments_by_video_id(video_id))
             
             if not comments:
                 self.logger.log(
@@ -241,7 +654,7 @@ class MongoWrapper:
         cleaned_videos = self.remove_duplicates(videos, custom_key="id.videoId")
         videos_to_save = self.assign_entry_ids(cleaned_videos, name="id", custom=True)
         
-        if keyword not in self.get_all_collections():
+        if not self.has_collection(keyword):
             self.logger.log(message=f'Collection for keyword {keyword} was not found in db. Creating...', level="info")
             self.create_new_channel_collection(keyword)
 
@@ -257,6 +670,27 @@ class MongoWrapper:
             level="error"
             )
         
+    def iter_videos_by_keyword(
+        self,
+        keyword: str,
+        filter: dict = None,
+        projection: dict = None,
+        batch_size: int = None,
+        no_cursor_timeout: bool = False
+    ):
+        """
+        :param keyword: keyword to search for
+
+        Method to stream videos by keyword
+        """
+        yield from self.iter_collection_entries(
+            keyword,
+            filter=filter,
+            projection=projection,
+            batch_size=batch_size,
+            no_cursor_timeout=no_cursor_timeout
+        )
+
     def get_videos_by_keyword(self, keyword: str) -> list[dict]:
         """
         :param keyword: keyword to search for
@@ -264,7 +698,7 @@ class MongoWrapper:
         Method to get videos by keyword
         """
         try:
-            videos = self.get_collection_entries(keyword)
+            videos = list(self.iter_videos_by_keyword(keyword))
 
             if not videos:
                 self.logger.log(
@@ -305,61 +739,53 @@ class MongoWrapper:
         
     def create_new_news_pagination_collection(self, collection_name: str) -> None:
         try:
-            self.database.create_collection(collection_name)
-            self.logger.log(message=f'Collection for {collection_name} was created', level="info")
+            self._create_collection(collection_name)
 
         except Exception as e:
             self.logger.log(message=f'Could not create new collection for {collection_name}: {e}', level="error")
             raise ConnectionError(f'Can not create new collection for {collection_name}: {e}')
         
-    def save_new_pagination_news(self, news: list[dict], collection_name: str) -> None:
+    def save_new_pagination_news(self, news: list[dict], collection_name: str) -> bool:
         """
         :param news: list of news articles
         :param collection_name: name of the collection
 
-        Method either saves new data to existing collection in db or creates new collection and saves all the data passed
+        Method either saves new data to existing collection in db or creates new collection and saves all the data passed.
+        Returns False if the news could not be inserted
         """
-        if collection_name not in self.get_all_collections():
+        if not self.has_collection(collection_name):
             self.logger.log(message=f'Collection for {collection_name} was not found in db. Creating...', level="info")
             self.create_new_news_pagination_collection(collection_name)
 
         serialized_news = self.assign_entry_ids(news, name="id", custom=True)
 
-        existing_news = self.get_collection_entries(collection=collection_name)
-        if not existing_news:
-            existing_news = []
-
-        existing_ids = {post["_id"] for post in existing_news}
-
-        new_news = [p for p in serialized_news if p["_id"] not in existing_ids]
+        try:
+            new_news = list(map(
+                lambda d: {
+                    **{k: v for k, v in d.items() if k != 'indexed_date'},
+                    'publish_date': d['publish_date'].isoformat()
+                },
+                serialized_news
+            )) if "gnews" not in collection_name else serialized_news
+            inserted, duplicates = self.insert_new_entries(collection_name, new_news)
+        except Exception as e:
+            self.logger.log(
+                message=f'Could not insert new news into {collection_name}: {e}',
+                level="error"
+            )
+            return False
 
-        if new_news:
-            try:
-                new_news = list(filter(
-                    lambda item: item["_id"] not in existing_ids,
-                    map(
-                        lambda d: {
-                            **{k: v for k, v in d.items() if k != 'indexed_date'},
-                            'publish_date': d['publish_date'].isoformat()
-                        },
-                        serialized_news
-                    )
-                )) if "gnews" not in collection_name else new_news
-                self.database[collection_name].insert_many(new_news)
-                self.logger.log(
-                    message=f'Inserted {len(new_news)} new news into collection {collection_name}',
-                    level="info"
-                )
-            except Exception as e:
-                self.logger.log(
-                    message=f'Could not insert new news into {collection_name}: {e}',
-                    level="error"
-                )
+        if inserted:
+            self.logger.log(
+                message=f'Inserted {inserted} new news into collection {collection_name}, skipped {duplicates} existing',
+                level="info"
+            )
         else:
             self.logger.log(
                 message=f'No new news to insert for {collection_name}',
                 level="info"
             )
+        return True
     
     def create_new_channel_collection(self, channel_name: str) -> None:
         """
@@ -368,48 +794,144 @@ class MongoWrapper:
         Creates new collection
         """
         try:
-            self.database.create_collection(channel_name)
-            self.logger.log(message=f'Collection for {channel_name} was created', level="info")
+            self._create_collection(channel_name)
 
         except Exception as e:
             self.logger.log(message=f'Could not create new collection for {channel_name}: {e}', level="error")
             raise ConnectionError(f'Can not create new collection for {channel_name}: {e}')
     
-    def save_new_channel_posts(self, channel: str, posts: Post) -> None:
+    def get_tagged_states(self, collection: str) -> list[str]:
+        """
+        :param collection: channel collection name
+
+        Returns states the posts of the collection were tagged with
+        """
+        meta = self.database[STATE_TAGS_COLLECTION].find_one({"_id": collection})
+        return meta["states"] if meta else []
+
+    def create_states_index(self, collection: str) -> None:
+        # Multikey index on the precomputed state mentions
+        try:
+            self.database[collection].create_index("states_mentioned")
+        except Exception as e:
+            self.logger.log(message=f'Could not create states index for {collection}: {e}', level="error")
+
+    def _tag_posts(self, collection: str, query: dict, state_matcher: StateMatcher) -> int:
+        # Add states found by the matcher to states_mentioned of every post matching query
+        tagged = 0
+        bulk_ops = []
+        posts = self.iter_collection_entries(
+            collection,
+            filter=query,
+            projection={"text": 1},
+            batch_size=TAG_BATCH_SIZE,
+            no_cursor_timeout=True
+        )
+        for post in posts:
+            bulk_ops.append(UpdateOne(
+                {"_id": post["_id"]},
+                {"$addToSet": {"states_mentioned": {"$each": state_matcher.find(post.get("text"))}}}
+            ))
+            if len(bulk_ops) >= TAG_BATCH_SIZE:
+                self.database[collection].bulk_write(bulk_ops, ordered=False)
+                tagged += len(bulk_ops)
+                bulk_ops = []
+
+        if bulk_ops:
+            self.database[collection].bulk_write(bulk_ops, ordered=False)
+            tagged += len(bulk_ops)
+
+        return tagged
+
+    def tag_state_mentions(self, collection: str, states: list[str]) -> None:
+        """
+        :param collection: channel collection name
+        :param states: states that will be queried
+
+        Makes sure every post has states_mentioned computed for all passed states. Posts are scanned
+        only for states the collection was not tagged with before and for posts saved without tags
+        """
+        tagged_states = self.get_tagged_states(collection)
+        new_states = [state for state in states if state not in tagged_states]
+        all_states = tagged_states + new_states
+
+        try:
+            tagged = 0
+            if new_states:
+                tagged += self._tag_posts(collection, {"states_mentioned": {"$exists": True}}, StateMatcher(new_states))
+            tagged += self._tag_posts(collection, {"states_mentioned": {"$exists": False}}, StateMatcher(all_states))
+
+            if new_states:
+                self.database[STATE_TAGS_COLLECTION].update_one(
+                    {"_id": collection},
+                    {"$set": {"states": all_states}},
+                    upsert=True
+                )
+            self.create_states_index(collection)
+
+            if tagged:
+                self.logger.log(message=f'Tagged {tagged} posts in {collection} with state mentions', level="info")
+        except pymongo_errors.PyMongoError as e:
+            self.logger.log(message=f'Could not tag state mentions in {collection}: {e}', level="error")
+
+    def get_posts_by_state(self, collection: str, state: str, start_ts: float = None, end_ts: float = None):
+        """
+        :param collection: channel collection name
+        :param state: state name, has to be tagged with tag_state_mentions
+        :param start_ts: optional inclusive lower bound for posting_ts
+        :param end_ts: optional exclusive upper bound for posting_ts
+
+        Streams texts of posts mentioning the state, filtered on the server
+        """
+        query = {"states_mentioned": state}
+        if start_ts is not None or end_ts is not None:
+            query["posting_ts"] = {}
+            if start_ts is not None:
+                query["posting_ts"]["$gte"] = start_ts
+            if end_ts is not None:
+                query["posting_ts"]["$lt"] = end_ts
+
+        for post in self.iter_collection_entries(collection, filter=query, projection={"text": 1, "_id": 0}):
+            yield post.get("text", "")
+
+    def save_new_channel_posts(self, channel: str, posts: Post, states: list[str] = None) -> None:
         """
         :param channel: name of the channel, collection name
         "param posts: list of Post objects
+        :param states: optional states to tag posts with, in addition to the ones the collection is already tagged with
 
         Method either saves new data to existing collection in db or creates new collection and saves all the data passed
         """
         channel_name = channel.replace("@", "")
-        if channel_name not in self.get_all_collections():
+        if not self.has_collection(channel_name):
             self.logger.log(message=f'Collection for channel {channel} was not found in db. Creating...', level="info")
             self.create_new_channel_collection(channel_name)
 
-        serialized_posts = serialize_posts(posts=posts)
-        posts_to_save = self.assign_entry_ids(serialized_posts, name="id", custom=True)
-
-        existing_posts = self.get_collection_entries(collection=channel_name)
-        if not existing_posts:
-            existing_posts = []
+        # Tag posts at insert time with every state the collection is queried by
+        tagged_states = self.get_tagged_states(channel_name)
+        new_states = [state for state in states or [] if state not in tagged_states]
+        if new_states:
+            self.tag_state_mentions(channel_name, tagged_states + new_states)
+            tagged_states += new_states
+        state_matcher = StateMatcher(tagged_states) if tagged_states else None
 
-        existing_ids = {post["_id"] for post in existing_posts}
+        serialized_posts = serialize_posts(posts=posts, state_matcher=state_matcher)
+        posts_to_save = self.assign_entry_ids(serialized_posts, name="id", custom=True)
 
-        new_posts = [p for p in posts_to_save if p["_id"] not in existing_ids]
+        try:
+            inserted, duplicates = self.insert_new_entries(channel_name, posts_to_save)
+        except Exception as e:
+            self.logger.log(
+                message=f'Could not insert new posts into {channel_name}: {e}',
+                level="error"
+            )
+            return
 
-        if new_posts:
-            try:
-                self.database[channel_name].insert_many(new_posts)
-                self.logger.log(
-                    message=f'Inserted {len(new_posts)} new posts into collection {channel_name}',
-                    level="info"
-                )
-            except Exception as e:
-                self.logger.log(
-                    message=f'Could not insert new posts into {channel_name}: {e}',
-                    level="error"
-                )
+        if inserted:
+            self.logger.log(
+                message=f'Inserted {inserted} new posts into collection {channel_name}, skipped {duplicates} existing',
+                level="info"
+            )
         else:
             self.logger.log(
                 message=f'No new posts to insert for {channel_name}',
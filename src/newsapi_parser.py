@@ -1,16 +1,16 @@
-from gnews import GNews
 from datetime import datetime, timedelta
-from time import sleep
+from time import sleep, monotonic
 from hashlib import sha256
-from itertools import cycle
 from concurrent.futures import ThreadPoolExecutor, as_completed
 
 from tqdm import tqdm
 from mongo_wrapper.mongo_wrapper import MongoWrapper
 from logger.logger import Logger
+from proxy_pool import get_proxy_pool, is_throttled
+# per-thread GNews engines (es/mx, 100 results), one per proxy
+from google_news_production import _get_engine
 
 import os
-from pathlib import Path
 from dotenv import load_dotenv
 
 load_dotenv()
@@ -33,45 +33,38 @@ mongo_client = MongoWrapper(
 # Logger
 fetch_logger = Logger(logger_type="news_fetcher", stream_handler=True)
 
-# Proxy setup
-proxies_path = Path(__file__).parent / "files/proxies.txt"
-def get_proxies() -> list[str]:
-    with open(proxies_path) as f:
-        return [line.strip() if line.strip().startswith("http") else f'http://{line.strip()}'
-                for line in f if line.strip()]
-
-proxies = get_proxies()
-proxy_cycle = cycle(proxies)
+# Proxy setup, proxies from files/proxies.txt are handed out by health
+proxy_pool = get_proxy_pool()
 
 # Utility functions
 def hash_url(url: str) -> str:
     return sha256(url.encode('utf-8')).hexdigest()
 
 # Fetch articles for a given date range and return list of dicts
-# Uses a proxy to route requests
-def fetch_articles_range(gnews_engine: GNews, keyword: str, start: datetime, end: datetime, proxy: str) -> list[dict]:
+# Routes the request through the healthiest free proxy
+def fetch_articles_range(keyword: str, start: datetime, end: datetime) -> list[dict]:
+    proxy = proxy_pool.acquire()
+    gnews_engine = _get_engine(proxy)
     gnews_engine.start_date = (start.year, start.month, start.day)
     gnews_engine.end_date = (end.year, end.month, end.day)
-    gnews_engine.country = "mx"
-    gnews_engine.language = "es"
-    gnews_engine.max_results = 100
 
+    requested = monotonic()
     try:
-        gnews_engine.proxies = {"http": proxy, "https": proxy}
         raw = gnews_engine.get_news(keyword)
         articles = []
         for item in raw:
             item["id"] = hash_url(item.get("url", ""))
             articles.append(item)
+        proxy_pool.release(proxy, success=True, latency=monotonic() - requested)
         return articles
     except Exception as e:
+        proxy_pool.release(proxy, success=False, latency=monotonic() - requested, throttled=is_throttled(e))
         fetch_logger.log(f"Error fetching {keyword} {start.date()}–{end.date()}: {e}", "error")
         return []
 
 # Process one state: split into chunks and fetch each concurrently
 def process_state(state: str, start_date: datetime, end_date: datetime, max_workers: int = 5) -> None:
     fetch_logger.log(f"Starting fetch for {state}", "info")
-    gnews_engine = GNews()
     # Build date chunks of 10 days
     delta = timedelta(days=10)
     ranges = []
@@ -90,8 +83,7 @@ def process_state(state: str, start_date: datetime, end_date: datetime, max_work
     with ThreadPoolExecutor(max_workers=max_workers) as executor:
         futures = {}
         for state, s, e in tasks:
-            proxy = next(proxy_cycle)
-            futures[executor.submit(fetch_articles_range, gnews_engine, state, s, e, proxy)] = (state, s, e)
+            futures[executor.submit(fetch_articles_range, state, s, e)] = (state, s, e)
 
         for future in tqdm(as_completed(futures), total=len(futures), desc=state):
             st, s, e = futures[future]
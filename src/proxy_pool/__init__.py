@@ -0,0 +1,183 @@
+import os
+import random
+import threading
+from time import monotonic, sleep
+from pathlib import Path
+from typing import Optional
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# One proxy per line, "host:port" or a full url. Without the file requests go out directly
+PROXIES_FILE = os.getenv("PROXIES_FILE", str(Path(__file__).parent.parent / "files/proxies.txt"))
+
+# Seconds a proxy is benched after a 429, doubled with every consecutive 429 up to PROXY_MAX_COOLDOWN
+PROXY_COOLDOWN = float(os.getenv("PROXY_COOLDOWN", 60))
+PROXY_MAX_COOLDOWN = float(os.getenv("PROXY_MAX_COOLDOWN", 900))
+
+# Consecutive failures (not 429) after which a proxy is benched for PROXY_COOLDOWN too
+MAX_CONSECUTIVE_FAILURES = 3
+
+# Weight of the newest observation in the latency and success averages
+EWMA_ALPHA = 0.2
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+def load_proxies(path: str = PROXIES_FILE) -> list[Optional[str]]:
+    """
+    :param path: proxies file
+
+    Returns proxy urls, [None] (direct connection) if the file is missing or empty
+    """
+    if not Path(path).exists():
+        return [None]
+    with open(path) as f:
+        lines = [line.strip() for line in f if line.strip()]
+    return [line if line.startswith("http") else f'http://{line}' for line in lines] or [None]
+
+def is_throttled(error) -> bool:
+    # requests, gnews and googlenewsdecoder only surface the status code in the message
+    message = str(error)
+    return "429" in message or "Too Many Requests" in message
+
+class ProxyHealth:
+    def __init__(self):
+        self.latency = None
+        self.success_rate = 1.0
+        self.requests = 0
+        self.failures = 0
+        self.throttled = 0
+        self.consecutive_failures = 0
+        self.consecutive_throttled = 0
+        self.in_flight = 0
+        self.cooldown_until = 0.0
+        self.last_started = float("-inf")
+
+    def score(self) -> float:
+        # faster and more reliable is better, a proxy already busy with requests counts as slower
+        latency = self.latency if self.latency is not None else 1.0
+        return self.success_rate / (max(latency, 0.01) * (1 + self.in_flight))
+
+class ProxyPool:
+    """
+    Hands out proxies by health instead of round-robin.
+
+    Every proxy keeps a moving average of its latency and success rate. Of two random available
+    proxies the healthier one is given out, so the load spreads but drifts away from slow and
+    failing ones. A proxy is benched after a 429 or a run of failures, and when every proxy is
+    benched acquire waits for the first one to come back. Thread-safe.
+    """
+    def __init__(self, proxies: list[Optional[str]]):
+        self.health = {proxy: ProxyHealth() for proxy in dict.fromkeys(proxies)}
+        self.lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self.health)
+
+    @property
+    def proxies(self) -> list[Optional[str]]:
+        return list(self.health)
+
+    def acquire(self, min_interval: float = 0.0, exclude: tuple = ()) -> Optional[str]:
+        """
+        :param min_interval: minimum seconds between two requests started through the same proxy
+        :param exclude: proxies to avoid if any other one is available, e.g. the one that just failed
+
+        Returns the proxy to use, every acquire must be followed by a release
+        """
+        with self.lock:
+            now = monotonic()
+            candidates = [proxy for proxy in self.health if proxy not in exclude] or list(self.health)
+            ready_at = {
+                proxy: max(self.health[proxy].cooldown_until, self.health[proxy].last_started + min_interval)
+                for proxy in candidates
+            }
+            available = [proxy for proxy in candidates if ready_at[proxy] <= now]
+
+            if available:
+                # power of two choices
+                proxy = max(random.sample(available, min(2, len(available))), key=lambda p: self.health[p].score())
+            else:
+                proxy = min(candidates, key=ready_at.get)
+
+            health = self.health[proxy]
+            start = max(now, ready_at[proxy])
+            health.last_started = start
+            health.in_flight += 1
+
+        if start > now:
+            sleep(start - now)
+        return proxy
+
+    def release(self, proxy: Optional[str], success: bool, latency: float = None, throttled: bool = False) -> None:
+        """
+        :param proxy: proxy returned by acquire
+        :param success: whether the request went through
+        :param latency: seconds the request took
+        :param throttled: whether it failed with 429
+        """
+        with self.lock:
+            health = self.health.get(proxy)
+            if health is None:
+                return
+
+            health.in_flight = max(0, health.in_flight - 1)
+            health.requests += 1
+            health.success_rate += EWMA_ALPHA * (float(success) - health.success_rate)
+            if latency is not None:
+                health.latency = latency if health.latency is None else health.latency + EWMA_ALPHA * (latency - health.latency)
+
+            if success:
+                health.consecutive_failures = 0
+                health.consecutive_throttled = 0
+                return
+
+            health.failures += 1
+            health.consecutive_failures += 1
+            now = monotonic()
+            if health.cooldown_until > now:
+                # already benched, late answers of requests sent before do not extend it
+                if throttled:
+                    health.throttled += 1
+                return
+            if throttled:
+                health.throttled += 1
+                health.consecutive_throttled += 1
+                cooldown = min(PROXY_MAX_COOLDOWN, PROXY_COOLDOWN * 2 ** (health.consecutive_throttled - 1))
+            elif health.consecutive_failures >= MAX_CONSECUTIVE_FAILURES:
+                cooldown = PROXY_COOLDOWN
+            else:
+                return
+            health.cooldown_until = now + cooldown
+
+    def stats(self) -> dict:
+        with self.lock:
+            now = monotonic()
+            proxies = {
+                proxy: {
+                    "requests": health.requests,
+                    "failures": health.failures,
+                    "throttled": health.throttled,
+                    "success_rate": health.success_rate,
+                    "latency": health.latency,
+                    "in_flight": health.in_flight,
+                    "cooldown": max(0.0, health.cooldown_until - now)
+                }
+                for proxy, health in self.health.items()
+            }
+        return {
+            "proxies": proxies,
+            "available": sum(1 for proxy in proxies.values() if not proxy["cooldown"]),
+            "requests": sum(proxy["requests"] for proxy in proxies.values()),
+            "failures": sum(proxy["failures"] for proxy in proxies.values()),
+            "throttled": sum(proxy["throttled"] for proxy in proxies.values())
+        }
+
+def get_proxy_pool(path: str = PROXIES_FILE) -> ProxyPool:
+    # one pool per proxies file and process, so all fetchers share what they learn about the proxies
+    with _pools_lock:
+        if path not in _pools:
+            _pools[path] = ProxyPool(load_proxies(path))
+        return _pools[path]
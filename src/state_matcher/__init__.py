@@ -0,0 +1,57 @@
+import re
+
+class StateMatcher:
+    """
+    Finds all states mentioned in a text with one regex pass instead of one pass per state.
+
+    Matching is whole-word and case-insensitive, same as a separate \\bState\\b pattern per state.
+    """
+    def __init__(self, states: list[str]):
+        self.states = list(dict.fromkeys(states))
+
+        # one named group per state, longest names first so that "Baja California Sur"
+        # is preferred over "Baja California" when both start at the same position
+        order = sorted(range(len(self.states)), key=lambda i: -len(self.states[i]))
+        alternation = "|".join(f'(?P<s{i}>{re.escape(self.states[i])})' for i in order)
+
+        if not self.states:
+            self.pattern = None
+            self.implied = []
+            return
+
+        # cheap first-character check before trying the alternation at each word start
+        first_chars = "".join(sorted({c for state in self.states for c in (state[:1].lower(), state[:1].upper())}))
+
+        # zero-width lookahead, so overlapping mentions starting at different positions are all found
+        self.pattern = re.compile(
+            r'\b(?=[' + re.escape(first_chars) + r'])(?=(?:' + alternation + r')\b)',
+            re.IGNORECASE
+        )
+
+        # a state contains other states as whole words ("Baja California Sur" -> "Baja California"),
+        # those are mentioned whenever the longer one is, even though they start at the same position
+        single_patterns = [
+            re.compile(r'\b' + re.escape(state) + r'\b', re.IGNORECASE)
+            for state in self.states
+        ]
+        self.implied = [
+            [j for j, pattern in enumerate(single_patterns) if pattern.search(state)]
+            for state in self.states
+        ]
+
+    def find_indices(self, text: str) -> set[int]:
+        # indices of all states mentioned in text
+        found = set()
+        if not text or not self.states:
+            return found
+
+        for match in self.pattern.finditer(text):
+            idx = int(match.lastgroup[1:])
+            if idx not in found:
+                found.update(self.implied[idx])
+
+        return found
+
+    def find(self, text: str) -> list[str]:
+        # names of all states mentioned in text, in the order of the states list
+        return [self.states[i] for i in sorted(self.find_indices(text))]
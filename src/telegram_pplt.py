@@ -1,11 +1,14 @@
 from telethon import TelegramClient
+from telethon.errors import FloodWaitError
 from telethon.sessions import StringSession
 from datetime import datetime, timedelta
+from time import monotonic
+import asyncio
 import os
 from dotenv import load_dotenv
 from typing import Any
 
-from tg_scraper import get_posts
+from tg_scraper import sweep_posts
 from mongo_wrapper.mongo_wrapper import MongoWrapper
 
 load_dotenv()
@@ -22,14 +25,118 @@ MONGO_PASSWORD = os.getenv("MONGO_PASSWORD")
 
 TARGET_STRINGS = [" "]
 
-async def save_to_mongo(mongo_client: MongoWrapper, posts: list[Any], channel_username: str, start_year: int, end_year: int):
-    mongo_client.save_new_channel_posts(channel=f'{channel_username}_{start_year}_{end_year}', posts=posts)
+# channels swept at once over the same Telegram connection
+TELEGRAM_MAX_CONCURRENCY = int(os.getenv("TELEGRAM_MAX_CONCURRENCY", 4))
 
-async def download_posts(channels: list[str], start_year: int, end_year: int):
+# attempts per channel after FloodWait errors
+MAX_FLOOD_RETRIES = 5
+
+# seconds added to the wait Telegram asks for, doubled with every retry of the same channel
+FLOOD_WAIT_MARGIN = 1.0
+
+# attempts per channel after other errors (network, Telegram server), seconds before the first retry, doubled with every retry
+MAX_SWEEP_RETRIES = 3
+SWEEP_RETRY_DELAY = 5.0
+
+class FloodGate:
+    """
+    Pauses every download while Telegram asks to wait after a FloodWaitError,
+    the limit is per account, so concurrent requests would only extend it.
+    """
+    def __init__(self):
+        self.resume_at = 0.0
+
+    async def wait(self):
+        while (delay := self.resume_at - monotonic()) > 0:
+            await asyncio.sleep(delay)
+
+    def block(self, seconds: float):
+        self.resume_at = max(self.resume_at, monotonic() + seconds)
+
+def get_windows(start_year: int, end_year: int) -> list[tuple[str, str]]:
+    # 30-day (start, end) windows covering start_year to end_year, as 'dd/mm/YYYY' strings
     date_format = "%d/%m/%Y"
     current_date = datetime.strptime(f'01/01/{start_year}', date_format)
     end_date = datetime.strptime(f'31/12/{end_year}', date_format)
 
+    windows = []
+    while current_date < end_date:
+        interval_end = min(current_date + timedelta(days=30), end_date)
+        windows.append((current_date.strftime(date_format), interval_end.strftime(date_format)))
+        current_date = interval_end
+
+    return windows
+
+async def save_to_mongo(mongo_client: MongoWrapper, posts: list[Any], channel_username: str, start_year: int, end_year: int, states: list[str] = None):
+    # pymongo is blocking, keep the event loop free for the other downloads
+    await asyncio.to_thread(
+        mongo_client.save_new_channel_posts,
+        channel=f'{channel_username}_{start_year}_{end_year}',
+        posts=posts,
+        states=states
+    )
+
+async def download_channel(
+    client: TelegramClient,
+    mongo_client: MongoWrapper,
+    semaphore: asyncio.Semaphore,
+    flood_gate: FloodGate,
+    channel_username: str,
+    windows: list[tuple[str, str]],
+    start_year: int,
+    end_year: int,
+    states: list[str] = None
+) -> tuple[int, list[tuple[str, str]]]:
+    # one backward sweep over the whole period, every window is saved as soon as the sweep leaves it
+    # returns the number of posts and the windows that could not be downloaded
+    remaining = list(windows)
+    saves = []
+    total = 0
+    flood_waits = 0
+    errors = 0
+
+    # windows go to the same collection and every save may rescan it for state tags,
+    # so they are written one at a time while the sweep goes on
+    save_lock = asyncio.Lock()
+
+    async def save_window(posts: list[Any]):
+        async with save_lock:
+            await save_to_mongo(mongo_client, posts, channel_username, start_year, end_year, states=states)
+
+    async with semaphore:
+        while True:
+            await flood_gate.wait()
+            try:
+                async for window, posts in sweep_posts(client, channel_username, remaining, TARGET_STRINGS):
+                    saves.append(asyncio.create_task(save_window(posts)))
+                    remaining.remove(window)
+                    total += len(posts)
+                    print(f'channel {channel_username}: {len(posts)} posts {window[0]} to {window[1]}')
+                break
+            except FloodWaitError as e:
+                # the sweep restarts at the newest window that was not saved yet
+                if flood_waits == MAX_FLOOD_RETRIES:
+                    print(f'Giving up on {channel_username} after {flood_waits + 1} FloodWait errors, {len(remaining)} windows left')
+                    break
+                wait = e.seconds + FLOOD_WAIT_MARGIN * 2 ** flood_waits
+                flood_waits += 1
+                print(f'FloodWait on {channel_username}: pausing downloads for {wait:.0f} s')
+                flood_gate.block(wait)
+            except Exception as e:
+                if errors == MAX_SWEEP_RETRIES:
+                    print(f'Giving up on {channel_username} after {errors + 1} errors ({e}), {len(remaining)} windows left')
+                    break
+                delay = SWEEP_RETRY_DELAY * 2 ** errors
+                errors += 1
+                print(f'Error sweeping {channel_username}: {e}, retrying {len(remaining)} windows in {delay:.0f} s')
+                await asyncio.sleep(delay)
+
+    await asyncio.gather(*saves)
+    return total, remaining
+
+async def download_posts(channels: list[str], start_year: int, end_year: int, states: list[str] = None, max_concurrency: int = TELEGRAM_MAX_CONCURRENCY):
+    windows = get_windows(start_year, end_year)
+
     mongo_client = MongoWrapper(
         db=MONGO_DB,
         user=MONGO_USERNAME,
@@ -38,26 +145,22 @@ async def download_posts(channels: list[str], start_year: int, end_year: int):
         port=MONGO_PORT
     )
 
-    async with TelegramClient(StringSession(TELEGRAM_SESSION), API_ID, API_HASH) as client:
-        while current_date < end_date:
-            interval_end = current_date + timedelta(days=30)
-            print(client.session.save())
-            if interval_end > end_date:
-                interval_end = end_date
-
-            start_str = current_date.strftime(date_format)
-            end_str = interval_end.strftime(date_format)
-
-            for index, channel_username in enumerate(channels, start=1):
-                posts = await get_posts(
-                    client=client,
-                    channel=channel_username,
-                    start=start_str,
-                    end=end_str,
-                    target_strings=TARGET_STRINGS
-                )
+    semaphore = asyncio.Semaphore(max_concurrency)
+    flood_gate = FloodGate()
 
-                await save_to_mongo(mongo_client, posts, channel_username, start_year, end_year)
-                print(f'{index}/{len(channels)} channel {channel_username}: {len(posts)} posts {start_str} to {end_str}')
+    async with TelegramClient(StringSession(TELEGRAM_SESSION), API_ID, API_HASH) as client:
+        async def run(channel_username: str):
+            posts, missing = await download_channel(client, mongo_client, semaphore, flood_gate, channel_username, windows, start_year, end_year, states)
+            return channel_username, posts, missing
 
-            current_date = interval_end
+        # channels are swept concurrently, the semaphore caps how many at once
+        jobs = [run(channel_username) for channel_username in channels]
+        for index, job in enumerate(asyncio.as_completed(jobs), start=1):
+            channel_username, posts, missing = await job
+            if missing:
+                print(
+                    f'{index}/{len(jobs)} channel {channel_username} incomplete: {posts} posts, '
+                    f'{len(missing)} of {len(windows)} windows not saved: {", ".join(f"{start} to {end}" for start, end in missing)}'
+                )
+            else:
+                print(f'{index}/{len(jobs)} channel {channel_username} done: {posts} posts in {len(windows)} windows')
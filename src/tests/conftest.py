@@ -0,0 +1,9 @@
+import os
+import sys
+import tempfile
+
+# modules are imported from src/, the same way the app and the benchmarks run
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# loggers write <name>.log into the working directory, keep them out of the tree
+os.chdir(tempfile.mkdtemp(prefix="masters_thesis_tests_"))
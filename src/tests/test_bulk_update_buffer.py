@@ -0,0 +1,97 @@
+from time import sleep
+
+import pytest
+from pymongo.errors import AutoReconnect
+
+from mongo_wrapper.mongo_wrapper import BulkUpdateBuffer, MongoWrapper
+
+class FakeLogger:
+    def __init__(self):
+        self.messages = []
+
+    def log(self, message, level="info"):
+        self.messages.append((level, message))
+
+class FlakyMongo:
+    # fails the first `failures` bulk writes with a non-PyMongo error
+    def __init__(self, failures: int):
+        self.failures = failures
+        self.written = []
+        self.logger = FakeLogger()
+
+    def bulk_write_updates(self, collection, bulk_ops, raise_errors=False):
+        if self.failures:
+            self.failures -= 1
+            raise ConnectionError("Mongo is not reachable")
+        self.written.append((collection, len(bulk_ops)))
+
+def test_periodic_flusher_survives_errors_and_keeps_updates():
+    mongo = FlakyMongo(failures=2)
+    with BulkUpdateBuffer(mongo, max_ops=100, flush_interval=0.02) as updates:
+        updates.add("gnews_Jalisco", 1, {"decoded_url": "a"})
+        updates.add("gnews_Jalisco", 2, {"decoded_url": "b"})
+        for _ in range(100):
+            if mongo.written:
+                break
+            sleep(0.02)
+
+    assert mongo.written == [("gnews_Jalisco", 2)]
+    assert sum(level == "error" for level, _ in mongo.logger.messages) == 2
+
+def test_failed_flush_keeps_updates_queued():
+    mongo = FlakyMongo(failures=1)
+    updates = BulkUpdateBuffer(mongo, max_ops=100)
+    updates.add("a", 1, {"x": 1})
+    try:
+        updates.flush()
+    except ConnectionError:
+        pass
+    updates.add("a", 2, {"x": 2})
+    updates.flush()
+    assert mongo.written == [("a", 2)]
+
+class FakeResult:
+    modified_count = 1
+
+class FlakyCollection:
+    # fails the first `failures` bulk writes like a dropped connection
+    def __init__(self, failures: int):
+        self.failures = failures
+        self.written = []
+
+    def bulk_write(self, bulk_ops, ordered=True):
+        if self.failures:
+            self.failures -= 1
+            raise AutoReconnect("connection closed")
+        self.written.extend(op._filter["_id"] for op in bulk_ops)
+        return FakeResult()
+
+class FakeDatabaseMongo(MongoWrapper):
+    def __init__(self, collection: FlakyCollection):
+        super().__init__(db="buffer_test", user="u", password="p", ip="unreachable.invalid", port=1)
+        self.collection = collection
+
+    @property
+    def database(self):
+        return {"a": self.collection}
+
+def test_mongo_errors_keep_updates_queued():
+    collection = FlakyCollection(failures=1)
+    updates = BulkUpdateBuffer(FakeDatabaseMongo(collection), max_ops=100)
+    updates.add("a", 1, {"x": 1})
+    with pytest.raises(AutoReconnect):
+        updates.flush()
+    assert updates.bulk_writes == 0
+
+    updates.flush()
+    assert (collection.written, updates.bulk_writes) == ([1], 1)
+
+def test_failed_size_triggered_write_keeps_its_batch():
+    collection = FlakyCollection(failures=1)
+    updates = BulkUpdateBuffer(FakeDatabaseMongo(collection), max_ops=2)
+    updates.add("a", 1, {"x": 1})
+    with pytest.raises(AutoReconnect):
+        updates.add("a", 2, {"x": 2})
+    updates.add("a", 3, {"x": 3})
+    updates.flush()
+    assert collection.written == [1, 2, 3]
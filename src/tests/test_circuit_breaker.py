@@ -0,0 +1,127 @@
+import pytest
+
+# importing the decoder imports the google_news_production package
+pytest.importorskip("gnews")
+pytest.importorskip("tqdm")
+pytest.importorskip("googlenewsdecoder")
+
+from google_news_production import decoder
+from google_news_production.decoder import CircuitBreaker, BREAKER_MIN_CALLS, BREAKER_COOLDOWN, DECODE_ATTEMPTS
+import proxy_pool
+from proxy_pool import ProxyPool
+
+class FakeClock:
+    # sleeping only moves the clock
+    def __init__(self):
+        self.now = 1000.0
+
+    def monotonic(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.now += seconds
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(decoder, "time", clock)
+    return clock
+
+def trip(breaker: CircuitBreaker):
+    for _ in range(BREAKER_MIN_CALLS):
+        breaker.record(success=False, probe=False)
+
+def test_stays_closed_below_the_error_rate(clock):
+    breaker = CircuitBreaker("news.google.com")
+    for i in range(2 * BREAKER_MIN_CALLS):
+        breaker.record(success=i % 3 != 0, probe=False)
+    assert breaker.trips == 0
+    assert breaker.wait() is False
+
+def test_opens_and_closes_after_a_successful_probe(clock):
+    breaker = CircuitBreaker("news.google.com")
+    trip(breaker)
+    assert breaker.trips == 1
+
+    opened = clock.now
+    assert breaker.wait() is True
+    assert clock.now - opened == pytest.approx(BREAKER_COOLDOWN)
+
+    breaker.record(success=True, probe=True)
+    assert breaker.wait() is False
+    assert clock.now - opened == pytest.approx(BREAKER_COOLDOWN)
+
+def test_failed_probe_doubles_the_cooldown(clock):
+    breaker = CircuitBreaker("news.google.com")
+    trip(breaker)
+    assert breaker.wait() is True
+    breaker.record(success=False, probe=True)
+    assert breaker.trips == 2
+
+    reopened = clock.now
+    assert breaker.wait() is True
+    assert clock.now - reopened == pytest.approx(2 * BREAKER_COOLDOWN)
+
+def test_late_answers_do_not_decide_a_half_open_breaker(clock):
+    breaker = CircuitBreaker("news.google.com")
+    trip(breaker)
+    breaker.record(success=True, probe=False)
+    breaker.record(success=False, probe=False)
+    assert breaker.trips == 1
+    assert breaker.half_open
+
+def test_old_outcomes_leave_the_window(clock):
+    breaker = CircuitBreaker("news.google.com")
+    for _ in range(BREAKER_MIN_CALLS - 1):
+        breaker.record(success=False, probe=False)
+    clock.now += decoder.BREAKER_WINDOW + 1
+    breaker.record(success=False, probe=False)
+    assert breaker.trips == 0
+
+class FakeDecodeRate:
+    def record(self, success, attempts):
+        pass
+
+@pytest.fixture
+def decoder_answers(monkeypatch, clock):
+    # makes gnewsdecoder answer with the given message and counts the calls
+    calls = []
+
+    def install(message):
+        def gnewsdecoder(url, proxy=None):
+            calls.append(url)
+            return {"status": False, "message": message}
+
+        monkeypatch.setattr(decoder, "gnewsdecoder", gnewsdecoder)
+        # enough proxies that none is benched, benches run on the same fake clock
+        monkeypatch.setattr(proxy_pool, "monotonic", clock.monotonic)
+        monkeypatch.setattr(proxy_pool, "sleep", clock.sleep)
+        monkeypatch.setattr(decoder, "proxy_pool", ProxyPool([f"http://proxy-{i}" for i in range(BREAKER_MIN_CALLS)]))
+        monkeypatch.setattr(decoder, "_breakers", {})
+        monkeypatch.setattr(decoder, "decode_rate", FakeDecodeRate())
+        return calls
+
+    return install
+
+def test_urls_that_can_not_be_decoded_do_not_open_the_breaker(decoder_answers):
+    calls = decoder_answers("Invalid Google News URL format")
+    for i in range(2 * BREAKER_MIN_CALLS):
+        assert decoder._decode_url(f"https://news.google.com/rss/articles/bad-{i}") is None
+
+    assert decoder._get_breaker("https://news.google.com/").trips == 0
+    # a permanent error is not retried
+    assert len(calls) == 2 * BREAKER_MIN_CALLS
+
+def test_connection_errors_open_the_breaker(decoder_answers):
+    calls = decoder_answers("Error fetching data: 503 Server Error: Service Unavailable")
+    for i in range(BREAKER_MIN_CALLS // DECODE_ATTEMPTS):
+        assert decoder._decode_url(f"https://news.google.com/rss/articles/url-{i}") is None
+
+    assert len(calls) == BREAKER_MIN_CALLS
+    assert decoder._get_breaker("https://news.google.com/").trips == 1
+
+def test_rate_limits_and_connection_errors_are_transport_failures():
+    assert decoder.is_transport_failure("Error fetching data: 429 Client Error: Too Many Requests")
+    assert decoder.is_transport_failure(ConnectionError("Connection refused"))
+    assert not decoder.is_transport_failure("Invalid Google News URL format")
+    assert not decoder.is_transport_failure("Failed to extract data from Google News.")
@@ -0,0 +1,106 @@
+from yt_client.yt_client import YouTubeClient
+
+class FakeLogger:
+    def log(self, message, level="info"):
+        pass
+
+class FakeCommentsAPI:
+    # serves the comments of one video newest first, page tokens are offsets
+    def __init__(self, times: list[str], ids: list[str] = None):
+        # ids default to the times, pass them for comments posted at the same second
+        self.comments = sorted(zip(times, ids or times), reverse=True)
+        self.refreshed = []
+
+    def request(self, endpoint, pageToken=None, maxResults=100, refresh=False, **params):
+        self.refreshed.append(refresh)
+        offset = int(pageToken or 0)
+        page = self.comments[offset:offset + maxResults]
+        response = {"items": [
+            {"id": i, "snippet": {"topLevelComment": {"snippet": {"publishedAt": t}}}} for t, i in page
+        ]}
+        if offset + maxResults < len(self.comments):
+            response["nextPageToken"] = str(offset + maxResults)
+        return response
+
+class FakeMongo:
+    def __init__(self):
+        self.comments = {}
+        self.crawl = {}
+        self.fail_saves = False
+
+    def get_comment_crawl(self, video_id):
+        return dict(self.crawl) or None
+
+    def get_newest_comment_published_at(self, video_id):
+        return max((comment["snippet"]["topLevelComment"]["snippet"]["publishedAt"] for comment in self.comments.values()), default=None)
+
+    def save_comment_crawl(self, video_id, checkpoint):
+        self.crawl.update(checkpoint)
+
+    def save_new_yt_comments(self, comments):
+        if self.fail_saves:
+            return False
+        self.comments.update((comment["id"], comment) for comment in comments)
+        return True
+
+def make_client(times):
+    client = object.__new__(YouTubeClient)
+    client.api = FakeCommentsAPI(times)
+    client.mongo_client = FakeMongo()
+    client.logger = FakeLogger()
+    return client
+
+def times(first, last):
+    return [f'2024-01-01T00:{minute:02d}:00Z' for minute in range(first, last)]
+
+def test_incremental_crawl_closes_a_gap_larger_than_the_limit():
+    client = make_client(times(0, 10))
+    assert client._crawl_comments("v", limit=100) == 10
+    assert client.mongo_client.crawl["complete"]
+
+    # 25 new comments, fetched 10 per call
+    client.api = FakeCommentsAPI(times(0, 35))
+    client._crawl_comments("v", limit=10)
+    client._crawl_comments("v", limit=10)
+    # the gap is still open, the stored newest time must not move
+    assert client.mongo_client.crawl["newest_published_at"] == times(9, 10)[0]
+    client._crawl_comments("v", limit=10)
+
+    assert sorted(client.mongo_client.comments) == times(0, 35)
+    assert client.mongo_client.crawl["newest_published_at"] == times(34, 35)[0]
+    assert client.mongo_client.crawl["incremental_page_token"] is None
+
+def test_failed_save_keeps_the_checkpoint():
+    client = make_client(times(0, 10))
+    client.mongo_client.fail_saves = True
+    client._crawl_comments("v", limit=100)
+    assert client.mongo_client.crawl == {}
+
+    client.mongo_client.fail_saves = False
+    client._crawl_comments("v", limit=100)
+    assert sorted(client.mongo_client.comments) == times(0, 10)
+
+def test_incremental_crawl_bypasses_cached_pages():
+    client = make_client(times(0, 10))
+    client._crawl_comments("v", limit=100)
+    client.api = FakeCommentsAPI(times(0, 12))
+    client._crawl_comments("v", limit=100)
+    assert client.api.refreshed == [True]
+    assert sorted(client.mongo_client.comments) == times(0, 12)
+
+def test_new_comment_at_the_newest_stored_time_is_kept():
+    newest = times(9, 10)[0]
+    client = make_client(times(0, 10))
+    client._crawl_comments("v", limit=100)
+
+    client.api = FakeCommentsAPI(times(0, 10) + [newest], ids=times(0, 10) + ["same-second"])
+    client._crawl_comments("v", limit=100)
+    assert "same-second" in client.mongo_client.comments
+
+def test_video_without_checkpoint_only_fetches_newer_comments():
+    client = make_client(times(0, 30))
+    for t in times(20, 30):
+        client.mongo_client.comments[t] = {"id": t, "snippet": {"topLevelComment": {"snippet": {"publishedAt": t}}}}
+
+    assert client._crawl_comments("v", limit=5) == 5
+    assert client.mongo_client.crawl["newest_published_at"] == times(29, 30)[0]
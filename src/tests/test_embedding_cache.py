@@ -0,0 +1,83 @@
+import os
+
+import numpy as np
+
+from embedding_cache import embedding_cache
+from embedding_cache.embedding_cache import EmbeddingCache
+
+class FakeModel:
+    def __init__(self, dim: int):
+        self.dim = dim
+        self.calls = 0
+
+    def encode(self, texts, batch_size=64, convert_to_numpy=True):
+        self.calls += 1
+        return np.array([[len(text) + i for i in range(self.dim)] for text in texts], dtype=np.float32)
+
+def test_cached_rows_survive_reopen(tmp_path):
+    model = FakeModel(dim=4)
+    cache = EmbeddingCache("model", dim=4, cache_dir=str(tmp_path), max_rows=8)
+    first = cache.encode(model, ["uno", "dos", "uno"])
+    cache.flush()
+
+    reopened = EmbeddingCache("model", dim=4, cache_dir=str(tmp_path), max_rows=8)
+    again = reopened.encode(model, ["dos", "uno"])
+
+    assert model.calls == 1
+    np.testing.assert_allclose(again, first[[1, 0]])
+
+def test_truncated_files_are_rebuilt(tmp_path):
+    model = FakeModel(dim=4)
+    cache = EmbeddingCache("model", dim=4, cache_dir=str(tmp_path), max_rows=8)
+    cache.encode(model, ["uno"])
+    cache.flush()
+
+    # files that do not agree on the number of rows
+    keys_path = os.path.join(cache.path, "keys.u8")
+    with open(keys_path, "r+b") as f:
+        f.truncate(os.path.getsize(keys_path) // 2)
+
+    reopened = EmbeddingCache("model", dim=4, cache_dir=str(tmp_path), max_rows=8)
+    assert reopened.stats()["rows"] == 0
+    reopened.encode(model, ["uno"])
+    assert model.calls == 2
+
+def test_files_grow_on_demand(tmp_path, monkeypatch):
+    monkeypatch.setattr(embedding_cache, "INITIAL_ROWS", 2)
+    model = FakeModel(dim=4)
+    cache = EmbeddingCache("model", dim=4, cache_dir=str(tmp_path), max_rows=8)
+    assert cache.stats()["capacity"] == 2
+
+    texts = ["a" * n for n in range(1, 6)]
+    first = cache.encode(model, texts)
+    cache.flush()
+    assert cache.stats()["capacity"] == 5
+    assert os.path.getsize(os.path.join(cache.path, "embeddings.f16")) == 5 * 4 * 2
+
+    reopened = EmbeddingCache("model", dim=4, cache_dir=str(tmp_path), max_rows=8)
+    np.testing.assert_allclose(reopened.encode(model, texts), first)
+    assert model.calls == 1
+
+def test_crash_after_reusing_rows_never_returns_other_vectors(tmp_path, monkeypatch):
+    monkeypatch.setattr(embedding_cache, "INITIAL_ROWS", 2)
+    model = FakeModel(dim=4)
+    cache = EmbeddingCache("model", dim=4, cache_dir=str(tmp_path), max_rows=2)
+    cache.encode(model, ["a", "bb"])
+    cache.flush()
+    # evicts both rows and writes other vectors into them, then the process dies before a flush
+    cache.encode(model, ["ccc", "dddd"])
+
+    reopened = EmbeddingCache("model", dim=4, cache_dir=str(tmp_path), max_rows=2)
+    assert reopened.stats()["rows"] == 0
+    fresh = FakeModel(dim=4)
+    np.testing.assert_allclose(reopened.encode(fresh, ["a", "bb"]), fresh.encode(["a", "bb"]))
+
+def test_backends_have_separate_caches(tmp_path):
+    model = FakeModel(dim=4)
+    torch = EmbeddingCache("model", dim=4, cache_dir=str(tmp_path), max_rows=8)
+    torch.encode(model, ["uno"])
+    torch.flush()
+
+    # other backends never reuse torch vectors
+    int8 = EmbeddingCache("model", dim=4, backend="int8", cache_dir=str(tmp_path), max_rows=8)
+    assert int8.stats()["rows"] == 0
@@ -0,0 +1,84 @@
+from collections import deque
+from datetime import date, datetime, timedelta
+
+import pytest
+
+pytest.importorskip("gnews")
+
+import google_news_production as gnp
+from google_news_production import _next_window
+
+def day(n: int) -> datetime:
+    return datetime(2024, 1, 1) + timedelta(days=n)
+
+def windows(*bounds: int) -> deque:
+    return deque((day(s), day(e)) for s, e in zip(bounds, bounds[1:]))
+
+def test_next_window_merges_adjacent_windows():
+    pending = windows(0, 10, 20, 30)
+    assert _next_window(pending, 2) == (day(0), day(20))
+    assert _next_window(pending, 2) == (day(20), day(30))
+    assert not pending
+
+def test_next_window_stops_at_a_gap():
+    pending = deque([(day(0), day(10)), (day(15), day(20))])
+    assert _next_window(pending, 4) == (day(0), day(10))
+    assert list(pending) == [(day(15), day(20))]
+
+@pytest.fixture
+def fetches(monkeypatch):
+    # records every requested window, answers through the given function
+    requested = []
+
+    def install(answer):
+        def fetch_and_save(pool, proxy_interval, keyword, start, end):
+            requested.append(((start - day(0)).days, (end - day(0)).days))
+            return answer(start, end, len(requested))
+
+        monkeypatch.setattr(gnp, "_fetch_and_save", fetch_and_save)
+        return requested
+
+    return install
+
+def run(chunks: int) -> dict:
+    return gnp.fetch_gnews_data(["kw"], date(2024, 1, 1), (day(0) + timedelta(days=10 * chunks)).date(), max_workers=1, chunk_days=10)["kw"]
+
+def test_full_window_is_split(fetches):
+    requested = fetches(lambda start, end, n: gnp.GNEWS_MAX_RESULTS if n == 1 else 5)
+    stats = run(1)
+    assert requested == [(0, 10), (0, 5), (5, 10)]
+    # the capped articles of the split window are fetched again by its halves
+    assert (stats["splits"], stats["articles"]) == (1, 10)
+
+def test_empty_windows_are_merged(fetches):
+    requested = fetches(lambda start, end, n: 0)
+    run(7)
+    assert requested == [(0, 10), (10, 30), (30, 70)]
+
+def test_failed_window_is_retried_without_changing_the_merge(fetches):
+    # empty, empty, failed, then empty again
+    requested = fetches(lambda start, end, n: None if n == 3 else 0)
+    stats = run(7)
+    assert requested == [(0, 10), (10, 30), (30, 70), (30, 70)]
+    assert (stats["failures"], stats["lost"], stats["requests"]) == (1, 0, 4)
+
+def test_window_is_given_up_after_every_attempt_failed(fetches):
+    requested = fetches(lambda start, end, n: None)
+    stats = run(1)
+    assert requested == [(0, 10)] * gnp.GNEWS_WINDOW_ATTEMPTS
+    assert (stats["failures"], stats["lost"]) == (gnp.GNEWS_WINDOW_ATTEMPTS, 1)
+
+def test_window_that_was_not_saved_is_retried(monkeypatch):
+    saves = []
+
+    def save_new_pagination_news(news, collection_name):
+        saves.append(len(news))
+        return len(saves) > 1
+
+    monkeypatch.setattr(gnp.mongo_client, "save_new_pagination_news", save_new_pagination_news)
+    monkeypatch.setattr(gnp, "_fetch_range", lambda keyword, start, end, proxy: [{"id": "a"}, {"id": "b"}])
+    monkeypatch.setattr(gnp.proxy_pool, "acquire", lambda min_interval=0.0, exclude=(): None)
+
+    stats = run(1)
+    assert saves == [2, 2]
+    assert (stats["failures"], stats["articles"]) == (1, 2)
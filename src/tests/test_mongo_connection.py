@@ -0,0 +1,43 @@
+import pytest
+
+from mongo_wrapper import mongo_wrapper as mw
+
+class UnreachableAdmin:
+    def __init__(self):
+        self.attempts = 0
+
+    def command(self, name):
+        self.attempts += 1
+        raise ConnectionError("connection refused")
+
+class UnreachableClient:
+    def __init__(self):
+        self.admin = UnreachableAdmin()
+
+@pytest.fixture
+def unreachable(monkeypatch):
+    client = UnreachableClient()
+    monkeypatch.setattr(mw, "get_mongo_client", lambda uri: client)
+    monkeypatch.setattr(mw, "sleep", lambda seconds: None)
+    monkeypatch.setattr(mw, "_failed_uris", {})
+    return client
+
+def test_unreachable_server_fails_fast_until_backoff_expires(unreachable, monkeypatch):
+    clock = [100.0]
+    monkeypatch.setattr(mw, "monotonic", lambda: clock[0])
+    mongo = mw.MongoWrapper(db="unreachable_test", user="u", password="p", ip="unreachable.invalid", port=1)
+
+    with pytest.raises(ConnectionError):
+        mongo.database
+    first_round = unreachable.admin.attempts
+    assert first_round == 6
+
+    # within the backoff no new connection attempts are made
+    with pytest.raises(ConnectionError):
+        mongo.database
+    assert unreachable.admin.attempts == first_round
+
+    clock[0] += mw.CONNECT_FAILURE_BACKOFF + 1
+    with pytest.raises(ConnectionError):
+        mongo.database
+    assert unreachable.admin.attempts == 2 * first_round
@@ -0,0 +1,93 @@
+import pytest
+
+import proxy_pool
+from proxy_pool import ProxyPool, load_proxies, is_throttled, PROXY_COOLDOWN, MAX_CONSECUTIVE_FAILURES
+
+PROXIES = ["http://a:1", "http://b:1", "http://c:1"]
+
+class FakeClock:
+    # sleeping only moves the clock
+    def __init__(self):
+        self.now = 1000.0
+
+    def monotonic(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.now += seconds
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(proxy_pool, "monotonic", clock.monotonic)
+    monkeypatch.setattr(proxy_pool, "sleep", clock.sleep)
+    return clock
+
+def test_load_proxies(tmp_path):
+    path = tmp_path / "proxies.txt"
+    assert load_proxies(str(path)) == [None]
+    path.write_text("1.2.3.4:8080\n\nhttp://5.6.7.8:3128\n")
+    assert load_proxies(str(path)) == ["http://1.2.3.4:8080", "http://5.6.7.8:3128"]
+
+def test_is_throttled():
+    assert is_throttled(Exception("429 Client Error: Too Many Requests"))
+    assert not is_throttled(Exception("connection reset"))
+
+def test_throttled_proxy_is_benched(clock):
+    pool = ProxyPool(PROXIES)
+    proxy = pool.acquire()
+    pool.release(proxy, success=False, throttled=True)
+    assert all(pool.acquire() != proxy for _ in range(20))
+    assert pool.stats()["available"] == 2
+
+def test_cooldown_doubles_with_consecutive_throttles(clock):
+    pool = ProxyPool(PROXIES[:1])
+    proxy = pool.acquire()
+    pool.release(proxy, success=False, throttled=True)
+    assert pool.stats()["proxies"][proxy]["cooldown"] == pytest.approx(PROXY_COOLDOWN)
+
+    clock.now += PROXY_COOLDOWN
+    pool.release(pool.acquire(), success=False, throttled=True)
+    assert pool.stats()["proxies"][proxy]["cooldown"] == pytest.approx(2 * PROXY_COOLDOWN)
+
+def test_late_failures_do_not_extend_the_cooldown(clock):
+    pool = ProxyPool(PROXIES[:1])
+    # requests sent before the first 429 answer
+    sent = [pool.acquire() for _ in range(5)]
+    for proxy in sent:
+        pool.release(proxy, success=False, throttled=True)
+
+    stats = pool.stats()["proxies"][PROXIES[0]]
+    assert stats["cooldown"] == pytest.approx(PROXY_COOLDOWN)
+    assert stats["throttled"] == 5
+
+def test_run_of_failures_benches_the_proxy(clock):
+    pool = ProxyPool(PROXIES[:1])
+    for _ in range(MAX_CONSECUTIVE_FAILURES - 1):
+        pool.release(pool.acquire(), success=False)
+    assert pool.stats()["available"] == 1
+    pool.release(pool.acquire(), success=False)
+    assert pool.stats()["available"] == 0
+
+def test_acquire_waits_for_the_first_proxy_back(clock):
+    pool = ProxyPool(PROXIES[:2])
+    for proxy in PROXIES[:2]:
+        pool.acquire()
+        pool.release(proxy, success=False, throttled=True)
+        clock.now += 10
+
+    started = clock.now
+    assert pool.acquire() == PROXIES[0]
+    assert clock.now == pytest.approx(started + PROXY_COOLDOWN - 20)
+
+def test_min_interval_spaces_requests_of_a_proxy(clock):
+    pool = ProxyPool(PROXIES[:1])
+    pool.acquire(min_interval=2.0)
+    started = clock.now
+    pool.acquire(min_interval=2.0)
+    assert clock.now == pytest.approx(started + 2.0)
+
+def test_exclude_is_avoided_while_others_are_available(clock):
+    pool = ProxyPool(PROXIES[:2])
+    assert all(pool.acquire(exclude=(PROXIES[0],)) == PROXIES[1] for _ in range(10))
+    assert pool.acquire(exclude=tuple(PROXIES[:2])) in PROXIES[:2]
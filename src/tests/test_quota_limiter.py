@@ -0,0 +1,73 @@
+import threading
+
+import pytest
+
+from yt_client.yt_api import QuotaLimiter, QuotaExceeded
+
+class FakeQuotaStore:
+    # stands in for the Mongo collection shared by all processes
+    def __init__(self):
+        self.spent = {}
+
+    def add(self, day, units):
+        self.spent[day] = self.spent.get(day, 0) + units
+        return self.spent[day]
+
+class SlowQuotaStore(FakeQuotaStore):
+    # answers once released, like a Mongo server that is slow to respond
+    def __init__(self):
+        super().__init__()
+        self.called = threading.Event()
+        self.release = threading.Event()
+
+    def add(self, day, units):
+        self.called.set()
+        self.release.wait(5)
+        return super().add(day, units)
+
+class BrokenQuotaStore:
+    def add(self, day, units):
+        raise ConnectionError("connection refused")
+
+def test_spent_units_survive_a_restart():
+    store = FakeQuotaStore()
+    QuotaLimiter(daily_budget=250, burst=500, store=store).acquire(100)
+    QuotaLimiter(daily_budget=250, burst=500, store=store).acquire(100)
+
+    restarted = QuotaLimiter(daily_budget=250, burst=500, store=store)
+    with pytest.raises(QuotaExceeded):
+        restarted.acquire(100)
+    # the refused reservation is given back
+    assert list(store.spent.values()) == [200]
+    assert restarted.stats()["remaining"] == 50
+
+def test_in_memory_budget():
+    limiter = QuotaLimiter(daily_budget=150, burst=500)
+    limiter.acquire(100)
+    with pytest.raises(QuotaExceeded):
+        limiter.acquire(100)
+    limiter.acquire(50)
+    assert limiter.stats() == {"persisted": False, "spent": 150, "remaining": 0, "daily_budget": 150}
+
+def test_store_failure_falls_back_to_memory():
+    limiter = QuotaLimiter(daily_budget=150, burst=500, store=BrokenQuotaStore())
+    limiter.acquire(100)
+    assert limiter.stats()["persisted"] is False
+    with pytest.raises(QuotaExceeded):
+        limiter.acquire(100)
+
+def test_store_is_called_outside_the_lock():
+    store = SlowQuotaStore()
+    limiter = QuotaLimiter(daily_budget=250, burst=500, store=store)
+    thread = threading.Thread(target=limiter.acquire, args=(100,))
+    thread.start()
+    assert store.called.wait(5)
+
+    # other threads are not blocked while the store answers
+    acquired = limiter.lock.acquire(timeout=1)
+    assert acquired
+    limiter.lock.release()
+
+    store.release.set()
+    thread.join(5)
+    assert limiter.stats()["spent"] == 100
@@ -0,0 +1,17 @@
+import asyncio
+
+from yt_client.yt_api import run_sync
+
+async def answer():
+    await asyncio.sleep(0)
+    return 42
+
+def test_run_sync_without_a_loop():
+    assert run_sync(answer()) == 42
+
+def test_run_sync_inside_a_running_loop():
+    async def caller():
+        # e.g. a synchronous wrapper called from a notebook cell
+        return run_sync(answer())
+
+    assert asyncio.run(caller()) == 42
@@ -0,0 +1,34 @@
+import re
+import random
+
+from state_matcher import StateMatcher
+
+STATES = ["Baja California", "Baja California Sur", "Colima", "México", "Estado de México", "Jalisco"]
+
+def per_state(text: str) -> list[str]:
+    # the per-state regexes StateMatcher replaces
+    return [state for state in STATES if re.search(r'\b' + re.escape(state) + r'\b', text, re.IGNORECASE)]
+
+def test_whole_words_case_insensitive():
+    matcher = StateMatcher(STATES)
+    assert matcher.find("Lluvias en JALISCO y colima") == ["Colima", "Jalisco"]
+    assert matcher.find("colimador y Jaliscoense") == []
+    assert matcher.find("#Jalisco") == ["Jalisco"]
+
+def test_nested_names_imply_the_shorter_state():
+    matcher = StateMatcher(STATES)
+    assert matcher.find("Baja California Sur") == ["Baja California", "Baja California Sur"]
+    assert matcher.find("Estado de México") == ["México", "Estado de México"]
+
+def test_empty_inputs():
+    assert StateMatcher([]).find("Jalisco") == []
+    assert StateMatcher(STATES).find("") == []
+    assert StateMatcher(STATES).find(None) == []
+
+def test_matches_per_state_regexes_on_random_text():
+    random.seed(3)
+    words = ["el", "gobierno", "de", "sur", "baja", "california", "estado", "méxico", "colimas", "jalisco", "Colima"]
+    matcher = StateMatcher(STATES)
+    for _ in range(2000):
+        text = " ".join(random.choices(words, k=random.randint(1, 12)))
+        assert matcher.find(text) == per_state(text), text
@@ -0,0 +1,82 @@
+import asyncio
+from datetime import datetime
+
+import pytest
+
+pytest.importorskip("telethon")
+pytz = pytest.importorskip("pytz")
+
+import telegram_pplt
+from tg_scraper import sweep_posts
+
+WINDOWS = [("01/01/2024", "11/01/2024"), ("11/01/2024", "21/01/2024"), ("21/01/2024", "31/01/2024")]
+
+class FakeMessage:
+    def __init__(self, id: int, day: int):
+        self.id = id
+        self.date = pytz.UTC.localize(datetime(2024, 1, day, 12))
+        self.message = self.text = f'post {id}'
+        self.sender_id = 1
+
+class FakeClient:
+    # serves messages newest first from offset_date, optionally failing after some of them
+    def __init__(self, days: list[int], fail_after: int = None):
+        self.days = days
+        self.fail_after = fail_after
+        self.sweeps = 0
+
+    async def iter_messages(self, channel, offset_date, reverse):
+        self.sweeps += 1
+        messages = [FakeMessage(day, day) for day in sorted(self.days, reverse=True)]
+        for served, message in enumerate(m for m in messages if m.date < offset_date):
+            if self.fail_after is not None and served == self.fail_after:
+                self.fail_after = None
+                raise ConnectionError("connection reset")
+            yield message
+
+async def collect(client, windows):
+    return [(window, [post.id for post in posts]) async for window, posts in sweep_posts(client, "channel", windows)]
+
+def test_messages_are_routed_into_their_windows():
+    swept = asyncio.run(collect(FakeClient([2, 5, 15, 25, 30]), WINDOWS))
+    assert swept == [(WINDOWS[2], [30, 25]), (WINDOWS[1], [15]), (WINDOWS[0], [5, 2])]
+
+def test_empty_windows_are_yielded():
+    swept = asyncio.run(collect(FakeClient([25]), WINDOWS))
+    assert swept == [(WINDOWS[2], [25]), (WINDOWS[1], []), (WINDOWS[0], [])]
+
+def test_errors_are_raised_after_the_completed_windows():
+    swept = []
+
+    async def sweep():
+        async for window, posts in sweep_posts(FakeClient([2, 15, 25], fail_after=2), "channel", WINDOWS):
+            swept.append(window)
+
+    with pytest.raises(ConnectionError):
+        asyncio.run(sweep())
+    assert swept == [WINDOWS[2]]
+
+def test_download_retries_the_windows_left_after_an_error(monkeypatch):
+    saved = []
+    saving = []
+
+    async def save_to_mongo(mongo_client, posts, channel_username, start_year, end_year, states=None):
+        # saves of one channel never overlap
+        saving.append(1)
+        assert len(saving) == 1
+        await asyncio.sleep(0.01)
+        saved.extend(post.id for post in posts)
+        saving.pop()
+
+    monkeypatch.setattr(telegram_pplt, "save_to_mongo", save_to_mongo)
+    monkeypatch.setattr(telegram_pplt, "SWEEP_RETRY_DELAY", 0)
+    client = FakeClient([2, 15, 25], fail_after=2)
+
+    async def download():
+        return await telegram_pplt.download_channel(
+            client, None, asyncio.Semaphore(1), telegram_pplt.FloodGate(), "channel", WINDOWS, 2024, 2024
+        )
+
+    total, missing = asyncio.run(download())
+    assert (total, missing, client.sweeps) == (3, [], 2)
+    assert sorted(saved) == [2, 15, 25]
@@ -3,10 +3,13 @@ import numpy as np
 import re
 from tqdm import tqdm
 import os
-from sentence_transformers import SentenceTransformer, util
+from datetime import datetime, timezone
+from sentence_transformers import util
 import torch
 from dotenv import load_dotenv
 from mongo_wrapper.mongo_wrapper import MongoWrapper
+from embedding_cache.embedding_cache import get_embedding_cache
+from model_registry import get_sentence_transformer, resolve_backend, TG_EMBEDDER
 
 load_dotenv()
 
@@ -83,11 +86,18 @@ load_dotenv()
 
 # initialize the classifier with Spanish sentence embeddings model and precompute embeddings for all poverty dimensions
 class PovertyDimensionClassifier:
-    def __init__(self, dimensions: dict[str, str]):
+    def __init__(self, dimensions: dict[str, str], backend: str = None):
         self.dimensions = dimensions
 
         # load Spanish sentence transformer model optimized for semantic similarity
-        self.model = SentenceTransformer('hiiamsid/sentence_similarity_spanish_es')
+        # (shared through the model registry, loaded once per process)
+        # backend is "torch", "int8" or "onnx" (INFERENCE_BACKEND env variable by default)
+        self.backend = resolve_backend(backend)
+        self.model_name = TG_EMBEDDER
+        self.model = get_sentence_transformer(self.model_name, self.backend)
+
+        # on-disk embeddings of already seen texts, so reruns only encode new posts
+        self.embedding_cache = get_embedding_cache(self.model_name, self.model, self.backend)
         
         # store dimension names for easy reference
         self.dimension_names = list(self.dimensions.keys())
@@ -126,8 +136,10 @@ class PovertyDimensionClassifier:
         if len(cleaned_text) < 10:
             return None, 0.0
         
-        # generate embedding for the input text
-        text_embedding = self.model.encode(cleaned_text, convert_to_tensor=True)
+        # generate embedding for the input text (or read it from the cache)
+        text_embedding = torch.from_numpy(
+            self.embedding_cache.encode(self.model, [cleaned_text])
+        ).to(self.dimension_embeddings.device)
         
         # compute cosine similarity between text and all poverty dimensions
         cosine_scores = util.cos_sim(text_embedding, self.dimension_embeddings)[0]
@@ -141,9 +153,39 @@ class PovertyDimensionClassifier:
             return self.dimension_names[max_idx], max_score
         else:
             return None, max_score
+
+    # classify many texts at once - returns dimension indices (-1 for unclassified) and best similarity scores
+    def classify_batch(self, texts, batch_size=64, threshold=0.10):
+        dimension_idx = np.full(len(texts), -1, dtype=np.int64)
+        max_scores = np.zeros(len(texts), dtype=np.float32)
+
+        # clean all texts and keep only the ones long enough to carry semantic content
+        cleaned_texts = [self.clean_text(text) for text in texts]
+        valid_idx = np.array([i for i, text in enumerate(cleaned_texts) if len(text) >= 10], dtype=np.int64)
+        if len(valid_idx) == 0:
+            return dimension_idx, max_scores
+
+        # encode all valid texts in mini-batches as one embedding matrix, cached texts are not re-encoded
+        text_embeddings = torch.from_numpy(self.embedding_cache.encode(
+            self.model,
+            [cleaned_texts[i] for i in valid_idx],
+            batch_size=batch_size
+        )).to(self.dimension_embeddings.device)
+
+        # similarity matrix of shape (texts, dimensions) and best dimension per row
+        cosine_scores = util.cos_sim(text_embeddings, self.dimension_embeddings)
+        best_scores, best_idx = torch.max(cosine_scores, dim=1)
+        best_scores = best_scores.cpu().numpy()
+        best_idx = best_idx.cpu().numpy()
+
+        # classify into one of the dimension only if similarity exceeds threshold
+        max_scores[valid_idx] = best_scores
+        dimension_idx[valid_idx] = np.where(best_scores >= threshold, best_idx, -1)
+
+        return dimension_idx, max_scores
         
 # load Telegram posts from MongoDB and classify them by Mexican states
-def load_state_posts(states: list[str], channel_collections: list[str]):
+def load_state_posts(states: list[str], channel_collections: list[str], start_year: int = None, end_year: int = None):
     # connect to MongoDB
     mongo_client = MongoWrapper(
         db=os.getenv("MONGO_DB"),
@@ -159,25 +201,23 @@ def load_state_posts(states: list[str], channel_collections: list[str]):
     
     # initialize dictionary to store posts categorized by state
     state_posts = {state: [] for state in states}
-    
-    # create regex patterns for each state to identify mentions in posts - match complete state names, not partial matches
-    state_patterns = {
-        state: re.compile(r'\b' + re.escape(state) + r'\b', re.IGNORECASE) 
-        for state in states}
+
+    # optional year slice on posting timestamps (UTC)
+    start_ts = datetime(int(start_year), 1, 1, tzinfo=timezone.utc).timestamp() if start_year else None
+    end_ts = datetime(int(end_year) + 1, 1, 1, tzinfo=timezone.utc).timestamp() if end_year else None
     
     # process each available target channel
     for channel in tqdm(available_target_channels, desc="Loading channels"):
-        # retrieve all posts from the current channel
-        posts = mongo_client.get_collection_entries(collection=channel)
-        print(f"Channel: {channel} - {len(posts)} posts found")
-        # process each post in the channel
-        for post in tqdm(posts, desc=f"Analyzing {channel}", leave=False):
-            post_text = post.get('text', '')
-            # check if post mentions any of the Mexican states   
-            for state, pattern in state_patterns.items():
-                if pattern.search(post_text):
-                    # store post if state is mentioned
-                    state_posts[state].append(post_text)  
+        # make sure posts carry precomputed state mentions (only untagged posts/states are scanned)
+        mongo_client.tag_state_mentions(collection=channel, states=states)
+
+        # stream only the posts mentioning each state, filtered by the multikey index on the server
+        channel_count = 0
+        for state in states:
+            texts = list(mongo_client.get_posts_by_state(channel, state, start_ts=start_ts, end_ts=end_ts))
+            state_posts[state].extend(texts)
+            channel_count += len(texts)
+        print(f"Channel: {channel} - {channel_count} state mentions found")
     
     # convert to df 
     for state in states:
@@ -206,18 +246,14 @@ def analyze_poverty_dimensions(state_posts, dimensions: dict[str, str]):
         dimension_counts = {dim: 0 for dim in dimensions.keys()}
         dimension_counts["OTHER"] = 0  
     
-        # classify each post in the current state
-        for idx, row in tqdm(df.iterrows(), total=len(df), desc=f"Classifying {state}"):
-            text = row['text']
-        
-            # get classification result from the classifier
-            dimension, _ = classifier.classify_text(text)
-        
-            # increment counter for the identified dimension or "other"
-            if dimension:
-                dimension_counts[dimension] += 1
-            else:
-                dimension_counts["OTHER"] += 1
+        # classify all posts of the current state in one batch
+        dimension_idx, _ = classifier.classify_batch(df['text'].tolist())
+
+        # count posts per dimension, posts below the threshold go to "other"
+        counts = np.bincount(dimension_idx[dimension_idx >= 0], minlength=len(classifier.dimension_names))
+        for dim, count in zip(classifier.dimension_names, counts):
+            dimension_counts[dim] = int(count)
+        dimension_counts["OTHER"] = int(np.count_nonzero(dimension_idx < 0))
         
         total_posts = len(df)
         dimension_percentages = {
@@ -241,12 +277,15 @@ def analyze_poverty_dimensions(state_posts, dimensions: dict[str, str]):
                 'percentage': dimension_percentages[dim],
                 'total_posts': total_posts})
     
+    classifier.embedding_cache.flush()
+    print(f"\nEmbedding cache: {classifier.embedding_cache.stats()}")
+
     results_df = pd.DataFrame(results)
 
     return results_df
 
 def launch(start_year: int, end_year: str, states: list[str], channel_collections: list[str], dimensions: dict[str, str]) -> pd.DataFrame:
-    state_posts = load_state_posts(states, channel_collections)
+    state_posts = load_state_posts(states, channel_collections, start_year=start_year, end_year=end_year)
     
     results = analyze_poverty_dimensions(state_posts, dimensions)
     
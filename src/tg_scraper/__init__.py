@@ -1,4 +1,5 @@
 from telethon import TelegramClient
+from telethon.errors import FloodWaitError
 from datetime import datetime
 import pytz
 from telegram.post import Post
@@ -58,22 +59,90 @@ async def get_posts(
                 continue
 
             # Save as Post object
-            posts.append(
-                Post(
-                    id=message.id,
-                    text=message.message or "",
-                    author=message.sender_id,
-                    posting_ts=message.date.timestamp(),
-                    comments=[]
-                )
-            )
+            posts.append(_to_post(message))
 
         return posts
 
+    except FloodWaitError:
+        # the caller decides how long to back off
+        raise
     except Exception as e:
         print(f'Error gathering posts: {e}')
         return []
 
+def _to_post(message) -> Post:
+    return Post(
+        id=message.id,
+        text=message.message or "",
+        author=message.sender_id,
+        posting_ts=message.date.timestamp(),
+        comments=[]
+    )
+
+async def sweep_posts(
+    client: TelegramClient,
+    channel: str,
+    windows: list[tuple[str, str]],
+    target_strings: list[str] = []
+):
+    """
+    Walks the channel history once, from the end of the newest window back to the start
+    of the oldest, routing messages into their window.
+
+    Yields (window, posts) as soon as a window is complete, newest window first, so every
+    window can be saved while the sweep continues. Windows without posts are yielded too.
+    Errors are raised, the windows not yielded before them have to be swept again.
+
+    Params:
+        - client: initialized Telethon client
+        - channel: full @channel name or ID
+        - windows: contiguous (start, end) string dates in format 'dd/mm/YYYY'
+        - target_strings: optional list of words to filter posts
+    """
+    # (start, end, window) in UTC, newest first
+    bounds = sorted(
+        (
+            (pytz.UTC.localize(transform_to_datetime(start)), pytz.UTC.localize(transform_to_datetime(end)), (start, end))
+            for start, end in windows
+        ),
+        reverse=True
+    )
+    if not bounds:
+        return
+
+    current = 0
+    posts = []
+
+    async for message in client.iter_messages(
+        channel,
+        offset_date=bounds[0][1],  # fetch from the end of the newest window backward
+        reverse=False              # from newest to oldest
+    ):
+        # every window starting after this message is complete
+        while current < len(bounds) and message.date < bounds[current][0]:
+            yield bounds[current][2], posts
+            posts = []
+            current += 1
+        if current == len(bounds):
+            break
+        if message.date > bounds[current][1]:
+            continue
+
+        # If filtering by target words — skip if none found
+        if target_strings and not any(
+            word.lower() in (message.text or "").lower()
+            for word in target_strings
+        ):
+            continue
+
+        posts.append(_to_post(message))
+
+    # the history ended before the oldest windows
+    while current < len(bounds):
+        yield bounds[current][2], posts
+        posts = []
+        current += 1
+
 async def get_comments(session: TelegramClient, channel: str, post: Post):
     """
     For a given Post, fetch replies (comments) using its ID.
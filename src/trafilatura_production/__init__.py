@@ -3,14 +3,17 @@
 import os
 from pathlib import Path
 from typing import List, Dict, Optional
-from concurrent.futures import ThreadPoolExecutor, as_completed
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
 from tqdm import tqdm
 import trafilatura
-from mongo_wrapper.mongo_wrapper import MongoWrapper
+from mongo_wrapper.mongo_wrapper import MongoWrapper, BulkUpdateBuffer, DEFAULT_MAX_POOL_SIZE
 from dotenv import load_dotenv
 
 load_dotenv()
 
+# Articles submitted to the pool per worker, bounds memory while streaming a collection
+IN_FLIGHT_PER_WORKER = 4
+
 def _make_mongo_client() -> MongoWrapper:
     return MongoWrapper(
         db="news_outlets",
@@ -18,6 +21,7 @@ def _make_mongo_client() -> MongoWrapper:
         password=os.getenv("MONGO_PASSWORD"),
         ip=os.getenv("MONGO_IP"),
         port=os.getenv("MONGO_PORT"),
+        max_pool_size=int(os.getenv("MONGO_DECODER_POOL_SIZE", DEFAULT_MAX_POOL_SIZE)),
     )
 
 def _fetch_content(url: str) -> Optional[str]:
@@ -35,7 +39,7 @@ def _fetch_content(url: str) -> Optional[str]:
 def _process_and_update(
     article: Dict,
     collection: str,
-    mongo_client: MongoWrapper
+    updates: BulkUpdateBuffer
 ) -> None:
     if article.get("content"):
         return
@@ -43,28 +47,39 @@ def _process_and_update(
     text = _fetch_content(url)
     if not text:
         return
-    mongo_client.update_collection_entries(
-        collection,
-        [{"_id": article["_id"], "update_data": {"content": text}}]
-    )
+    updates.add(collection, article["_id"], {"content": text})
 
 def fetch_and_store_contents(
     states: List[str],
     max_workers: int = 10
 ) -> None:
     client = _make_mongo_client()
-    for state in states:
-        coll = f"gnews_{state}"
-        articles = client.get_collection_entries(coll) or []
-        to_process = [a for a in articles if not a.get("content")]
-        if not to_process:
-            continue
+    # only articles without content (missing, null or empty), streamed with the url fields only
+    without_content = {"content": {"$in": [None, ""]}}
+    max_in_flight = max_workers * IN_FLIGHT_PER_WORKER
+
+    # extracted contents are written in bulk instead of one round trip per article
+    with client.bulk_update_buffer(max_ops=200) as updates:
+        for state in states:
+            coll = f"gnews_{state}"
+            total = client.database[coll].count_documents(without_content)
+            if not total:
+                continue
 
-        with ThreadPoolExecutor(max_workers=max_workers) as exe:
-            futures = {
-                exe.submit(_process_and_update, art, coll, client): art
-                for art in to_process
-            }
-            for _ in tqdm(as_completed(futures), total=len(futures),
-                          desc=f"Extracting content for {state}", unit="article"):
-                pass
+            to_process = client.iter_collection_entries(
+                coll,
+                filter=without_content,
+                projection={"url": 1, "decoded_url": 1},
+                batch_size=1000,
+                no_cursor_timeout=True
+            )
+            with ThreadPoolExecutor(max_workers=max_workers) as exe, \
+                    tqdm(total=total, desc=f"Extracting content for {state}", unit="article") as bar:
+                futures = set()
+                for art in to_process:
+                    futures.add(exe.submit(_process_and_update, art, coll, updates))
+                    if len(futures) >= max_in_flight:
+                        done, futures = wait(futures, return_when=FIRST_COMPLETED)
+                        bar.update(len(done))
+                for _ in wait(futures).done:
+                    bar.update(1)
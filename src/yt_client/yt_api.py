@@ -0,0 +1,361 @@
+import os
+import random
+import asyncio
+import threading
+from time import monotonic, sleep
+from datetime import datetime
+from zoneinfo import ZoneInfo
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+from dotenv import load_dotenv
+
+from logger.logger import Logger
+from mongo_wrapper.mongo_wrapper import MongoWrapper
+from yt_client.yt_cache import ResponseCache, get_response_cache, YT_API_CACHE
+
+load_dotenv()
+
+# Point this to a local stub server in tests
+YT_API_BASE_URL = os.getenv("YT_API_BASE_URL", "https://www.googleapis.com/youtube/v3")
+
+# Daily quota of the project and the token bucket that spreads it over time (in quota units)
+YT_DAILY_QUOTA = int(os.getenv("YT_DAILY_QUOTA", 10_000))
+YT_QUOTA_PER_SECOND = float(os.getenv("YT_QUOTA_PER_SECOND", 50))
+YT_QUOTA_BURST = int(os.getenv("YT_QUOTA_BURST", 500))
+
+# Set YT_QUOTA_PERSIST=0 to count spent units in memory only (per process, lost on restart)
+YT_QUOTA_PERSIST = os.getenv("YT_QUOTA_PERSIST", "1") == "1"
+
+# HTTP requests in flight at once, across all threads and event loops
+YT_MAX_CONCURRENCY = int(os.getenv("YT_MAX_CONCURRENCY", 8))
+
+# Quota units per call of each endpoint
+QUOTA_COSTS = {
+    "search": 100,
+    "commentThreads": 1,
+    "videos": 1,
+    "channels": 1,
+}
+
+# Largest maxResults accepted by each endpoint
+MAX_PAGE_SIZES = {
+    "search": 50,
+    "commentThreads": 100,
+    "videos": 50,
+    "channels": 50,
+}
+
+MAX_RETRIES = 5
+BACKOFF_BASE = 0.5
+BACKOFF_MAX = 30.0
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+RETRY_REASONS = {"rateLimitExceeded", "userRateLimitExceeded", "backendError"}
+
+# Quota is reset at midnight Pacific time
+QUOTA_TIMEZONE = ZoneInfo("America/Los_Angeles")
+
+class QuotaExceeded(Exception):
+    pass
+
+class YouTubeAPIError(Exception):
+    def __init__(self, status: int, reason: str, message: str):
+        super().__init__(f'{status} {reason}: {message}')
+        self.status = status
+        self.reason = reason
+
+def run_sync(coroutine):
+    """
+    :param coroutine: coroutine to run to completion
+
+    Entry point of the synchronous wrappers. asyncio.run fails in a thread that already runs an
+    event loop (Streamlit, notebooks), there the coroutine runs on a private loop in a worker
+    thread while the caller waits
+    """
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        return asyncio.run(coroutine)
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        return executor.submit(asyncio.run, coroutine).result()
+
+class QuotaStore:
+    """
+    Quota units spent per Pacific day, kept in Mongo next to the response cache, so the daily
+    budget holds across restarts and across processes using the same API project.
+    """
+    def __init__(self, mongo_client: MongoWrapper = None):
+        self._mongo_client = mongo_client
+
+    @property
+    def mongo_client(self) -> MongoWrapper:
+        # built on first use, importing the module does not touch Mongo
+        if self._mongo_client is None:
+            self._mongo_client = MongoWrapper(
+                db=os.getenv("MONGO_DB"),
+                user=os.getenv("MONGO_USERNAME"),
+                password=os.getenv("MONGO_PASSWORD"),
+                ip=os.getenv("MONGO_IP"),
+                port=os.getenv("MONGO_PORT")
+            )
+        return self._mongo_client
+
+    def add(self, day: str, units: int) -> int:
+        # atomic increment, returns the units spent that day after it
+        return self.mongo_client.add_api_quota_spent(day, units)
+
+class QuotaLimiter:
+    """
+    Token bucket in YouTube quota units, capped by a daily budget.
+
+    Requests wait for tokens instead of sleeping a fixed time, and fail with QuotaExceeded
+    once the daily budget is spent. With a store the spent units are reserved there, so
+    restarts and other processes count against the same budget. Thread-safe.
+    """
+    def __init__(
+        self,
+        daily_budget: int = YT_DAILY_QUOTA,
+        rate: float = YT_QUOTA_PER_SECOND,
+        burst: int = YT_QUOTA_BURST,
+        store: QuotaStore = None
+    ):
+        self.daily_budget = daily_budget
+        self.rate = rate
+        # a single search must always fit into the bucket
+        self.burst = max(burst, max(QUOTA_COSTS.values()))
+        self.store = store
+
+        self.logger = Logger(logger_type="yt_api", stream_handler=False)
+        self.lock = threading.Lock()
+        self.tokens = float(self.burst)
+        self.updated = monotonic()
+        self.spent = 0
+        self.day = self._today()
+
+    @staticmethod
+    def _today():
+        return datetime.now(QUOTA_TIMEZONE).date()
+
+    def _refill(self):
+        now = monotonic()
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def acquire(self, cost: int):
+        """
+        :param cost: quota units of the request
+
+        Blocks until the bucket has cost tokens, raises QuotaExceeded if the daily budget does not allow it
+        """
+        with self.lock:
+            if self._today() != self.day:
+                self.day = self._today()
+                self.spent = 0
+            store, day = self.store, self.day
+            # reserve the budget now, so concurrent callers can not overshoot it while waiting
+            if store is None:
+                self._reserve(cost)
+
+        # the store is a network call, other threads keep going meanwhile
+        if store is not None:
+            self._reserve_stored(store, day.isoformat(), cost)
+
+        while True:
+            with self.lock:
+                self._refill()
+                if self.tokens >= cost:
+                    self.tokens -= cost
+                    return
+                wait = (cost - self.tokens) / self.rate
+            sleep(wait)
+
+    def _reserve(self, cost: int):
+        # caller holds the lock
+        if self.spent + cost > self.daily_budget:
+            raise QuotaExceeded(f'Daily quota of {self.daily_budget} units is spent ({self.spent} used)')
+        self.spent += cost
+
+    def _reserve_stored(self, store: QuotaStore, day: str, cost: int):
+        try:
+            spent = store.add(day, cost)
+            exceeded = spent > self.daily_budget
+            if exceeded:
+                spent = store.add(day, -cost)
+        except Exception as e:
+            with self.lock:
+                # keep going on the in-memory count, starting from the last known value
+                if self.store is store:
+                    self.store = None
+                    self.logger.log(f'Could not persist spent quota, counting in memory from {self.spent} units: {e}', level="warning")
+                self._reserve(cost)
+            return
+
+        with self.lock:
+            if self.day.isoformat() == day:
+                # answers of concurrent reservations may arrive out of order
+                self.spent = max(self.spent, spent)
+        if exceeded:
+            raise QuotaExceeded(f'Daily quota of {self.daily_budget} units is spent ({spent} used)')
+
+    def stats(self) -> dict:
+        with self.lock:
+            return {
+                "persisted": self.store is not None,
+                "spent": self.spent,
+                "remaining": self.daily_budget - self.spent,
+                "daily_budget": self.daily_budget
+            }
+
+# Shared by all clients of the process, so together they stay within the daily quota
+quota_limiter = QuotaLimiter(store=QuotaStore() if YT_QUOTA_PERSIST else None)
+
+class YouTubeAPI:
+    """
+    Thread-safe YouTube Data API v3 client over plain HTTP.
+
+    Responses are served from the request-level cache while fresh. Every API call is charged
+    to a shared QuotaLimiter and retried with exponential backoff on rate limits, server errors
+    and network failures. Async variants run the calls in threads, so many queries can be
+    fetched concurrently with asyncio.gather.
+    """
+    def __init__(
+        self,
+        api_key: str,
+        base_url: str = YT_API_BASE_URL,
+        limiter: QuotaLimiter = None,
+        max_concurrency: int = YT_MAX_CONCURRENCY,
+        timeout: float = 30,
+        cache: ResponseCache = None,
+        use_cache: bool = YT_API_CACHE
+    ):
+        self.api_key = api_key
+        self.base_url = base_url.rstrip("/")
+        self.limiter = limiter or quota_limiter
+        self.timeout = timeout
+        self.cache = cache or (get_response_cache() if use_cache else None)
+
+        self.in_flight = threading.BoundedSemaphore(max_concurrency)
+
+        # requests.Session is not thread-safe, keep one per thread
+        self.local = threading.local()
+
+        self.logger = Logger(logger_type="yt_api", stream_handler=False)
+
+        self.requests = 0
+        self.retries = 0
+        self.counters_lock = threading.Lock()
+
+    def _session(self) -> requests.Session:
+        if not hasattr(self.local, "session"):
+            self.local.session = requests.Session()
+        return self.local.session
+
+    @staticmethod
+    def _error(response: requests.Response) -> YouTubeAPIError:
+        try:
+            error = response.json()["error"]
+            reason = error.get("errors", [{}])[0].get("reason", "")
+            message = error.get("message", "")
+        except (ValueError, KeyError, TypeError):
+            reason, message = "", response.text[:200]
+        return YouTubeAPIError(response.status_code, reason, message)
+
+    def _backoff(self, attempt: int, endpoint: str, error) -> None:
+        # exponential backoff with full jitter
+        delay = random.uniform(0, min(BACKOFF_MAX, BACKOFF_BASE * 2 ** attempt))
+        with self.counters_lock:
+            self.retries += 1
+        self.logger.log(f'{endpoint} failed ({error}), retrying in {delay:.1f} s', level="warning")
+        sleep(delay)
+
+    def request(self, endpoint: str, refresh: bool = False, **params) -> dict:
+        """
+        :param endpoint: API resource, e.g. "search" or "commentThreads"
+        :param refresh: do not serve a fresh cached response, revalidate it with the API instead
+        :param params: query parameters, None values are dropped
+
+        Returns the decoded JSON response
+        """
+        params = {key: value for key, value in params.items() if value is not None}
+        cost = QUOTA_COSTS.get(endpoint, 1)
+
+        cached = None
+        if self.cache:
+            cache_key, cached, fresh = self.cache.lookup(endpoint, params)
+            if fresh and not refresh:
+                return cached["response"]
+
+        # an expired entry is revalidated, the API answers 304 if it did not change
+        headers = {"If-None-Match": cached["etag"]} if cached and cached.get("etag") else {}
+        params["key"] = self.api_key
+
+        for attempt in range(MAX_RETRIES + 1):
+            # every attempt is charged, failed calls also count against the quota
+            self.limiter.acquire(cost)
+            try:
+                with self.in_flight:
+                    response = self._session().get(f'{self.base_url}/{endpoint}', params=params, headers=headers, timeout=self.timeout)
+                with self.counters_lock:
+                    self.requests += 1
+            except (requests.ConnectionError, requests.Timeout) as e:
+                if attempt == MAX_RETRIES:
+                    raise
+                self._backoff(attempt, endpoint, e)
+                continue
+
+            if response.status_code == 304 and cached:
+                self.cache.refresh(cache_key)
+                return cached["response"]
+
+            if response.ok:
+                data = response.json()
+                if self.cache:
+                    self.cache.store(cache_key, endpoint, params, data, etag=response.headers.get("ETag"), cost=cost)
+                return data
+
+            error = self._error(response)
+            if error.reason in ("quotaExceeded", "dailyLimitExceeded"):
+                raise QuotaExceeded(str(error))
+            retryable = response.status_code in RETRY_STATUSES or error.reason in RETRY_REASONS
+            if not retryable or attempt == MAX_RETRIES:
+                raise error
+            self._backoff(attempt, endpoint, error)
+
+    def paginate(self, endpoint: str, limit: int, **params) -> list[dict]:
+        """
+        :param endpoint: API resource
+        :param limit: maximum number of items to return
+        :param params: query parameters of every page
+
+        Returns up to limit items following nextPageToken
+        """
+        items = []
+        page_token = None
+        while len(items) < limit:
+            response = self.request(
+                endpoint,
+                maxResults=min(MAX_PAGE_SIZES.get(endpoint, 50), limit - len(items)),
+                pageToken=page_token,
+                **params
+            )
+            items.extend(response.get("items", []))
+
+            page_token = response.get("nextPageToken")
+            if not page_token:
+                break
+
+        return items[:limit]
+
+    async def arequest(self, endpoint: str, **params) -> dict:
+        return await asyncio.to_thread(self.request, endpoint, **params)
+
+    async def apaginate(self, endpoint: str, limit: int, **params) -> list[dict]:
+        # pages of one query are sequential, different queries run concurrently
+        return await asyncio.to_thread(self.paginate, endpoint, limit, **params)
+
+    def stats(self) -> dict:
+        with self.counters_lock:
+            stats = {"requests": self.requests, "retries": self.retries, **self.limiter.stats()}
+        if self.cache:
+            stats["cache"] = self.cache.stats()
+        return stats
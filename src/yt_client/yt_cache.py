@@ -0,0 +1,170 @@
+import os
+import json
+import threading
+from time import time
+from hashlib import sha1
+
+from dotenv import load_dotenv
+
+from mongo_wrapper.mongo_wrapper import MongoWrapper
+from logger.logger import Logger
+
+load_dotenv()
+
+# Set YT_API_CACHE=0 to always ask the API
+YT_API_CACHE = os.getenv("YT_API_CACHE", "1") == "1"
+
+# Seconds a cached response is served without asking the API, after that it is revalidated with its ETag
+DEFAULT_TTL = int(os.getenv("YT_API_CACHE_TTL", 7 * 24 * 3600))
+CACHE_TTLS = {
+    "commentThreads": int(os.getenv("YT_API_CACHE_COMMENTS_TTL", 24 * 3600)),
+}
+
+# Parameters that do not change the response
+IGNORED_PARAMS = {"key", "pageToken"}
+
+# Comma-separated list parameters whose order does not matter
+LIST_PARAMS = {"part", "id"}
+
+_response_cache = None
+_response_cache_lock = threading.Lock()
+
+def normalize_params(params: dict) -> dict:
+    # drop unset and irrelevant parameters, stringify and sort, so equal requests get equal keys
+    normalized = {}
+    for key, value in params.items():
+        if value is None or key in IGNORED_PARAMS:
+            continue
+        value = str(value)
+        if key in LIST_PARAMS:
+            value = ",".join(sorted(part.strip() for part in value.split(",")))
+        normalized[key] = value
+    return dict(sorted(normalized.items()))
+
+def request_key(endpoint: str, params: dict) -> str:
+    """
+    :param endpoint: API resource
+    :param params: query parameters of the request
+
+    Returns the cache key of (endpoint, normalized params, page token)
+    """
+    raw = json.dumps([endpoint, normalize_params(params), params.get("pageToken") or ""], ensure_ascii=False)
+    return sha1(raw.encode("utf-8")).hexdigest()
+
+class ResponseCache:
+    """
+    Request-level cache of YouTube API responses stored in Mongo.
+
+    Fresh entries are served without spending quota, expired ones are revalidated with
+    If-None-Match and kept when the API answers 304. Cache failures never fail a request,
+    the cache is switched off instead.
+    """
+    def __init__(self, mongo_client: MongoWrapper, ttls: dict[str, int] = CACHE_TTLS, default_ttl: int = DEFAULT_TTL):
+        self.mongo_client = mongo_client
+        self.ttls = ttls
+        self.default_ttl = default_ttl
+        self.enabled = True
+
+        self.logger = Logger(logger_type="yt_cache", stream_handler=False)
+        self.lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+        self.stale = 0
+        self.revalidated = 0
+        self.quota_saved = 0
+        self.errors = 0
+
+    def _count(self, counter: str, value: int = 1) -> None:
+        with self.lock:
+            setattr(self, counter, getattr(self, counter) + value)
+
+    def _failed(self, action: str, e: Exception) -> None:
+        self._count("errors")
+        if self.enabled:
+            self.enabled = False
+            self.logger.log(f'Could not {action} the YouTube API cache, disabling it: {e}', level="warning")
+
+    def lookup(self, endpoint: str, params: dict) -> tuple[str, dict, bool]:
+        """
+        :param endpoint: API resource
+        :param params: query parameters of the request
+
+        Returns (key, cached entry or None, whether the entry is still fresh)
+        """
+        key = request_key(endpoint, params)
+        if not self.enabled:
+            return key, None, False
+
+        try:
+            entry = self.mongo_client.get_api_cache_entry(key)
+        except Exception as e:
+            self._failed("read", e)
+            return key, None, False
+
+        if entry is None:
+            self._count("misses")
+            return key, None, False
+
+        if time() - entry["fetched_at"] < self.ttls.get(endpoint, self.default_ttl):
+            self._count("hits")
+            self._count("quota_saved", entry.get("cost", 1))
+            return key, entry, True
+
+        self._count("stale")
+        return key, entry, False
+
+    def store(self, key: str, endpoint: str, params: dict, response: dict, etag: str = None, cost: int = 1) -> None:
+        if not self.enabled:
+            return
+        try:
+            self.mongo_client.save_api_cache_entry(key, {
+                "endpoint": endpoint,
+                "params": normalize_params(params),
+                "page_token": params.get("pageToken"),
+                "response": response,
+                "etag": etag or response.get("etag"),
+                "cost": cost,
+                "fetched_at": time()
+            })
+        except Exception as e:
+            self._failed("write", e)
+
+    def refresh(self, key: str) -> None:
+        # the API confirmed the cached response (304), keep serving it for another TTL
+        self._count("revalidated")
+        if not self.enabled:
+            return
+        try:
+            self.mongo_client.touch_api_cache_entry(key, time())
+        except Exception as e:
+            self._failed("write", e)
+
+    def stats(self) -> dict:
+        with self.lock:
+            lookups = self.hits + self.misses + self.stale
+            return {
+                "enabled": self.enabled,
+                "lookups": lookups,
+                "hits": self.hits,
+                "misses": self.misses,
+                "stale": self.stale,
+                "revalidated": self.revalidated,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "quota_saved": self.quota_saved,
+                "errors": self.errors
+            }
+
+def get_response_cache() -> ResponseCache:
+    # one cache per process, shared by YouTubeAnalyzer and YouTubeClient
+    global _response_cache
+    with _response_cache_lock:
+        if _response_cache is None:
+            _response_cache = ResponseCache(MongoWrapper(
+                db=os.getenv("MONGO_DB"),
+                user=os.getenv("MONGO_USERNAME"),
+                password=os.getenv("MONGO_PASSWORD"),
+                ip=os.getenv("MONGO_IP"),
+                port=os.getenv("MONGO_PORT")
+            ))
+        return _response_cache
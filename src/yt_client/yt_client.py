@@ -1,9 +1,10 @@
-from googleapiclient.discovery import build
 import os
+import asyncio
 from dotenv import load_dotenv
 from typing import Any, List
 from mongo_wrapper.mongo_wrapper import MongoWrapper
 from logger.logger import Logger
+from yt_client.yt_api import YouTubeAPI, YouTubeAPIError, MAX_PAGE_SIZES, run_sync
 
 load_dotenv()
 
@@ -13,10 +14,13 @@ MONGO_PORT = os.getenv("MONGO_PORT")
 MONGO_USER = os.getenv("MONGO_USERNAME")
 MONGO_PASSWORD = os.getenv("MONGO_PASSWORD")
 
+# videos.list accepts up to 50 ids per call, for 1 quota unit
+VIDEOS_PER_REQUEST = 50
+
 class YouTubeClient:
     def __init__(self, api_key: str):
-        # Build YouTube API client
-        self.client = build("youtube", "v3", developerKey=api_key)
+        # YouTube API client with quota limiting and retries, shared by concurrent calls
+        self.api = YouTubeAPI(api_key)
 
         # Init Mongo connection
         self.mongo_client = MongoWrapper(
@@ -38,12 +42,12 @@ class YouTubeClient:
         :return: channel ID
         """
         try:
-            request = self.client.channels().list(
+            response = self.api.request(
+                "channels",
                 part="snippet",
                 forHandle=handle
             )
 
-            response = request.execute()
             if len(response["items"]) == 0:
                 self.logger.log(
                     f"Channel with handle {handle} not found",
@@ -87,9 +91,6 @@ class YouTubeClient:
             )
             return videos_from_mongo
 
-        videos = []
-        next_page_token = None
-
         channel_id = self._get_channel_id_by_handle(handle)
         if channel_id is None:
             self.logger.log(
@@ -99,25 +100,13 @@ class YouTubeClient:
             return []
 
         try:
-            while len(videos) < limit:
-                request = self.client.search().list(
-                    part="snippet",
-                    channelId=channel_id,
-                    type="video",
-                    maxResults=100,
-                    pageToken=next_page_token 
-                )
-                response = request.execute()
-                videos.extend(response.get("items", []))
-                
-                next_page_token = response.get("nextPageToken")
-                if not next_page_token:
-                    break
-
-                self.logger.log(
-                    message=f'Got {len(videos)} videos for {handle}',
-                    level="info"
-                )
+            videos = self.api.paginate(
+                "search",
+                limit,
+                part="snippet",
+                channelId=channel_id,
+                type="video"
+            )
 
             self.logger.log(
                 message=f'Got {len(videos)} videos for {handle}',
@@ -157,32 +146,22 @@ class YouTubeClient:
 
             return keyword_videos_from_mongo
 
-        videos = []
-        next_page_token = None
-
         try: 
-            while len(videos) < limit:
-                request = self.client.search().list(
-                    part="snippet",
-                    q=keyword,
-                    publishedBefore=published_before,
-                    publishedAfter=published_after,
-                    safeSearch="none",
-                    type="video",
-                    maxResults=100,
-                    pageToken=next_page_token
-                )
-                response = request.execute()
-                videos.extend(response.get("items", []))
-
-                self.logger.log(
-                    message=f'Got {len(videos)} videos for {keyword}',
-                    level="info"
-                )
+            videos = self.api.paginate(
+                "search",
+                limit,
+                part="snippet",
+                q=keyword,
+                publishedBefore=published_before,
+                publishedAfter=published_after,
+                safeSearch="none",
+                type="video"
+            )
 
-                next_page_token = response.get("nextPageToken")
-                if not next_page_token:
-                    break
+            self.logger.log(
+                message=f'Got {len(videos)} videos for {keyword}',
+                level="info"
+            )
 
             self.mongo_client.save_new_keyword_videos(videos=videos, keyword=f'{keyword}_2020')
 
@@ -203,59 +182,244 @@ class YouTubeClient:
         """
         return self.mongo_client.get_comments_by_video_id(video_id=video_id)
 
-    def get_comments_by_video_id(self, video_id: str, limit: int = 1000) -> List[dict]:
+    @staticmethod
+    def _comment_published_at(comment: dict) -> str:
+        return comment["snippet"]["topLevelComment"]["snippet"]["publishedAt"]
+
+    def _crawl_comments(self, video_id: str, limit: int) -> int:
         """
-        Get comments by video ID
+        Crawl comment pages of a video newest first, saving every page and the checkpoint after it
+
+        A crawl that stopped midway resumes from the stored page token. A finished crawl only fetches
+        comments from the newest stored one on, bypassing fresh cached pages and resuming from its own
+        page token if there were more new comments than the limit. The newest stored time is raised
+        only once that gap is closed. Nothing is checkpointed for a page that could not be saved.
+        Videos crawled before checkpoints existed start from their newest stored comment.
         
         :param video_id: video ID
-        :param limit: maximum number of comments to retrieve
-        :return: list of comments
+        :param limit: maximum number of comments to fetch in this call
+        :return: number of fetched comments
         """
-        # In case we have comments in the db, we will use them
-        comments_from_db = self._get_comments_from_mongo(video_id)
-        if len(comments_from_db) > 0:
+        checkpoint = self.mongo_client.get_comment_crawl(video_id)
+        if checkpoint is None:
+            # comments saved without a checkpoint, only look for newer ones instead of crawling it all again
+            stored_newest = self.mongo_client.get_newest_comment_published_at(video_id)
+            checkpoint = {"complete": True, "newest_published_at": stored_newest} if stored_newest else {}
+        if checkpoint.get("comments_disabled"):
+            return 0
+
+        incremental = checkpoint.get("complete", False)
+        known_newest = checkpoint.get("newest_published_at") or ""
+        if incremental:
+            # newest time seen by an incremental crawl that has not reached the stored comments yet
+            newest = max(known_newest, checkpoint.get("pending_newest_published_at") or "")
+            page_token = checkpoint.get("incremental_page_token")
+        else:
+            newest = known_newest
+            page_token = checkpoint.get("next_page_token")
+        fetched = 0
+
+        while fetched < limit:
+            try:
+                response = self.api.request(
+                    "commentThreads",
+                    part="snippet",
+                    videoId=video_id,
+                    order="time",
+                    maxResults=min(MAX_PAGE_SIZES["commentThreads"], limit - fetched),
+                    textFormat="plainText",
+                    pageToken=page_token,
+                    # a cached page would hide the comments posted since
+                    refresh=incremental
+                )
+            except YouTubeAPIError as e:
+                if e.reason == "commentsDisabled":
+                    self.mongo_client.save_comment_crawl(video_id, {"complete": True, "comments_disabled": True})
+                    return fetched
+                if page_token and e.reason == "invalidPageToken":
+                    # the stored token expired, start again from the newest page (saved comments are skipped)
+                    self.logger.log(f'Page token of video {video_id} expired, restarting the crawl', level="warning")
+                    page_token = None
+                    continue
+                raise
+
+            comments = response.get("items", [])
+            fetched += len(comments)
+            newest = max([newest] + [self._comment_published_at(comment) for comment in comments])
+            page_token = response.get("nextPageToken")
+
+            if incremental:
+                # comments posted at the newest stored time may be new too, stored ones are skipped by id
+                new_comments = [comment for comment in comments if self._comment_published_at(comment) >= known_newest]
+                if not self.mongo_client.save_new_yt_comments(comments=new_comments):
+                    # keep the checkpoint, the next call fetches this page again
+                    return fetched
+
+                # stop at the first comment older than the stored ones, everything after it was crawled before
+                if len(new_comments) < len(comments) or page_token is None:
+                    self.mongo_client.save_comment_crawl(video_id, {
+                        "newest_published_at": newest,
+                        "incremental_page_token": None,
+                        "pending_newest_published_at": None
+                    })
+                    break
+                self.mongo_client.save_comment_crawl(video_id, {
+                    "incremental_page_token": page_token,
+                    "pending_newest_published_at": newest
+                })
+            else:
+                if not self.mongo_client.save_new_yt_comments(comments=comments):
+                    return fetched
+                self.mongo_client.save_comment_crawl(video_id, {
+                    "next_page_token": page_token,
+                    "complete": page_token is None,
+                    "newest_published_at": newest
+                })
+                if page_token is None:
+                    break
+
             self.logger.log(
-                message=f'Got {len(comments_from_db)} comments for video {video_id} from mongo',
+                message=f'Got {fetched} comments for video {video_id}',
                 level="info"
             )
-            return comments_from_db
 
-        # Otherwise, we will get them from the youtube api
-        result = []
-        page_result = limit
-        next_page_token = None
+        return fetched
+
+    def get_comments_by_video_id(self, video_id: str, limit: int = 1000) -> List[dict]:
+        """
+        Get comments by video ID, crawling only pages that are not stored yet
+        
+        :param video_id: video ID
+        :param limit: maximum number of comments to fetch from the API in this call
+        :return: list of stored comments of the video
+        """
         try:
-            # Get the first page of comments
-            while page_result == limit:
-                request = self.client.commentThreads().list(
-                    part="snippet",
-                    videoId=video_id,
-                    maxResults=limit,
-                    textFormat="plainText",
-                    pageToken=next_page_token
-                )
-                response = request.execute()
-                current_page_comments = response["items"]
+            fetched = self._crawl_comments(video_id, limit)
+        except Exception as e:
+            # everything saved before the error is kept and the next call resumes from there
+            self.logger.log(
+                f"Error getting comments by video id {video_id}: {e}",
+                level="error"
+            )
+            fetched = 0
+
+        comments = self._get_comments_from_mongo(video_id)
+        self.logger.log(
+            message=f'Got {len(comments)} comments for video {video_id} ({fetched} fetched from the api)',
+            level="info"
+        )
 
-                result += current_page_comments 
+        return comments
 
-                self.logger.log(
-                    message=f'Got {len(result)} comments for video {video_id}',
-                    level="info"
-                )
+    def _run_concurrently(self, method, calls: list[dict]) -> list:
+        # run blocking client calls in threads, the API client bounds concurrency and quota
+        async def run():
+            return await asyncio.gather(*(asyncio.to_thread(method, **kwargs) for kwargs in calls))
 
-                page_result = response["pageInfo"]["totalResults"]
-                next_page_token = response.get("nextPageToken", None)
-                if next_page_token is None:
-                    break
+        return run_sync(run())
 
-            self.mongo_client.save_new_yt_comments(comments=result)
+    def get_videos_by_keywords(self, keywords: list[str], published_before: str = None, published_after: str = None, limit: int = 250) -> dict[str, List[dict]]:
+        """
+        Get videos for several keywords concurrently
+        
+        :param keywords: keywords
+        :param published_before: optional parameter to filter videos published before a specific date
+        :param published_after: optional parameter to filter videos published after a specific date
+        :param limit: maximum number of videos to retrieve per keyword
+        :return: keyword -> list of videos
+        """
+        results = self._run_concurrently(self.get_videos_by_keyword, [
+            {"keyword": keyword, "published_before": published_before, "published_after": published_after, "limit": limit}
+            for keyword in keywords
+        ])
 
-            return result
+        return dict(zip(keywords, results))
 
+    def get_comments_by_video_ids(self, video_ids: list[str], limit: int = 1000) -> dict[str, List[dict]]:
+        """
+        Get comments for several videos concurrently
+        
+        :param video_ids: video IDs
+        :param limit: maximum number of comments to retrieve per video
+        :return: video ID -> list of comments
+        """
+        results = self._run_concurrently(self.get_comments_by_video_id, [
+            {"video_id": video_id, "limit": limit}
+            for video_id in video_ids
+        ])
+
+        return dict(zip(video_ids, results))
+
+    def _enrich_video_chunk(self, collection: str, video_ids: dict[str, Any]) -> int:
+        """
+        Fetch statistics and contentDetails of up to 50 videos with one videos.list call and store them
+        
+        :param collection: keyword or handle collection
+        :param video_ids: video ID -> _id of its document
+        :return: number of enriched videos
+        """
+        try:
+            response = self.api.request(
+                "videos",
+                part="statistics,contentDetails",
+                id=",".join(video_ids)
+            )
         except Exception as e:
             self.logger.log(
-                f"Error getting comments by video id {video_id}: {e}",
+                f"Error getting details of {len(video_ids)} videos for {collection}: {e}",
                 level="error"
             )
-            return []
+            return 0
+
+        details = {item["id"]: item for item in response.get("items", [])}
+
+        # Deleted or private videos get empty details, so they are not requested again
+        updates = [
+            {
+                "_id": _id,
+                "update_data": {
+                    "statistics": details.get(video_id, {}).get("statistics"),
+                    "contentDetails": details.get(video_id, {}).get("contentDetails")
+                }
+            }
+            for video_id, _id in video_ids.items()
+        ]
+        self.mongo_client.update_collection_entries(collection, updates)
+
+        return len(details)
+
+    def enrich_videos(self, collection: str, refresh: bool = False) -> int:
+        """
+        Add statistics and contentDetails to the videos stored in a keyword or handle collection
+        
+        :param collection: keyword or handle collection
+        :param refresh: also fetch again videos that were already enriched
+        :return: number of enriched videos
+        """
+        filter = {} if refresh else {"statistics": {"$exists": False}}
+        video_ids = {}
+        for video in self.mongo_client.iter_collection_entries(collection, filter=filter, projection={"_id": 1}):
+            # documents saved from search results keep the {"kind", "videoId"} id
+            _id = video["_id"]
+            video_ids[_id["videoId"] if isinstance(_id, dict) else _id] = _id
+
+        if not video_ids:
+            self.logger.log(
+                message=f'No videos to enrich in {collection}',
+                level="info"
+            )
+            return 0
+
+        items = list(video_ids.items())
+        chunks = [dict(items[i:i + VIDEOS_PER_REQUEST]) for i in range(0, len(items), VIDEOS_PER_REQUEST)]
+        enriched = sum(self._run_concurrently(self._enrich_video_chunk, [
+            {"collection": collection, "video_ids": chunk}
+            for chunk in chunks
+        ]))
+
+        self.logger.log(
+            message=f'Enriched {enriched} of {len(video_ids)} videos in {collection} with {len(chunks)} videos.list calls',
+            level="info"
+        )
+
+        return enriched
@@ -3,14 +3,18 @@ import numpy as np
 import os
 import re
 import json
+import queue
+import asyncio
+import threading
 from datetime import datetime
-from googleapiclient.discovery import build
-from time import sleep
+from collections import defaultdict
 from dotenv import load_dotenv
-from sentence_transformers import SentenceTransformer, util
-from transformers import AutoTokenizer, AutoModelForSequenceClassification
+from sentence_transformers import util
 import torch
 from tqdm import tqdm
+from embedding_cache.embedding_cache import get_embedding_cache
+from model_registry import get_sentence_transformer, get_sequence_classifier, resolve_backend, YT_EMBEDDER, YT_SENTIMENT_MODEL
+from yt_client.yt_api import YouTubeAPI, QuotaExceeded, run_sync
 
 # Load environment variables
 load_dotenv()
@@ -19,14 +23,46 @@ YT_API_KEY = os.getenv("YT_API_KEY")
 # limits for scraping
 MAX_VIDEOS_PER_SEARCH = 5
 MAX_COMMENTS_PER_VIDEO = 10  
-API_SLEEP_TIME = 0.5  
+
+# texts per BERT forward pass when scoring sentiment in bulk
+SENTIMENT_BATCH_SIZE = 32
+
+# videos buffered between the API fetcher and the inference worker
+FETCH_QUEUE_SIZE = 64
+
+# texts the inference worker classifies and scores at once
+INFERENCE_BATCH_SIZE = 256
+
+# marks the end of the fetcher output
+_FETCH_DONE = object()
+
+class IncompleteAnalysis(Exception):
+    """
+    Raised when the daily quota ran out before every request of some states was made.
+
+    skipped maps every incomplete state to the requests it is missing, results holds the
+    stats of all states (the incomplete ones counted only over what was fetched).
+    """
+    def __init__(self, skipped: dict[str, list[str]], results: dict[str, tuple]):
+        super().__init__(
+            "Daily YouTube quota ran out, incomplete states: "
+            + ", ".join(f'{state} ({len(requests)} requests missing)' for state, requests in skipped.items())
+        )
+        self.skipped = skipped
+        self.results = results
+        # dataframes of the complete states, set by analyze_all_states
+        self.frames = []
 
 class TextProcessor:
-    def __init__(self, dimensions: dict[str, str]):
+    def __init__(self, dimensions: dict[str, str], backend: str = None):
         self.dimensions = dimensions
-        self.embedder = SentenceTransformer("paraphrase-multilingual-MiniLM-L12-v2")
-        self.tokenizer = AutoTokenizer.from_pretrained("nlptown/bert-base-multilingual-uncased-sentiment")
-        self.model = AutoModelForSequenceClassification.from_pretrained("nlptown/bert-base-multilingual-uncased-sentiment")
+        # models are shared through the process-wide registry, so repeated runs reuse loaded weights;
+        # backend is "torch", "int8" or "onnx" (INFERENCE_BACKEND env variable by default)
+        self.backend = resolve_backend(backend)
+        self.embedder_name = YT_EMBEDDER
+        self.embedder = get_sentence_transformer(self.embedder_name, self.backend)
+        self.embedding_cache = get_embedding_cache(self.embedder_name, self.embedder, self.backend)
+        self.tokenizer, self.model = get_sequence_classifier(YT_SENTIMENT_MODEL, self.backend)
         self.dimension_names = list(dimensions.keys())
         self.dimension_texts = []
         for keywords in dimensions.values():
@@ -44,143 +80,276 @@ class TextProcessor:
     def classify_dimension(self, text):
         if not text:
             return None, 0.0
-        embedding = self.embedder.encode(text, convert_to_tensor=True)
-        cosine_scores = util.cos_sim(embedding, self.dimension_embeddings)[0]
-        max_idx = torch.argmax(cosine_scores).item()
-        return self.dimension_names[max_idx], cosine_scores[max_idx].item()
+        dimensions, scores = self.classify_dimensions([text])
+        return dimensions[0], float(scores[0])
+
+    def classify_dimensions(self, texts: list[str]) -> tuple[list[str], np.ndarray]:
+        """
+        :param texts: cleaned, non-empty texts
+
+        Returns the closest dimension of every text and its cosine similarity
+        """
+        if not texts:
+            return [], np.zeros(0, dtype=np.float32)
+        embeddings = torch.from_numpy(
+            self.embedding_cache.encode(self.embedder, texts)
+        ).to(self.dimension_embeddings.device)
+        cosine_scores = util.cos_sim(embeddings, self.dimension_embeddings)
+        max_scores, max_idx = torch.max(cosine_scores, dim=1)
+        return [self.dimension_names[i] for i in max_idx.tolist()], max_scores.cpu().numpy()
 
     def get_sentiment_score(self, text):
-        if not text:
-            return 0.0
-        inputs = self.tokenizer(text, return_tensors="pt", truncation=True, max_length=512)
-        with torch.no_grad():
-            outputs = self.model(**inputs)
-        stars = torch.argmax(outputs.logits, dim=1).item() + 1
-        return (stars - 3) / 2  # Normalize to [-1, 1]
+        return float(self.get_sentiment_scores([text])[0])
+
+    def get_sentiment_scores(self, texts: list[str], batch_size: int = SENTIMENT_BATCH_SIZE) -> np.ndarray:
+        """
+        :param texts: cleaned texts
+        :param batch_size: texts per forward pass
+
+        Returns star ratings normalized to [-1, 1], 0.0 for empty texts
+        """
+        scores = np.zeros(len(texts), dtype=np.float32)
+
+        # sort by length so every micro-batch is padded only up to similar-sized texts
+        order = sorted((i for i, text in enumerate(texts) if text), key=lambda i: len(texts[i]))
+
+        with torch.inference_mode():
+            for start in range(0, len(order), batch_size):
+                batch = order[start:start + batch_size]
+                inputs = self.tokenizer(
+                    [texts[i] for i in batch],
+                    return_tensors="pt",
+                    padding=True,
+                    truncation=True,
+                    max_length=512
+                )
+                logits = self.model(**inputs).logits
+                stars = torch.argmax(logits, dim=1).cpu().numpy() + 1
+                scores[batch] = (stars - 3) / 2  # Normalize to [-1, 1]
+
+        return scores
 
 class YouTubeAnalyzer:
-    def __init__(self, api_key: str, dimensions: dict[str, str]):
+    def __init__(self, api_key: str, dimensions: dict[str, str], api: YouTubeAPI = None):
         self.dimensions = dimensions
         self.api_key = api_key
-        self.youtube = build("youtube", "v3", developerKey=api_key)
+        # quota-limited client with retries, safe to call from many threads at once
+        self.api = api or YouTubeAPI(api_key)
         self.processor = TextProcessor(dimensions)
 
-    def search_videos(self, query, published_after, published_before, max_results=MAX_VIDEOS_PER_SEARCH):
+    async def asearch_videos(self, query, published_after, published_before, max_results=MAX_VIDEOS_PER_SEARCH):
         """Search for videos using a keyword query."""
         videos = []
-        next_page_token = None
-        
+
         try:
-            while len(videos) < max_results:
-                response = self.youtube.search().list(
-                    q=query,
-                    part="snippet",
-                    maxResults=min(50, max_results - len(videos)),  # YouTube API allows max 50 per request
-                    pageToken=next_page_token,
-                    type="video",
-                    order="relevance",
-                    publishedAfter=published_after,
-                    publishedBefore=published_before,
-                    relevanceLanguage="es"
-                ).execute()
-                
-                for item in response.get("items", []):
-                    if item["id"]["kind"] == "youtube#video":
-                        videos.append({
-                            "id": item["id"]["videoId"],
-                            "title": item["snippet"]["title"],
-                            "description": item["snippet"].get("description", ""),
-                            "published_at": item["snippet"]["publishedAt"]
-                        })
-                
-                next_page_token = response.get("nextPageToken")
-                if not next_page_token or len(videos) >= max_results:
-                    break
-                
-                sleep(API_SLEEP_TIME)  # Avoid quota exceeded errors
-                
+            items = await self.api.apaginate(
+                "search",
+                max_results,
+                q=query,
+                part="snippet",
+                type="video",
+                order="relevance",
+                publishedAfter=published_after,
+                publishedBefore=published_before,
+                relevanceLanguage="es"
+            )
+
+            for item in items:
+                if item["id"]["kind"] == "youtube#video":
+                    videos.append({
+                        "id": item["id"]["videoId"],
+                        "title": item["snippet"]["title"],
+                        "description": item["snippet"].get("description", ""),
+                        "published_at": item["snippet"]["publishedAt"]
+                    })
+
+        except QuotaExceeded:
+            # the caller has to know this search is missing, not just see no videos
+            raise
         except Exception as e:
             print(f"Error searching for '{query}': {e}")
         
         print(f"Found {len(videos)} videos for query '{query}'")
         return videos
 
-    def get_video_comments(self, video_id, max_comments=MAX_COMMENTS_PER_VIDEO):
+    async def aget_video_comments(self, video_id, max_comments=MAX_COMMENTS_PER_VIDEO):
         """Get comments for a specific video."""
         comments = []
-        next_page_token = None
-        
+
         try:
-            while len(comments) < max_comments:
-                response = self.youtube.commentThreads().list(
-                    part="snippet",
-                    videoId=video_id,
-                    maxResults=min(100, max_comments - len(comments)),  # YouTube API allows max 100 per request
-                    pageToken=next_page_token
-                ).execute()
-                
-                for item in response.get("items", []):
-                    comment_text = item["snippet"]["topLevelComment"]["snippet"]["textDisplay"]
-                    comments.append(comment_text)
-                
-                next_page_token = response.get("nextPageToken")
-                if not next_page_token or len(comments) >= max_comments:
-                    break
-                
-                sleep(API_SLEEP_TIME)  # Avoid quota exceeded errors
-                
+            items = await self.api.apaginate(
+                "commentThreads",
+                max_comments,
+                part="snippet",
+                videoId=video_id
+            )
+
+            for item in items:
+                comment_text = item["snippet"]["topLevelComment"]["snippet"]["textDisplay"]
+                comments.append(comment_text)
+
+        except QuotaExceeded:
+            raise
         except Exception as e:
             # Many videos have comments disabled, so we'll just pass silently
             pass
         
         return comments
 
-    def analyze_state_by_keywords(self, state_name, search_terms, date_range):
-        """Analyze a state by searching for videos using specified search terms."""
-        print(f"\nAnalyzing {state_name}...")
-        dimension_stats = {dim: {"sentiment_sum": 0.0, "count": 0} for dim in self.dimensions}
-        total_videos = 0
-        total_comments = 0
-        
-        # Search for videos with each search term
-        for search_term in search_terms:
+    def search_videos(self, query, published_after, published_before, max_results=MAX_VIDEOS_PER_SEARCH):
+        return run_sync(self.asearch_videos(query, published_after, published_before, max_results))
+
+    def get_video_comments(self, video_id, max_comments=MAX_COMMENTS_PER_VIDEO):
+        return run_sync(self.aget_video_comments(video_id, max_comments))
+
+    async def _fetch_videos(self, states_search_terms, date_range, put, stop: threading.Event, skipped: dict[str, list[str]]):
+        """
+        Run every search and every comment request concurrently, passing (state, texts) of each video to put.
+        Requests refused by the daily quota are added to skipped under their state.
+        """
+        async def fetch_video(state, video):
+            if stop.is_set():
+                return
+            try:
+                comments = await self.aget_video_comments(video["id"], MAX_COMMENTS_PER_VIDEO)
+            except QuotaExceeded:
+                # a video without its comments would skew the state's stats, leave it out
+                skipped[state].append(f'comments of video {video["id"]}')
+                return
+            await asyncio.to_thread(put, (state, [video["title"] + ". " + video["description"]] + comments))
+
+        async def fetch_search(state, search_term):
+            if stop.is_set():
+                return
             print(f"  Searching for '{search_term}'...")
-            videos = self.search_videos(
-                query=search_term,
-                published_after=date_range["published_after"],
-                published_before=date_range["published_before"],
-                max_results=MAX_VIDEOS_PER_SEARCH
-            )
-            
-            if not videos:
-                continue
-                
-            total_videos += len(videos)
-            
-            # Process videos
-            for video in tqdm(videos, desc=f"Processing videos for '{search_term}'"):
-                # Get video comments
-                comments = self.get_video_comments(video["id"], MAX_COMMENTS_PER_VIDEO)
-                total_comments += len(comments)
-                
-                # Concatenate title, description and comments for analysis
-                all_texts = [video["title"] + ". " + video["description"]] + comments
-                
-                # Analyze each text
-                for text in all_texts:
-                    clean = self.processor.clean_text(text)
-                    if len(clean) < 10:  # Skip very short texts
-                        continue
-                        
-                    dimension, confidence = self.processor.classify_dimension(clean)
-                    if confidence > 0.1:  # Only count if confidence is high enough
-                        sentiment = self.processor.get_sentiment_score(clean)
-                        dimension_stats[dimension]["sentiment_sum"] += sentiment
-                        dimension_stats[dimension]["count"] += 1
-        
-        print(f"  Analyzed {total_videos} videos and {total_comments} comments for {state_name}")
+            try:
+                videos = await self.asearch_videos(
+                    query=search_term,
+                    published_after=date_range["published_after"],
+                    published_before=date_range["published_before"],
+                    max_results=MAX_VIDEOS_PER_SEARCH
+                )
+            except QuotaExceeded:
+                skipped[state].append(f'search "{search_term}"')
+                return
+            await asyncio.gather(*(fetch_video(state, video) for video in videos))
+
+        await asyncio.gather(*(
+            fetch_search(state, search_term)
+            for state, search_terms in states_search_terms.items()
+            for search_term in search_terms
+        ))
+
+    def _run_fetcher(self, states_search_terms, date_range, videos_queue: queue.Queue, stop: threading.Event, skipped: dict[str, list[str]]):
+        """Producer: push (state, title + description and comments) of every found video onto videos_queue."""
+        def put(item):
+            # give up if the inference worker has stopped, instead of blocking forever on a full queue
+            while not stop.is_set():
+                try:
+                    videos_queue.put(item, timeout=1)
+                    return True
+                except queue.Full:
+                    continue
+            return False
+
+        try:
+            # the fetcher thread has no loop of its own yet
+            asyncio.run(self._fetch_videos(states_search_terms, date_range, put, stop, skipped))
+        finally:
+            put(_FETCH_DONE)
+
+    def _analyze_texts(self, states, texts, states_stats):
+        """Classify a batch of raw texts and add the sentiment of the confident ones to the stats of their state."""
+        cleaned = [(state, clean) for state, clean in zip(states, map(self.processor.clean_text, texts)) if len(clean) >= 10]  # Skip very short texts
+        dimensions, confidences = self.processor.classify_dimensions([clean for _, clean in cleaned])
+
+        # Only count if confidence is high enough
+        confident = [i for i, confidence in enumerate(confidences) if confidence > 0.1]
+        sentiments = self.processor.get_sentiment_scores([cleaned[i][1] for i in confident])
+        for i, sentiment in zip(confident, sentiments):
+            dimension_stats = states_stats[cleaned[i][0]]["dimension_stats"]
+            dimension_stats[dimensions[i]]["sentiment_sum"] += float(sentiment)
+            dimension_stats[dimensions[i]]["count"] += 1
+
+    def analyze_states(self, states_search_terms: dict[str, list[str]], date_range) -> dict[str, tuple]:
+        """
+        Analyze states by searching for videos using their search terms.
+
+        All API calls run concurrently in a fetcher thread (bounded by the quota limiter) while this
+        thread classifies whatever has been fetched so far, so network waits and model inference overlap.
 
-        return dimension_stats, total_videos, total_comments
+        Returns state -> (dimension_stats, total_videos, total_comments), raises IncompleteAnalysis
+        if the daily quota refused some of the requests
+        """
+        print(f"\nAnalyzing {', '.join(states_search_terms)}...")
+        states_stats = {
+            state: {
+                "dimension_stats": {dim: {"sentiment_sum": 0.0, "count": 0} for dim in self.dimensions},
+                "total_videos": 0,
+                "total_comments": 0
+            }
+            for state in states_search_terms
+        }
+
+        videos_queue = queue.Queue(maxsize=FETCH_QUEUE_SIZE)
+        stop = threading.Event()
+        skipped = defaultdict(list)
+        fetcher = threading.Thread(
+            target=self._run_fetcher,
+            args=(states_search_terms, date_range, videos_queue, stop, skipped),
+            daemon=True
+        )
+        fetcher.start()
+
+        progress = tqdm(desc="Processing videos", unit="video")
+        try:
+            done = False
+            while not done:
+                # wait for the first video, then take whatever else is already queued
+                batch_states, batch_texts = [], []
+                videos = 0
+                item = videos_queue.get()
+                while True:
+                    if item is _FETCH_DONE:
+                        done = True
+                        break
+                    state, texts = item
+                    videos += 1
+                    states_stats[state]["total_videos"] += 1
+                    states_stats[state]["total_comments"] += len(texts) - 1
+                    batch_states.extend([state] * len(texts))
+                    batch_texts.extend(texts)
+                    if len(batch_texts) >= INFERENCE_BATCH_SIZE:
+                        break
+                    try:
+                        item = videos_queue.get_nowait()
+                    except queue.Empty:
+                        break
+
+                if batch_texts:
+                    self._analyze_texts(batch_states, batch_texts, states_stats)
+                progress.update(videos)
+        finally:
+            stop.set()
+            progress.close()
+            fetcher.join()
+
+        for state, stats in states_stats.items():
+            print(f"  Analyzed {stats['total_videos']} videos and {stats['total_comments']} comments for {state}")
+        print(f"  Embedding cache: {self.processor.embedding_cache.stats()}")
+        print(f"  YouTube API: {self.api.stats()}")
+
+        results = {
+            state: (stats["dimension_stats"], stats["total_videos"], stats["total_comments"])
+            for state, stats in states_stats.items()
+        }
+        if skipped:
+            raise IncompleteAnalysis(dict(skipped), results)
+        return results
+
+    def analyze_state_by_keywords(self, state_name, search_terms, date_range):
+        """Analyze a state by searching for videos using specified search terms."""
+        return self.analyze_states({state_name: search_terms}, date_range)[state_name]
     
 def get_states_search_terms(states: list[str]) -> dict[str, list]:
     result = {}
@@ -203,15 +372,18 @@ def analyze_all_states(start_year: int, end_year: int, states: list[str], dimens
     # Store overall stats for summary
     all_results = []
 
-    states_search_terms = get_states_search_terms(states[0:1])
+    # all states are fetched concurrently, within the daily quota
+    states_search_terms = get_states_search_terms(states)
+    incomplete = None
+    try:
+        states_results = analyzer.analyze_states(states_search_terms, date_range)
+    except IncompleteAnalysis as e:
+        # save the complete states, then fail, so a rerun after the quota reset fills in the rest
+        # (responses fetched so far are served from the cache)
+        incomplete = e
+        states_results = {state: result for state, result in e.results.items() if state not in e.skipped}
     
-    for state, search_terms in states_search_terms.items():
-        stats, total_videos, total_comments = analyzer.analyze_state_by_keywords(
-            state_name=state,
-            search_terms=search_terms,
-            date_range=date_range
-        )
-        
+    for state, (stats, total_videos, total_comments) in states_results.items():
         # Create dataframe for this state
         df = pd.DataFrame([
             {
@@ -233,4 +405,10 @@ def analyze_all_states(start_year: int, end_year: int, states: list[str], dimens
         # Add to overall results
         all_results.append(df)
 
+    analyzer.processor.embedding_cache.flush()
+
+    if incomplete:
+        incomplete.frames = all_results
+        raise incomplete
+
     return all_results
\ No newline at end of file